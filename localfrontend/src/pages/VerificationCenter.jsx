@@ -104,6 +104,8 @@ const VerificationCenter = () => {
   const [advertisement, setAdvertisement] = useState(null);
   const [csvFile, setCsvFile] = useState(null);
   const [sourceFolderPath, setSourceFolderPath] = useState('');
+  const [incremental, setIncremental] = useState(false);
+  const [quickCheck, setQuickCheck] = useState(false);
   const [totalFiles, setTotalFiles] = useState(0);
   const [pipelineStatus, setPipelineStatus] = useState('Awaiting files...');
   const [isLoading, setIsLoading] = useState(false);
@@ -112,43 +114,51 @@ const VerificationCenter = () => {
   const [expandedRowId, setExpandedRowId] = useState(null);
   const [isJobComplete, setIsJobComplete] = useState(false);
   const [isSaving, setIsSaving] = useState(false);
-  const pollingIntervalRef = useRef(null);
+  const pollingRef = useRef(null);
 
-  const pollJobStatus = (id) => {
-    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+  // Long-polls the progress endpoint: each request returns only the results
+  // added since the last cursor, and waits server-side while nothing changes.
+  const pollJobStatus = async (id) => {
+    const pollToken = {};
+    pollingRef.current = pollToken;
+    let cursor = 0;
 
-    pollingIntervalRef.current = setInterval(async () => {
+    while (pollingRef.current === pollToken) {
       try {
-        const response = await axios.get(`${API_BASE_URL}/status/${id}/`);
-        const { status: jobStatus, details: jobDetails, results: apiResults = [] } = response.data;
+        const response = await axios.get(`${API_BASE_URL}/progress/${id}/`, { params: { since: cursor, wait: 20 } });
+        if (pollingRef.current !== pollToken) return;
 
-        const transformedResults = apiResults.map(transformApiResult);
-        setResults(transformedResults);
+        const { status: jobStatus, total, scan_complete: scanComplete, processed, failed, cursor: nextCursor, has_more: hasMore, results: apiResults = [], retry_after: retryAfter = 0 } = response.data;
+        cursor = nextCursor;
 
-        if (jobDetails && jobDetails.includes('files to process')) {
-          const countMatch = jobDetails.match(/(\d+)/);
-          if (countMatch) {
-            setTotalFiles(parseInt(countMatch[0], 10));
-          }
+        if (apiResults.length > 0) {
+          const transformedResults = apiResults.map(transformApiResult);
+          setResults(previous => [...previous, ...transformedResults]);
         }
+        setTotalFiles(total);
 
-        const statusText = `Processing... ${transformedResults.length} / ${totalFiles} files complete.`;
-        setPipelineStatus(statusText);
+        const failedText = failed ? ` (${failed} failed)` : '';
+        const totalText = scanComplete ? total : `${total}+ (still scanning)`;
+        setPipelineStatus(`Processing... ${processed} / ${totalText} files complete${failedText}.`);
 
-        if (jobStatus === 'COMPLETE' || jobStatus === 'FAILED') {
-          clearInterval(pollingIntervalRef.current);
+        if ((jobStatus === 'COMPLETE' || jobStatus === 'FAILED') && !hasMore) {
+          pollingRef.current = null;
           setIsLoading(false);
           setIsJobComplete(true);
           const finalMessage = jobStatus === 'COMPLETE' ? `✅ Process complete!` : `❌ Process failed.`;
           setPipelineStatus(finalMessage);
+        } else if (retryAfter > 0) {
+          // The server had no long-poll slot free, so it answered at once.
+          await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
         }
       } catch (error) {
+        if (pollingRef.current !== pollToken) return;
         console.error("Error fetching results:", error.response?.data || error.message);
         setPipelineStatus('❌ Error fetching results.');
-        clearInterval(pollingIntervalRef.current);
+        pollingRef.current = null;
         setIsLoading(false);
       }
-    }, 3000);
+    }
   };
 
   const handleRunPipeline = async () => {
@@ -156,12 +166,14 @@ const VerificationCenter = () => {
     const formData = new FormData();
     formData.append('master_csv', csvFile);
     formData.append('source_folder_path', sourceFolderPath);
+    formData.append('incremental', incremental);
+    formData.append('priority', quickCheck ? 'interactive' : 'bulk');
 
     setIsLoading(true);
     setResults([]);
     setJobId(null);
     setTotalFiles(0);
-    if (pollingIntervalRef.current) clearInterval(pollingIntervalRef.current);
+    pollingRef.current = null;
 
     setPipelineStatus('Uploading files and starting job...');
 
@@ -215,9 +227,7 @@ const VerificationCenter = () => {
 
   useEffect(() => {
     return () => {
-      if (pollingIntervalRef.current) {
-        clearInterval(pollingIntervalRef.current);
-      }
+      pollingRef.current = null;
     };
   }, []);
 
@@ -266,6 +276,22 @@ const VerificationCenter = () => {
                               value={sourceFolderPath}
                               onChange={(e) => setSourceFolderPath(e.target.value)}
                           />
+                          <label className="incremental-toggle">
+                            <input
+                                type="checkbox"
+                                checked={incremental}
+                                onChange={(e) => setIncremental(e.target.checked)}
+                            />
+                            Only re-verify candidates that changed since the last run
+                          </label>
+                          <label className="incremental-toggle">
+                            <input
+                                type="checkbox"
+                                checked={quickCheck}
+                                onChange={(e) => setQuickCheck(e.target.checked)}
+                            />
+                            Quick check: a few candidates, run ahead of bulk jobs
+                          </label>
                         </div>
                         <div className="action-area">
                           <button className="run-pipeline-button" onClick={handleRunPipeline} disabled={!canRun}>
@@ -285,6 +311,15 @@ const VerificationCenter = () => {
                       </div>
                   )} */}
 
+                  {isJobComplete && jobId && (
+                      <div className="export-actions">
+                        <span>Download report:</span>
+                        <a href={`${API_BASE_URL}/export/${jobId}/?file_type=csv`}>CSV</a>
+                        <a href={`${API_BASE_URL}/export/${jobId}/?file_type=xlsx`}>Excel</a>
+                        <a href={`${API_BASE_URL}/export/${jobId}/?file_type=csv&status=mismatch`}>Mismatches only (CSV)</a>
+                      </div>
+                  )}
+
                   <section className="results-section">
                     <main>
                       {results.length > 0 ? (
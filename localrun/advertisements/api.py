@@ -1,11 +1,14 @@
 # advertisements/api.py
 
+import gzip
+import json
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
 from .models import Advertisement
-from .table_manager import create_results_table_for_advertisement, save_results_to_table
+from .table_manager import ensure_results_table, save_results_to_table
 
 class AdvertisementAPIView(APIView):
     """
@@ -36,40 +39,99 @@ class AdvertisementAPIView(APIView):
             return Response({'id': ad.id, 'name': ad.name}, status=status.HTTP_200_OK)
 
 
+def _is_ndjson(request):
+    return request.content_type.split(';')[0].strip() in ('application/x-ndjson', 'application/jsonl')
+
+
+def _iter_ndjson_results(request, errors):
+    """
+    Yields one result per line of an NDJSON request body, read straight from
+    the request stream (gunzipped when sent with `Content-Encoding: gzip`).
+    Lines that are not a JSON object are skipped and reported in `errors`.
+    """
+    stream = request.stream
+    if stream is None:
+        return
+    if request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = json.loads(line)
+        except ValueError as e:
+            errors.append(f"Line {line_number}: invalid JSON ({e}).")
+            continue
+        if not isinstance(result, dict):
+            errors.append(f"Line {line_number}: expected a JSON object.")
+            continue
+        yield result
+
+
+def _get_advertisement_id(request):
+    # The body of an NDJSON upload is the results stream, so only the query string is read.
+    advertisement_id = request.query_params.get('advertisement_id')
+    if not advertisement_id and not _is_ndjson(request):
+        advertisement_id = request.data.get('advertisement_id')
+    return advertisement_id
+
+
+def _save_results_response(advertisement, request):
+    """
+    Creates the advertisement's results table if it doesn't exist yet and saves the posted
+    results into it, chunk by chunk, reporting every chunk back to the client.
+    """
+    table_name = advertisement.get_results_table_name()
+
+    success, error = ensure_results_table(table_name)
+    if not success:
+        # If table creation fails, it's a critical server error
+        return Response({'error': f'Database error: {error}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    parse_errors = []
+    if _is_ndjson(request):
+        results = _iter_ndjson_results(request, parse_errors)
+    else:
+        results = request.data.get('results', [])
+
+    saved_count, errors, chunks = save_results_to_table(table_name, results)
+    errors = parse_errors + errors
+    total = sum(chunk['rows'] for chunk in chunks)
+
+    if errors:
+        # Return a multi-status response if some chunks or lines failed to save
+        return Response({
+            'status': f'Partial success. Saved {saved_count} of {total} results.',
+            'errors': errors,
+            'chunks': chunks,
+        }, status=status.HTTP_207_MULTI_STATUS)
+
+    return Response({
+        'status': f'Successfully saved {saved_count} results to table {table_name}.',
+        'chunks': chunks,
+    }, status=status.HTTP_200_OK)
+
+
 class SaveAdvertisementResultsAPIView(APIView):
     """
     This is the main endpoint for saving the final, verified data.
     It orchestrates the entire dynamic table creation and data insertion process.
+
+    Accepts either a JSON body ({"advertisement_id": ..., "results": [...]}) or
+    an NDJSON body with one result per line (optionally gzipped) and the
+    advertisement_id in the query string, which is saved while it is read.
     """
     def post(self, request, *args, **kwargs):
-        advertisement_id = request.data.get('advertisement_id')
-        results_list = request.data.get('results', [])
+        advertisement_id = _get_advertisement_id(request)
 
         if not advertisement_id:
             return Response({'error': 'An advertisement_id is required to save results.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Step 1: Find the parent advertisement
             advertisement = Advertisement.objects.get(id=advertisement_id)
-            table_name = advertisement.get_results_table_name()
-
-            # Step 2: Call the table manager to create the dynamic table
-            success, error = create_results_table_for_advertisement(table_name)
-            if not success:
-                # If table creation fails, it's a critical server error
-                return Response({'error': f'Database error: {error}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Step 3: Call the table manager to save the data
-            saved_count, errors = save_results_to_table(table_name, results_list)
-            
-            if errors:
-                # Return a multi-status response if some rows failed to save
-                return Response({
-                    'status': f'Partial success. Saved {saved_count} of {len(results_list)} results.',
-                    'errors': errors
-                }, status=status.HTTP_207_MULTI_STATUS)
-
-            return Response({'status': f'Successfully saved {saved_count} results to table {table_name}.'}, status=status.HTTP_200_OK)
+            return _save_results_response(advertisement, request)
 
         except Advertisement.DoesNotExist:
             return Response({'error': f'Advertisement with ID {advertisement_id} not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -77,9 +139,12 @@ class SaveAdvertisementResultsAPIView(APIView):
             return Response({'error': f'An unexpected server error occurred: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 class BulkSaveResultsAPIView(APIView):
+    """
+    Same request formats as SaveAdvertisementResultsAPIView: a JSON body, or
+    NDJSON (optionally gzipped) with the advertisement_id in the query string.
+    """
     def post(self, request, *args, **kwargs):
-        advertisement_id = request.data.get('advertisement_id')
-        results_list = request.data.get('results', [])
+        advertisement_id = _get_advertisement_id(request)
 
         if not advertisement_id:
             return Response({'error': 'Advertisement ID is required.'}, status=400)
@@ -89,18 +154,4 @@ class BulkSaveResultsAPIView(APIView):
         except Advertisement.DoesNotExist:
             return Response({'error': 'Advertisement not found.'}, status=404)
 
-        table_name = advertisement.get_results_table_name()
-        
-        table_created, error = create_results_table_for_advertisement(table_name)
-        if not table_created:
-            return Response({'error': f'Database error: {error}'}, status=500)
-            
-        saved_count, errors = save_results_to_table(table_name, results_list)
-        
-        if errors:
-            return Response({
-                'status': f'Partial success. Saved {saved_count} results.',
-                'errors': errors
-            }, status=207)
-
-        return Response({'status': f'Successfully saved {saved_count} results to new table {table_name}.'}, status=200)
\ No newline at end of file
+        return _save_results_response(advertisement, request)
@@ -25,4 +25,13 @@ PARSED_RESULT_FIELDS_BLUEPRINT = {
     "extracted_rank": "VARCHAR(50)",
     "rank_status": "VARCHAR(10)",
     "created_at": "DATETIME",
-}
\ No newline at end of file
+}
+
+# Secondary indexes created with every results table, so review queries that
+# filter a large advertisement by field status are index-backed.
+PARSED_RESULT_INDEXES_BLUEPRINT = {
+    f"idx_{col_name}": (col_name,)
+    for col_name in PARSED_RESULT_FIELDS_BLUEPRINT
+    if col_name.endswith('_status')
+}
+PARSED_RESULT_INDEXES_BLUEPRINT["idx_created_at"] = ("created_at",)
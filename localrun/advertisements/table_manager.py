@@ -1,23 +1,88 @@
 # advertisements/table_manager.py
 
-from django.db import connection
+import threading
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
-from .dynamic_models import PARSED_RESULT_FIELDS_BLUEPRINT 
+from .dynamic_models import PARSED_RESULT_FIELDS_BLUEPRINT, PARSED_RESULT_INDEXES_BLUEPRINT
+
+RESULTS_TABLE_PREFIX = 'parsed_results_'
+
+# Results tables known to exist, so a save doesn't issue DDL (and take a
+# metadata lock) every time. Loaded from information_schema on first use.
+_known_tables = None
+_known_tables_lock = threading.Lock()
+
+
+def _load_known_tables():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name LIKE %s",
+            [RESULTS_TABLE_PREFIX.replace('_', '\\_') + '%'],
+        )
+        tables = {row[0] for row in cursor.fetchall()}
+    print(f"[TABLE MANAGER] Found {len(tables)} existing results table(s).")
+    return tables
+
+
+def results_table_exists(table_name: str) -> bool:
+    """Checks the process-level registry of results tables, loading it on first use."""
+    global _known_tables
+    with _known_tables_lock:
+        if _known_tables is None:
+            _known_tables = _load_known_tables()
+        return table_name in _known_tables
+
+
+def forget_results_table(table_name: str):
+    """Drops a table from the registry, so the next save checks for it again."""
+    with _known_tables_lock:
+        if _known_tables is not None:
+            _known_tables.discard(table_name)
+
+
+def ensure_results_table(table_name: str):
+    """
+    Makes sure the results table exists, running the DDL only when the
+    registry doesn't know the table yet.
+
+    Returns:
+        tuple: (success, error_message), like create_results_table_for_advertisement.
+    """
+    try:
+        if results_table_exists(table_name):
+            return True, None
+    except Exception as e:
+        # Without the registry we can still fall back to CREATE TABLE IF NOT EXISTS.
+        print(f"[TABLE MANAGER] WARNING: Could not list existing results tables: {e}")
+    return create_results_table_for_advertisement(table_name)
+
 
 def create_results_table_for_advertisement(table_name: str):
     """
-    Executes a raw SQL 'CREATE TABLE' statement to create a new results table.
+    Executes a raw SQL 'CREATE TABLE' statement to create a new results table,
+    with the secondary indexes in PARSED_RESULT_INDEXES_BLUEPRINT.
     """
     print(f"[TABLE MANAGER] Attempting to create table: {table_name}")
 
     fields_sql = ",\n".join([f'`{col_name}` {col_type}' for col_name, col_type in PARSED_RESULT_FIELDS_BLUEPRINT.items()])
+    indexes_sql = ",\n".join([
+        f"INDEX `{index_name}` (" + ", ".join(f'`{col}`' for col in columns) + ")"
+        for index_name, columns in PARSED_RESULT_INDEXES_BLUEPRINT.items()
+    ])
     
     # Use 'IF NOT EXISTS' for safety
-    create_table_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({fields_sql});"
+    create_table_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({fields_sql},\n{indexes_sql});"
     
     try:
         with connection.cursor() as cursor:
             cursor.execute(create_table_query)
+        with _known_tables_lock:
+            if _known_tables is not None:
+                _known_tables.add(table_name)
         print(f"[TABLE MANAGER] Table '{table_name}' created successfully or already exists.")
         return True, None
     except Exception as e:
@@ -25,38 +90,61 @@ def create_results_table_for_advertisement(table_name: str):
         print(f"[TABLE MANAGER] ERROR: {error_message}")
         return False, error_message
 
-def save_results_to_table(table_name: str, results_list: list):
+def save_results_to_table(table_name: str, results, chunk_size: int = None):
     """
-    Executes a raw SQL bulk INSERT statement to save results to the dynamic table.
-    """
-    if not results_list:
-        return 0, ["No results provided."]
+    Upserts results into the dynamic table in chunks of ADVERTISEMENT_SAVE_CHUNK_SIZE
+    rows, each one multi-row INSERT committed in its own transaction.
+
+    `results` can be any iterable of dicts (e.g. a generator over a streamed
+    request body), so a whole advertisement is never held in memory. A failing
+    chunk is rolled back on its own; the chunks before and after it are kept.
 
+    Returns:
+        tuple: (saved_count, errors, chunks) - the number of rows saved, the
+               error messages and one report per chunk.
+    """
+    chunk_size = chunk_size or getattr(settings, 'ADVERTISEMENT_SAVE_CHUNK_SIZE', 500)
     column_names = list(PARSED_RESULT_FIELDS_BLUEPRINT.keys())
+    columns_sql = ", ".join([f'`{col}`' for col in column_names])
+    row_placeholders = "(" + ", ".join(["%s"] * len(column_names)) + ")"
+    update_sql = ", ".join([f'`{col}`=VALUES(`{col}`)' for col in column_names if col != 'id'])
 
     now = timezone.now()
+    saved_count, errors, chunks = 0, [], []
+    results = iter(results)
 
-    for result in results_list:
-        result['created_at'] = now
-    
-    rows_to_insert = [
-        tuple(result.get(col) for col in column_names)
-        for result in results_list
-    ]
+    while True:
+        chunk = list(islice(results, chunk_size))
+        if not chunk:
+            break
+        report = {'chunk': len(chunks) + 1, 'rows': len(chunk), 'saved': 0}
+        chunks.append(report)
 
-    columns_sql = ", ".join([f'`{col}`' for col in column_names])
-    placeholders_sql = ", ".join(["%s"] * len(column_names))
+        try:
+            # The incoming dicts are left untouched; created_at is only set on the row.
+            rows = [
+                tuple(now if col == 'created_at' else result.get(col) for col in column_names)
+                for result in chunk
+            ]
+            report['first_id'], report['last_id'] = rows[0][0], rows[-1][0]
+            insert_query = (
+                f"INSERT INTO `{table_name}` ({columns_sql}) VALUES "
+                + ", ".join([row_placeholders] * len(rows))
+                + f" ON DUPLICATE KEY UPDATE {update_sql}"
+            )
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(insert_query, [value for row in rows for value in row])
+            report['saved'] = len(rows)
+            saved_count += len(rows)
+        except Exception as e:
+            report['error'] = f"Failed to insert chunk {report['chunk']} ({len(chunk)} rows) into '{table_name}': {e}"
+            errors.append(report['error'])
+            # The table may have been dropped behind the registry's back.
+            forget_results_table(table_name)
+            print(f"[TABLE MANAGER] ERROR: {report['error']}")
 
-    update_sql = ", ".join([f'`{col}`=VALUES(`{col}`)' for col in column_names if col != 'id'])
-    insert_query = f"""
-        INSERT INTO `{table_name}` ({columns_sql}) VALUES ({placeholders_sql})
-        ON DUPLICATE KEY UPDATE {update_sql}
-    """
+    if not chunks:
+        return 0, ["No results provided."], chunks
 
-    try:
-        with connection.cursor() as cursor:
-            cursor.executemany(insert_query, rows_to_insert)
-        return len(rows_to_insert), None
-    except Exception as e:
-        error_message = f"Failed to insert data into '{table_name}': {e}"
-        return 0, [error_message]
\ No newline at end of file
+    print(f"[TABLE MANAGER] Saved {saved_count} results to '{table_name}' in {len(chunks)} chunk(s).")
+    return saved_count, errors, chunks
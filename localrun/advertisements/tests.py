@@ -1,3 +1,120 @@
-from django.test import TestCase
+import gzip
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from . import api, table_manager
+from .dynamic_models import PARSED_RESULT_FIELDS_BLUEPRINT
+from .models import Advertisement
+
+
+class BulkSaveResultsTests(TestCase):
+    """BulkSaveResultsAPIView accepts the same bodies as the save-results endpoint."""
+
+    RESULTS = [{'id': '101', 'input_name': 'Ananya Rao'}, {'id': '102', 'input_name': 'Vikram Singh'}]
+
+    def setUp(self):
+        self.advertisement = Advertisement.objects.create(name='Scientist B 2024')
+        self.factory = APIRequestFactory()
+        saved = []
+
+        def save_results_to_table(table_name, results):
+            saved.extend(results)
+            return len(saved), [], [{'chunk': 1, 'rows': len(saved), 'saved': len(saved)}]
+
+        self.saved = saved
+        for name, replacement in (('ensure_results_table', lambda table_name: (True, None)),
+                                  ('save_results_to_table', save_results_to_table)):
+            patcher = mock.patch.object(api, name, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, request):
+        return api.BulkSaveResultsAPIView.as_view()(request)
+
+    def test_json_body(self):
+        request = self.factory.post('/', {'advertisement_id': self.advertisement.id, 'results': self.RESULTS}, format='json')
+        self.assertEqual(self.post(request).status_code, 200)
+        self.assertEqual(self.saved, self.RESULTS)
+
+    def test_gzipped_ndjson_body(self):
+        body = gzip.compress('\n'.join(json.dumps(result) for result in self.RESULTS).encode())
+        request = self.factory.generic('POST', f'/?advertisement_id={self.advertisement.id}', body,
+                                       content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(self.post(request).status_code, 200)
+        self.assertEqual(self.saved, self.RESULTS)
+
+    def test_ndjson_without_advertisement_id(self):
+        request = self.factory.generic('POST', '/', b'{"id": "101"}\n', content_type='application/x-ndjson')
+        self.assertEqual(self.post(request).status_code, 400)
+        self.assertEqual(self.saved, [])
+
+
+class RecordingCursor:
+    """Stands in for the MySQL cursor, recording each INSERT's row count."""
+
+    def __init__(self, inserts, fail_on):
+        self.inserts = inserts
+        self.fail_on = fail_on
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params):
+        if self.fail_on is not None and self.fail_on in params:
+            raise RuntimeError('Data too long for column')
+        self.inserts.append(len(params) // len(PARSED_RESULT_FIELDS_BLUEPRINT))
+
+
+class SaveResultsToTableTests(TestCase):
+    """Results are upserted one chunk per INSERT, and a failed chunk is reported on its own."""
+
+    def setUp(self):
+        self.inserts = []
+        self.fail_on = None
+        connection = mock.Mock(cursor=lambda: RecordingCursor(self.inserts, self.fail_on))
+        patcher = mock.patch.object(table_manager, 'connection', connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def results(self, count):
+        return [{'id': f'{i:05d}', 'input_name': f'Candidate {i}'} for i in range(count)]
+
+    def test_chunks(self):
+        results = self.results(1205)
+        saved, errors, chunks = table_manager.save_results_to_table('parsed_results_1', iter(results), chunk_size=500)
+
+        self.assertEqual((saved, errors), (1205, []))
+        self.assertEqual(self.inserts, [500, 500, 205])
+        self.assertEqual([(chunk['rows'], chunk['saved'], chunk['first_id'], chunk['last_id']) for chunk in chunks],
+                         [(500, 500, '00000', '00499'), (500, 500, '00500', '00999'), (205, 205, '01000', '01204')])
+        self.assertNotIn('created_at', results[0])
+
+    @override_settings(ADVERTISEMENT_SAVE_CHUNK_SIZE=2)
+    def test_chunk_size_setting(self):
+        table_manager.save_results_to_table('parsed_results_1', self.results(5))
+        self.assertEqual(self.inserts, [2, 2, 1])
+
+    def test_failed_chunk(self):
+        self.fail_on = 'Candidate 7'
+        with mock.patch.object(table_manager, 'forget_results_table') as forget:
+            saved, errors, chunks = table_manager.save_results_to_table('parsed_results_1', self.results(12), chunk_size=5)
+
+        self.assertEqual(saved, 7)
+        self.assertEqual(self.inserts, [5, 2])
+        self.assertEqual([chunk['saved'] for chunk in chunks], [5, 0, 2])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(chunks[1]['error'], errors[0])
+        self.assertIn('chunk 2 (5 rows)', errors[0])
+        self.assertIn('Data too long', errors[0])
+        self.assertEqual((chunks[1]['first_id'], chunks[1]['last_id']), ('00005', '00009'))
+        self.assertNotIn('error', chunks[0])
+        forget.assert_called_once_with('parsed_results_1')
+
+    def test_no_results(self):
+        self.assertEqual(table_manager.save_results_to_table('parsed_results_1', []), (0, ['No results provided.'], []))
@@ -157,6 +157,25 @@ REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 # REDIS_URL = 'redis://127.0.0.1:6379/0'
 
 POPPLER_PATH = os.getenv('POPPLER_PATH')
+
+# LOCAL MODEL (llama-server) CLIENT
+LOCAL_MODEL_URL = os.getenv('LOCAL_MODEL_URL', 'http://host.docker.internal:8080/v1/chat/completions')
+# Requests in flight against llama-server, across every worker process (shared through
+# Redis). Keep this at (or below) the number of parallel slots llama-server runs with (-np).
+LOCAL_MODEL_MAX_CONCURRENCY = int(os.getenv('LOCAL_MODEL_MAX_CONCURRENCY', '4'))
+LOCAL_MODEL_CONNECT_TIMEOUT = float(os.getenv('LOCAL_MODEL_CONNECT_TIMEOUT', '5'))
+LOCAL_MODEL_READ_TIMEOUT = float(os.getenv('LOCAL_MODEL_READ_TIMEOUT', '300'))
+LOCAL_MODEL_MAX_RETRIES = int(os.getenv('LOCAL_MODEL_MAX_RETRIES', '2'))
+LOCAL_MODEL_BACKOFF_SECONDS = float(os.getenv('LOCAL_MODEL_BACKOFF_SECONDS', '1.0'))
+# Part of the extraction cache key; change it whenever the served model changes.
+LOCAL_MODEL_NAME = os.getenv('LOCAL_MODEL_NAME', 'gemma-3-vision')
+# Scorecards packed into one extraction request (1 = one image per request).
+LOCAL_MODEL_IMAGES_PER_REQUEST = int(os.getenv('LOCAL_MODEL_IMAGES_PER_REQUEST', '1'))
+
+# EXTRACTION CACHE (image hash + prompt + model -> raw model response)
+EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'True') == 'True'
+EXTRACTION_CACHE_TTL_DAYS = int(os.getenv('EXTRACTION_CACHE_TTL_DAYS', '30'))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', '100000'))
 # TOGETHER_API_KEY = os.getenv('TOGETHER_API_KEY')
 
 # CELERY CONFIGURATION
@@ -166,6 +185,60 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Pipeline tasks run for minutes; a worker process reserves no more than the one it runs next.
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', '1'))
+
+
+# PIPELINE TUNING
+# Candidates handled by one Celery subtask; their results are written to the DB in bulk.
+PIPELINE_CANDIDATES_PER_TASK = int(os.getenv('PIPELINE_CANDIDATES_PER_TASK', '10'))
+# Batches queued or running at once per job; the scan waits for room beyond that,
+# logging a warning every PIPELINE_BACKPRESSURE_STALL_SECONDS no batch finishes.
+PIPELINE_MAX_BATCHES_IN_FLIGHT = int(os.getenv('PIPELINE_MAX_BATCHES_IN_FLIGHT', '20'))
+PIPELINE_BACKPRESSURE_STALL_SECONDS = float(os.getenv('PIPELINE_BACKPRESSURE_STALL_SECONDS', '60'))
+# Jobs declared with at most this many candidates run on the 'interactive' Celery
+# queue; larger or undeclared jobs go to the 'scan' and 'bulk' queues.
+PIPELINE_INTERACTIVE_MAX_CANDIDATES = int(os.getenv('PIPELINE_INTERACTIVE_MAX_CANDIDATES', '50'))
+# The result writer flushes after this many rows or this many seconds, whichever comes first.
+RESULT_WRITER_BATCH_SIZE = int(os.getenv('RESULT_WRITER_BATCH_SIZE', '25'))
+RESULT_WRITER_FLUSH_SECONDS = float(os.getenv('RESULT_WRITER_FLUSH_SECONDS', '5'))
+# Pass images between the compress, orientation and extraction stages in memory.
+PIPELINE_IN_MEMORY_IMAGES = os.getenv('PIPELINE_IN_MEMORY_IMAGES', 'True') == 'True'
+# Debugging aid: also write each in-memory image to media/temp_compress/<job>.
+PIPELINE_SPILL_IMAGES_TO_DISK = os.getenv('PIPELINE_SPILL_IMAGES_TO_DISK', 'False') == 'True'
+# Size of the per-worker pool for PDF rasterisation, compression and orientation (0 = one per CPU core).
+PIPELINE_PREPROCESS_WORKERS = int(os.getenv('PIPELINE_PREPROCESS_WORKERS', '0'))
+# Crop each scorecard to its field region before compressing it (in-memory mode only).
+SCORECARD_ROI_ENABLED = os.getenv('SCORECARD_ROI_ENABLED', 'True') == 'True'
+# "left,top,right,bottom" fractions of the detected content box. Empty keeps the whole
+# content box, which is safe for every layout; "0,0,1,0.55" fits the official
+# scorecard PDF, whose lower half is general information.
+SCORECARD_ROI_TEMPLATE = os.getenv('SCORECARD_ROI_TEMPLATE', '')
+# OCR every scorecard with Tesseract first; only candidates it cannot fully verify go to the VLM.
+OCR_FAST_PATH_ENABLED = os.getenv('OCR_FAST_PATH_ENABLED', 'False') == 'True'
+# Job progress long-polling: the longest a request may wait for new results, the most
+# results one response carries, and how often to re-check the DB if Redis is unreachable.
+PROGRESS_MAX_WAIT_SECONDS = float(os.getenv('PROGRESS_MAX_WAIT_SECONDS', '25'))
+PROGRESS_PAGE_SIZE = int(os.getenv('PROGRESS_PAGE_SIZE', '500'))
+PROGRESS_FALLBACK_POLL_SECONDS = float(os.getenv('PROGRESS_FALLBACK_POLL_SECONDS', '1'))
+# Long-polls allowed to wait at once per web process; the rest answer at once and ask the
+# client to retry after PROGRESS_FALLBACK_POLL_SECONDS. Each waiting poll holds a server
+# thread for up to PROGRESS_MAX_WAIT_SECONDS, so run the web server with more threads than this.
+PROGRESS_MAX_WAITERS = int(os.getenv('PROGRESS_MAX_WAITERS', '8'))
+# Default and maximum page size of the job results endpoint.
+RESULTS_PAGE_SIZE = int(os.getenv('RESULTS_PAGE_SIZE', '100'))
+RESULTS_MAX_PAGE_SIZE = int(os.getenv('RESULTS_MAX_PAGE_SIZE', '1000'))
+# Rows fetched from the database per round-trip while exporting a report.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+# Rows per INSERT (and per transaction) when saving an advertisement's results.
+ADVERTISEMENT_SAVE_CHUNK_SIZE = int(os.getenv('ADVERTISEMENT_SAVE_CHUNK_SIZE', '500'))
+# Threads listing candidate folders, and whether unchanged folders are skipped
+# on re-scans using the manifest saved under MEDIA_ROOT/scan_manifests.
+SCANNER_THREADS = int(os.getenv('SCANNER_THREADS', '16'))
+SCANNER_MANIFEST_ENABLED = os.getenv('SCANNER_MANIFEST_ENABLED', 'True') == 'True'
+# Master CSVs larger than this are indexed MASTER_CSV_CHUNK_ROWS rows at a time.
+MASTER_CSV_CHUNKED_ABOVE_MB = int(os.getenv('MASTER_CSV_CHUNKED_ABOVE_MB', '64'))
+MASTER_CSV_CHUNK_ROWS = int(os.getenv('MASTER_CSV_CHUNK_ROWS', '200000'))
 
 
 # Default primary key field type
@@ -18,8 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from pipeline.views import prometheus_metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/pipeline/', include('pipeline.urls')),
     path('api/advertisements/', include('advertisements.urls')),
+    path('metrics', prometheus_metrics, name='prometheus-metrics'),
 ]
@@ -1,16 +1,28 @@
 # localrun/pipeline/admin.py
 
 from django.contrib import admin
-from .models import VerificationJob, VerificationResult
+from .models import VerificationJob, VerificationResult, ExtractionCacheEntry, JobStageMetric
 
 @admin.register(VerificationJob)
 class VerificationJobAdmin(admin.ModelAdmin):
-    list_display = ('id', 'status', 'created_at', 'updated_at', 'details')
-    list_filter = ('status',)
-    readonly_fields = ('created_at', 'updated_at')
+    list_display = ('id', 'status', 'priority', 'incremental', 'created_at', 'updated_at', 'details')
+    list_filter = ('status', 'priority')
+    readonly_fields = ('created_at', 'updated_at', 'stage_timings')
 
 @admin.register(VerificationResult)
 class VerificationResultAdmin(admin.ModelAdmin):
     list_display = ('id', 'job', 'created_at')
     list_filter = ('job',)
-    readonly_fields = ('job', 'data', 'created_at')
\ No newline at end of file
+    readonly_fields = ('job', 'data', 'created_at')
+
+@admin.register(ExtractionCacheEntry)
+class ExtractionCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'model_name', 'hit_count', 'created_at', 'last_used_at')
+    list_filter = ('model_name',)
+    readonly_fields = ('key', 'model_name', 'response', 'hit_count', 'created_at', 'last_used_at')
+
+@admin.register(JobStageMetric)
+class JobStageMetricAdmin(admin.ModelAdmin):
+    list_display = ('job', 'kind', 'name', 'count', 'total_seconds', 'max_seconds')
+    list_filter = ('kind', 'name')
+    readonly_fields = ('job', 'kind', 'name', 'count', 'total_seconds', 'max_seconds')
@@ -1,15 +1,54 @@
 # pipeline/api.py
 
 import os
+import csv
+import time
+import itertools
+import tempfile
+from functools import reduce
+from operator import or_
 from django.conf import settings
+from django.http import StreamingHttpResponse, FileResponse
+from django.db.models import Q
+from django.db.models.fields.json import KT
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
+from openpyxl import Workbook
 
 from .models import VerificationJob, VerificationResult 
-from .tasks import run_verification_pipeline
-from .serializers import VerificationJobSerializer
+from .tasks import run_verification_pipeline, get_pipeline_queue
+from .serializers import VerificationJobSerializer, VerificationJobSummarySerializer
+from .progress import long_poll_slot, subscribe, wait_for_progress
+from .workers.verify_worker import REPORT_COLUMNS
+
+def _get_job_priority(data):
+    """
+    Reads the job's priority from the start request: an explicit `priority`
+    ('interactive' or 'bulk'), or else `expected_candidates` compared with
+    PIPELINE_INTERACTIVE_MAX_CANDIDATES. Jobs of undeclared size are bulk.
+
+    Returns:
+        tuple: (priority, error message or None)
+    """
+    priority = str(data.get('priority', '')).strip().upper()
+    if priority:
+        if priority not in dict(VerificationJob.PRIORITY_CHOICES):
+            return None, "priority must be 'interactive' or 'bulk'."
+        return priority, None
+
+    expected = data.get('expected_candidates')
+    if expected in (None, ''):
+        return 'BULK', None
+    try:
+        expected = int(expected)
+    except (TypeError, ValueError):
+        return None, 'expected_candidates must be a whole number.'
+    if expected <= getattr(settings, 'PIPELINE_INTERACTIVE_MAX_CANDIDATES', 50):
+        return 'INTERACTIVE', None
+    return 'BULK', None
+
 
 class StartVerificationAPIView(APIView):
     parser_classes = (MultiPartParser, FormParser)
@@ -31,7 +70,15 @@ class StartVerificationAPIView(APIView):
         if not os.path.isdir(user_path):
             return Response({'error': f'The provided path does not exist or is not a directory inside the container: {user_path}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        job = VerificationJob.objects.create()
+        # Incremental mode only reprocesses candidates whose scorecard or master
+        # row changed since the last complete job on this folder.
+        incremental = str(request.data.get('incremental', '')).lower() in ('true', '1', 'yes')
+        # Small jobs run on the interactive queue, so a bulk job never holds them up.
+        priority, error = _get_job_priority(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = VerificationJob.objects.create(source_folder_path=user_path, incremental=incremental, priority=priority)
         upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', str(job.id))
         os.makedirs(upload_dir, exist_ok=True)
         
@@ -40,7 +87,9 @@ class StartVerificationAPIView(APIView):
             for chunk in master_csv.chunks(): f.write(chunk)
 
 
-        run_verification_pipeline.delay(job.id, master_csv_path, source_folder_path)
+        run_verification_pipeline.apply_async(
+            (job.id, master_csv_path, source_folder_path), queue=get_pipeline_queue(job.priority),
+        )
 
         serializer = VerificationJobSerializer(job)
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
@@ -49,7 +98,226 @@ class JobStatusAPIView(APIView):
     def get(self, request, job_id, *args, **kwargs):
         try:
             job = VerificationJob.objects.get(id=job_id)
-            serializer = VerificationJobSerializer(job)
+            # ?results=false skips embedding every result row.
+            if request.query_params.get('results', 'true').lower() in ('false', '0', 'no'):
+                serializer = VerificationJobSummarySerializer(job)
+            else:
+                serializer = VerificationJobSerializer(job)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except VerificationJob.DoesNotExist:
-            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+class JobProgressAPIView(APIView):
+    """
+    Incremental job progress for long-polling clients.
+
+    GET /progress/<job_id>/?since=<cursor>&wait=<seconds> returns the job's
+    counters plus only the results added after `since` (the `cursor` of the
+    previous response; 0 for the first call), up to the job's committed
+    high-water mark. If there is nothing new and the job is still running,
+    the request waits up to `wait` seconds for the pipeline to publish
+    progress before answering. When the process already has
+    PROGRESS_MAX_WAITERS requests waiting, it answers at once instead, and
+    `retry_after` tells the client how many seconds to wait before polling
+    again.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+            wait = min(max(float(request.query_params.get('wait', 0)), 0), getattr(settings, 'PROGRESS_MAX_WAIT_SECONDS', 25))
+        except ValueError:
+            return Response({'error': "'since' and 'wait' must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with long_poll_slot(wait) as allowed_wait:
+            throttled = wait > 0 and not allowed_wait
+            wait = allowed_wait
+            # Subscribe before the first read, so progress published in between is not missed.
+            pubsub = subscribe(job_id) if wait else None
+            try:
+                deadline = time.monotonic() + wait
+                while True:
+                    try:
+                        job = VerificationJob.objects.get(id=job_id)
+                    except VerificationJob.DoesNotExist:
+                        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+                    limit = getattr(settings, 'PROGRESS_PAGE_SIZE', 500)
+                    new_results = list(
+                        # Rows above the mark may still have lower ids committing after them.
+                        VerificationResult.objects.filter(job_id=job_id, id__gt=since, id__lte=job.results_committed_through)
+                        .order_by('id').values_list('id', 'data')[:limit + 1]
+                    )
+                    finished = job.status in ('COMPLETE', 'FAILED')
+                    remaining = deadline - time.monotonic()
+                    if new_results or finished or remaining <= 0:
+                        break
+                    wait_for_progress(pubsub, remaining)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+        has_more = len(new_results) > limit
+        new_results = new_results[:limit]
+        return Response({
+            'id': job.id,
+            'status': job.status,
+            'details': job.details,
+            'total': job.total_candidates,
+            'scan_complete': job.scan_complete,
+            'processed': job.processed_count,
+            'failed': job.failed_count,
+            'cursor': new_results[-1][0] if new_results else since,
+            'has_more': has_more,
+            'results': [{'data': data} for _, data in new_results],
+            'retry_after': getattr(settings, 'PROGRESS_FALLBACK_POLL_SECONDS', 1) if throttled else 0,
+        }, status=status.HTTP_200_OK)
+
+
+# Every *_status key of a result row.
+RESULT_STATUS_FIELDS = [column for column in REPORT_COLUMNS if column.endswith('_status')]
+
+
+def _filter_results_by_status(queryset, status_filter):
+    """
+    Applies a review-table status filter to a VerificationResult queryset:
+    'mismatch' (any status False), 'verified' (every status True) or 'all'.
+    Returns None for an unknown filter.
+    """
+    if status_filter == 'mismatch':
+        return queryset.filter(reduce(or_, (Q(**{f'data__{field}': 'False'}) for field in RESULT_STATUS_FIELDS)))
+    if status_filter == 'verified':
+        return queryset.filter(**{f'data__{field}': 'True' for field in RESULT_STATUS_FIELDS})
+    if status_filter == 'all':
+        return queryset
+    return None
+
+
+class JobResultsAPIView(APIView):
+    """
+    One page of a job's results, for the review table.
+
+    GET /results/<job_id>/ takes these query parameters:
+        after   - keyset cursor: only results with a larger id (the
+                  `next_after` of the previous page; 0 for the first page).
+        limit   - page size, up to RESULTS_MAX_PAGE_SIZE.
+        status  - 'mismatch' for rows with any False status, 'verified' for
+                  rows where every status is True, or 'all' (default).
+        fields  - comma-separated result keys to return. Only those keys are
+                  read from the database instead of the whole row.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        params = request.query_params
+        try:
+            after = max(int(params.get('after', 0)), 0)
+            limit = int(params.get('limit', getattr(settings, 'RESULTS_PAGE_SIZE', 100)))
+        except ValueError:
+            return Response({'error': "'after' and 'limit' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), getattr(settings, 'RESULTS_MAX_PAGE_SIZE', 1000))
+
+        fields = [field.strip() for field in params.get('fields', '').split(',') if field.strip()]
+        unknown = [field for field in fields if field not in REPORT_COLUMNS]
+        if unknown:
+            return Response({'error': f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not VerificationJob.objects.filter(id=job_id).exists():
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        queryset = VerificationResult.objects.filter(job_id=job_id, id__gt=after).order_by('id')
+
+        queryset = _filter_results_by_status(queryset, params.get('status', 'all'))
+        if queryset is None:
+            return Response({'error': "'status' must be 'all', 'mismatch' or 'verified'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The JSON values are returned as they were stored, without another
+        # encode/decode round-trip; a projection only extracts the named keys.
+        if fields:
+            rows = list(queryset.values('id', **{f'_{field}': KT(f'data__{field}') for field in fields})[:limit + 1])
+            results = [{'result_id': row['id'], 'data': {field: row[f'_{field}'] for field in fields}} for row in rows]
+        else:
+            results = [{'result_id': pk, 'data': data} for pk, data in queryset.values_list('id', 'data')[:limit + 1]]
+
+        has_more = len(results) > limit
+        results = results[:limit]
+        return Response({
+            'job_id': job_id,
+            'next_after': results[-1]['result_id'] if results else after,
+            'has_more': has_more,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+def _iter_result_data(queryset, chunk_size):
+    """
+    Yields the `data` of every result in id order, fetching `chunk_size` rows
+    per query. Unlike .iterator(), this stays bounded on MySQL, whose client
+    buffers a query's entire result set.
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).values_list('id', 'data')[:chunk_size])
+        for _, data in chunk:
+            yield data
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+class _Echo:
+    """A file-like object whose write() just returns the value, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+class JobExportAPIView(APIView):
+    """
+    Downloads a job's verification report.
+
+    GET /export/<job_id>/?file_type=csv|xlsx&status=all|mismatch|verified
+    CSV is streamed row by row. XLSX is written to a temporary file with
+    openpyxl's write-only workbook and then streamed from disk. Either way
+    the rows are read in keyset-paginated chunks, so memory use does not
+    grow with the job size.
+    """
+    def get(self, request, job_id, *args, **kwargs):
+        file_type = request.query_params.get('file_type', 'csv').lower()
+        if file_type not in ('csv', 'xlsx'):
+            return Response({'error': "'file_type' must be 'csv' or 'xlsx'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not VerificationJob.objects.filter(id=job_id).exists():
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        status_filter = request.query_params.get('status', 'all')
+        queryset = _filter_results_by_status(VerificationResult.objects.filter(job_id=job_id).order_by('id'), status_filter)
+        if queryset is None:
+            return Response({'error': "'status' must be 'all', 'mismatch' or 'verified'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            [data.get(column, '') for column in REPORT_COLUMNS]
+            for data in _iter_result_data(queryset, getattr(settings, 'EXPORT_CHUNK_SIZE', 2000))
+        )
+        file_name = f"job_{job_id}_{status_filter}_report.{file_type}"
+
+        if file_type == 'csv':
+            writer = csv.writer(_Echo())
+            response = StreamingHttpResponse(
+                (writer.writerow(row) for row in itertools.chain([REPORT_COLUMNS], rows)),
+                content_type='text/csv',
+            )
+            response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+            return response
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Report')
+        sheet.append(REPORT_COLUMNS)
+        for row in rows:
+            sheet.append(row)
+        report_file = tempfile.TemporaryFile()
+        workbook.save(report_file)
+        report_file.seek(0)
+        return FileResponse(
+            report_file,
+            as_attachment=True,
+            filename=file_name,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
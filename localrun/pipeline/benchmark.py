@@ -0,0 +1,213 @@
+# pipeline/benchmark.py
+import csv
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from .workers.load_csv_worker import MASTER_COLUMN_POSITIONS
+
+# What the mock model reads off every synthetic scorecard. The images differ
+# per candidate (ID, layout noise), so nothing is served from the extraction
+# cache, but the values are the same, so the mock can answer without OCR.
+BENCHMARK_VALUES = {
+    'name': 'ANANYA RAO',
+    'father_name': 'SURESH RAO',
+    'gate_year': '2023',
+    'registration_number': 'CS23S12085106',
+    'gate_paper_code': 'CS',
+    'gate_valid_score': '612',
+    'gate_mark': '54.33',
+    'gate_rank': '1874',
+}
+# A4 at 150 dpi, about what the scanned scorecards come in at.
+PAGE_SIZE = (1240, 1754)
+FIRST_APPLICANT_ID = 500000
+
+
+def generate_dataset(root, count, file_format='jpg', mismatch_rate=0.0, seed=0):
+    """
+    Writes `count` synthetic candidates in the layout `scan_for_gate_scorecards`
+    expects (root/documents/can_<id>/gate_scorecard.<format>) and a master CSV
+    with their rows, columns in `load_and_prepare_csv` order and no header row
+    (it reads every line as data).
+
+    A `mismatch_rate` fraction of the master rows get a different registration
+    number, so that share of candidates goes through the focused re-extraction.
+
+    Returns:
+        tuple: (documents folder, master CSV path)
+    """
+    rng = random.Random(seed)
+    documents_dir = os.path.join(root, 'documents')
+    os.makedirs(documents_dir, exist_ok=True)
+    master_csv_path = os.path.join(root, 'master.csv')
+    columns = sorted(MASTER_COLUMN_POSITIONS, key=MASTER_COLUMN_POSITIONS.get)
+
+    with open(master_csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for applicant_id in benchmark_applicant_ids(count):
+            row = dict(BENCHMARK_VALUES, basic_id=applicant_id)
+            if rng.random() < mismatch_rate:
+                row['registration_number'] = f"CS23S1{rng.randrange(10 ** 7):07d}"
+            writer.writerow([row.get(column, '') for column in columns])
+
+            candidate_dir = os.path.join(documents_dir, f"can_{applicant_id}")
+            os.makedirs(candidate_dir, exist_ok=True)
+            image = render_scorecard(applicant_id, rng)
+            if file_format == 'pdf':
+                image.save(os.path.join(candidate_dir, 'gate_scorecard.pdf'), 'PDF', resolution=150)
+            else:
+                image.save(os.path.join(candidate_dir, f"gate_scorecard.{file_format}"), quality=90)
+
+    print(f"[BENCHMARK] Generated {count} synthetic {file_format} scorecards in {documents_dir}.")
+    return documents_dir, master_csv_path
+
+
+def benchmark_applicant_ids(count):
+    """The applicant IDs `generate_dataset` gives its `count` candidates."""
+    return [str(FIRST_APPLICANT_ID + number) for number in range(count)]
+
+
+def render_scorecard(applicant_id, rng):
+    """Draws a scanned-looking GATE scorecard page holding BENCHMARK_VALUES."""
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    title_font = ImageFont.load_default(size=44)
+    font = ImageFont.load_default(size=30)
+
+    # Small offsets per candidate, like pages never sitting the same way on a scanner.
+    left, top = 110 + rng.randrange(-20, 21), 120 + rng.randrange(-20, 21)
+    draw.text((left, top), f"GATE {BENCHMARK_VALUES['gate_year']} Scorecard", font=title_font, fill=0)
+    draw.text((left, top + 70), f"Application {applicant_id}", font=font, fill=60)
+
+    fields = [
+        ("Name of Candidate", BENCHMARK_VALUES['name']),
+        ("Parent's/Guardian's Name", BENCHMARK_VALUES['father_name']),
+        ("Registration Number", BENCHMARK_VALUES['registration_number']),
+        ("Test Paper", BENCHMARK_VALUES['gate_paper_code']),
+        ("GATE Score", BENCHMARK_VALUES['gate_valid_score']),
+        ("Marks out of 100", BENCHMARK_VALUES['gate_mark']),
+        ("All India Rank", BENCHMARK_VALUES['gate_rank']),
+    ]
+    row_top = top + 170
+    for label, value in fields:
+        draw.rectangle((left, row_top, PAGE_SIZE[0] - left, row_top + 70), outline=0, width=2)
+        draw.text((left + 20, row_top + 18), label, font=font, fill=0)
+        draw.text((left + 560, row_top + 18), value, font=font, fill=0)
+        row_top += 70
+
+    for line in range(12):
+        y = row_top + 80 + line * 45
+        draw.text((left, y), "This scorecard is valid for three years from the date of results.", font=font, fill=90)
+
+    # Scanner grain, so the JPEG encoder has realistic work to do.
+    pixels = np.asarray(page, dtype=np.int16)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 6, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8)).convert('RGB')
+
+
+def benchmark_reply(content_parts):
+    """
+    The reply a well-behaved model would give for a chat-completion request,
+    based on its prompt and how many images it holds.
+    """
+    prompt = ' '.join(part.get('text', '') for part in content_parts if part.get('type') == 'text')
+    image_count = sum(1 for part in content_parts if part.get('type') == 'image_url')
+    if 'extract ONLY' in prompt:
+        return BENCHMARK_VALUES['registration_number']
+
+    values = ','.join([
+        BENCHMARK_VALUES['name'], BENCHMARK_VALUES['father_name'], BENCHMARK_VALUES['registration_number'],
+        BENCHMARK_VALUES['gate_year'], BENCHMARK_VALUES['gate_valid_score'], BENCHMARK_VALUES['gate_mark'],
+        BENCHMARK_VALUES['gate_rank'],
+    ])
+    if image_count > 1:
+        return '\n'.join(f"{number}, {values}" for number in range(1, image_count + 1))
+    return values
+
+
+class MockVLMServer:
+    """
+    A local stand-in for llama-server's OpenAI-compatible /v1/chat/completions
+    endpoint, answering with `benchmark_reply`.
+
+    Every request takes `latency` seconds per image (varied by +/- `jitter`
+    as a fraction). `error_rate` of the requests fail with HTTP 500 and
+    `garbage_rate` get a reply that does not parse, to exercise the retries.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, garbage_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.garbage_rate = garbage_rate
+        self.stats = {'requests': 0, 'images': 0, 'errors': 0, 'garbage': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                status, reply = mock._answer(body)
+                payload = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': reply}}]}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-vlm', daemon=True)
+        self._thread.start()
+        print(f"[BENCHMARK] Mock VLM server listening on {self.url}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _answer(self, body):
+        content = body.get('messages', [{}])[0].get('content', [])
+        image_count = max(1, sum(1 for part in content if part.get('type') == 'image_url'))
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['images'] += image_count
+            roll = self._rng.random()
+            delay = self.latency * image_count * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        time.sleep(max(0.0, delay))
+
+        if roll < self.error_rate:
+            with self._lock:
+                self.stats['errors'] += 1
+            return 500, 'Injected server error'
+        if roll < self.error_rate + self.garbage_rate:
+            with self._lock:
+                self.stats['garbage'] += 1
+            return 200, 'I am not able to read this document.'
+        return 200, benchmark_reply(content)
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else 0.0
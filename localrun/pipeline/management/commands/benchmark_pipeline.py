@@ -0,0 +1,146 @@
+# pipeline/management/commands/benchmark_pipeline.py
+import json
+import resource
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from localrun.celery import app
+from pipeline import metrics
+from pipeline.benchmark import MockVLMServer, benchmark_applicant_ids, generate_dataset, percentile
+from pipeline.models import ParsedResult, VerificationJob
+from pipeline.tasks import run_verification_pipeline
+from pipeline.workers.preprocess_engine import shutdown_preprocess_executor
+from pipeline.workers.scanner_worker import forget_scan_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the verification pipeline in-process on synthetic scorecards against a mock VLM "
+        "server and reports docs/sec, p50/p95 per stage and peak RSS. It writes to the configured "
+        "database and restores it afterwards; point DB_NAME at a separate database to keep it untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=50, help="Number of synthetic candidates.")
+        parser.add_argument('--format', choices=['jpg', 'png', 'pdf'], default='jpg',
+                            help="Scorecard file type. pdf needs POPPLER_PATH.")
+        parser.add_argument('--latency', type=float, default=0.5, help="Mock model seconds per image.")
+        parser.add_argument('--jitter', type=float, default=0.2, help="Latency variation, as a fraction.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of mock requests failing with HTTP 500.")
+        parser.add_argument('--garbage-rate', type=float, default=0.0, help="Share of mock replies that do not parse.")
+        parser.add_argument('--mismatch-rate', type=float, default=0.0,
+                            help="Share of candidates whose registration number needs re-extraction.")
+        parser.add_argument('--use-cache', action='store_true', help="Keep the extraction cache enabled.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--work-dir', help="Folder for the synthetic data (kept). Defaults to a temporary folder.")
+        parser.add_argument('--keep-job', action='store_true', help="Keep the benchmark job and its results in the database (ParsedResult is restored either way).")
+        parser.add_argument('--output', help="Also write the report as JSON to this file.")
+        parser.add_argument('--min-docs-per-sec', type=float,
+                            help="Fail (non-zero exit) if throughput is below this, e.g. in CI.")
+
+    def handle(self, *args, **options):
+        work_dir = options['work_dir'] or tempfile.mkdtemp(prefix='pipeline-benchmark-')
+        server = MockVLMServer(
+            latency=options['latency'], jitter=options['jitter'], error_rate=options['error_rate'],
+            garbage_rate=options['garbage_rate'], seed=options['seed'],
+        )
+        job = None
+        documents_dir = None
+        # The job upserts ParsedResult rows for the synthetic applicant IDs, which
+        # may belong to real applicants too; those rows are put back afterwards.
+        applicant_ids = benchmark_applicant_ids(options['candidates'])
+        saved_parsed_results = list(ParsedResult.objects.filter(id__in=applicant_ids))
+        try:
+            documents_dir, master_csv_path = generate_dataset(
+                work_dir, options['candidates'], options['format'], options['mismatch_rate'], options['seed'],
+            )
+            server.start()
+            settings.LOCAL_MODEL_URL = server.url
+            settings.EXTRACTION_CACHE_ENABLED = options['use_cache']
+            # The batch tasks run in this process, so every stage is collected below.
+            app.conf.task_always_eager = True
+            app.conf.task_eager_propagates = True
+
+            job = VerificationJob.objects.create(source_folder_path=documents_dir)
+            with metrics.collecting(include_nested=True) as run_metrics:
+                start = time.perf_counter()
+                run_verification_pipeline.delay(job.id, master_csv_path, documents_dir)
+                elapsed = time.perf_counter() - start
+            job.refresh_from_db()
+            # Reaps the pool processes, so their peak RSS is counted below.
+            shutdown_preprocess_executor()
+
+            report = self._build_report(job, elapsed, run_metrics, server.stats)
+            self._print_report(report)
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    json.dump(report, f, indent=2)
+                self.stdout.write(f"Report written to {options['output']}")
+        finally:
+            server.stop()
+            if job is not None and not options['keep_job']:
+                job.delete()
+            ParsedResult.objects.filter(id__in=applicant_ids).delete()
+            ParsedResult.objects.bulk_create(saved_parsed_results)
+            if documents_dir is not None and not options['work_dir']:
+                forget_scan_manifest(documents_dir)
+            if not options['work_dir']:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        if job.status != 'COMPLETE':
+            raise CommandError(f"Benchmark job ended {job.status}: {job.details}")
+        if options['min_docs_per_sec'] and report['docs_per_sec'] < options['min_docs_per_sec']:
+            raise CommandError(
+                f"Throughput {report['docs_per_sec']:.2f} docs/sec is below the required {options['min_docs_per_sec']:.2f}."
+            )
+
+    def _build_report(self, job, elapsed, run_metrics, server_stats):
+        stages = {}
+        for stage in metrics.STAGES:
+            if stage not in run_metrics.stages:
+                continue
+            count, total, slowest = run_metrics.stages[stage]
+            samples = run_metrics.samples.get(stage, [])
+            stages[stage] = {
+                'count': count,
+                'total_seconds': round(total, 4),
+                'p50_seconds': round(percentile(samples, 50), 4),
+                'p95_seconds': round(percentile(samples, 95), 4),
+                'max_seconds': round(slowest, 4),
+            }
+        # ru_maxrss is in kilobytes on Linux. Children are the preprocess pool processes.
+        return {
+            'status': job.status,
+            'details': job.details,
+            'candidates': job.total_candidates,
+            'failed': job.failed_count,
+            'elapsed_seconds': round(elapsed, 3),
+            'docs_per_sec': round(job.total_candidates / elapsed, 3) if elapsed else 0.0,
+            'stages': stages,
+            'events': {event: n for event, n in run_metrics.events.items() if n},
+            'mock_server': dict(server_stats),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'peak_child_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        }
+
+    def _print_report(self, report):
+        self.stdout.write("")
+        self.stdout.write(f"Job: {report['status']} - {report['details']}")
+        self.stdout.write(
+            f"{report['candidates']} candidates in {report['elapsed_seconds']:.2f}s: "
+            f"{report['docs_per_sec']:.2f} docs/sec ({report['failed']} failed)"
+        )
+        self.stdout.write(f"{'stage':<15}{'count':>8}{'total s':>10}{'p50 s':>10}{'p95 s':>10}{'max s':>10}")
+        for stage, timing in report['stages'].items():
+            self.stdout.write(
+                f"{stage:<15}{timing['count']:>8}{timing['total_seconds']:>10.3f}{timing['p50_seconds']:>10.4f}"
+                f"{timing['p95_seconds']:>10.4f}{timing['max_seconds']:>10.3f}"
+            )
+        if report['events']:
+            self.stdout.write("Events: " + ", ".join(f"{event}={n}" for event, n in report['events'].items()))
+        self.stdout.write("Mock server: " + ", ".join(f"{key}={value}" for key, value in report['mock_server'].items()))
+        self.stdout.write(f"Peak RSS: {report['peak_rss_mb']:.1f} MB (preprocess workers: {report['peak_child_rss_mb']:.1f} MB)")
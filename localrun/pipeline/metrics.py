@@ -0,0 +1,281 @@
+# pipeline/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Pipeline stages that are timed. A stage's count is the number of candidates
+# it covered, so total / count is the time per candidate even for stages that
+# handle a whole batch in one call.
+STAGES = [
+    'scan',           # Walking the source folder
+    'fingerprint',    # Hashing scorecards for incremental jobs
+    'load_master',    # Parsing the master CSV into the MasterIndex
+    'load',           # Decoding the scorecard (poppler for PDFs)
+    'orient',         # Orientation check (Tesseract OSD when inconclusive)
+    'crop',           # Region-of-interest crop
+    'compress',       # JPEG size targeting
+    'ocr',            # Tesseract fast path
+    'extract',        # VLM extraction
+    'retry_extract',  # Focused registration ID re-extraction
+    'derive',         # Paper code derivation
+    'verify',         # Comparison against the master data
+    'db_write',       # Saving result rows
+]
+
+# Counted events.
+EVENTS = [
+    'cache_hits',             # Extractions answered from the extraction cache
+    'cache_misses',           # Extractions the cache could not answer, sent to the model
+    'extract_retries',        # Extraction attempts repeated after a parse error
+    'parse_errors',           # Model replies that could not be parsed
+    'api_errors',             # Requests to the model that failed outright
+    'compression_fallbacks',  # Images kept at best effort above the size target
+    'compression_failures',   # Scorecards that could not be compressed at all
+    'orientation_failures',   # Scorecards processed without orientation correction
+    'ocr_verified',           # Candidates fully verified by the OCR fast path
+    'db_write_failures',      # Result rows that could not be saved
+]
+
+_current = ContextVar('pipeline_metrics', default=None)
+
+
+class StageMetrics:
+    """
+    Stage timings and event counts collected while processing some candidates.
+    Safe to record into from several threads (e.g. a batch's extraction threads).
+    """
+
+    def __init__(self, include_nested=False):
+        self.stages = {}   # stage -> [count, total seconds, max seconds]
+        self.events = {}   # event -> count
+        self.samples = {}  # stage -> seconds per candidate of every call, for percentiles
+        self.include_nested = include_nested
+        self._sink = None  # The enclosing collector that receives this one's values
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, count=1):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            if count:
+                self.samples.setdefault(stage, []).append(seconds / count)
+
+    def count(self, event, n=1):
+        with self._lock:
+            self.events[event] = self.events.get(event, 0) + n
+
+    def merge(self, other):
+        """Adds in another StageMetrics, or its `as_dict()` (e.g. from a preprocess worker)."""
+        if isinstance(other, StageMetrics):
+            other = other.as_dict()
+        with self._lock:
+            for stage, (n, total, slowest) in other.get('stages', {}).items():
+                entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += n
+                entry[1] += total
+                entry[2] = max(entry[2], slowest)
+            for event, n in other.get('events', {}).items():
+                self.events[event] = self.events.get(event, 0) + n
+            for stage, samples in other.get('samples', {}).items():
+                self.samples.setdefault(stage, []).extend(samples)
+
+    def as_dict(self):
+        """Plain, picklable copy of the collected values."""
+        with self._lock:
+            return {
+                'stages': {stage: list(entry) for stage, entry in self.stages.items()},
+                'events': dict(self.events),
+                'samples': {stage: list(samples) for stage, samples in self.samples.items()},
+            }
+
+
+@contextmanager
+def collecting(include_nested=False):
+    """
+    Collects the timings and events recorded by `timed` and `count` in this
+    context (thread or task) into a new StageMetrics.
+
+    With `include_nested`, the collector also receives the values of every
+    collector opened inside it once they close, e.g. those of the tasks of
+    an eagerly run job. Other collectors only hold what was recorded
+    directly in them, so the job's totals are never saved twice.
+    """
+    outer = _current.get()
+    metrics = StageMetrics(include_nested)
+    if outer is not None:
+        metrics._sink = outer if outer.include_nested else outer._sink
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        if metrics._sink is not None:
+            metrics._sink.merge(metrics)
+
+
+@contextmanager
+def timed(stage, count=1):
+    """Times the block as `stage`. Does nothing outside `collecting()`."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(stage, time.perf_counter() - start, count)
+
+
+def timed_iter(stage, iterable):
+    """
+    Yields from `iterable`, timing only the time spent waiting for its items
+    as `stage` (one count per item), not the caller's work in between.
+    """
+    iterator = iter(iterable)
+    elapsed, items = 0.0, 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            items += 1
+            yield item
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.observe(stage, elapsed, items)
+
+
+def count(event, n=1):
+    """Counts an event. Does nothing outside `collecting()`."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(event, n)
+
+
+def record(collected):
+    """Adds metrics collected elsewhere (a StageMetrics or its `as_dict()`) to the current collector."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.merge(collected)
+
+
+def init_job_metrics(job_id):
+    """Creates the job's zeroed metric rows, so batches only ever update them."""
+    from .models import JobStageMetric
+    JobStageMetric.objects.bulk_create(
+        [JobStageMetric(job_id=job_id, kind=JobStageMetric.STAGE, name=stage) for stage in STAGES]
+        + [JobStageMetric(job_id=job_id, kind=JobStageMetric.EVENT, name=event) for event in EVENTS],
+        ignore_conflicts=True,
+    )
+
+
+def save_job_metrics(job_id, metrics):
+    """
+    Adds collected metrics to the job's totals with atomic increments, so
+    concurrent batches of the same job never overwrite each other. Best
+    effort: metrics must never fail a batch.
+    """
+    from django.db import transaction
+    from django.db.models import F
+    from django.db.models.functions import Greatest
+    from .models import JobStageMetric
+
+    entries = [(JobStageMetric.STAGE, stage, n, total, slowest)
+               for stage, (n, total, slowest) in metrics.stages.items()]
+    entries += [(JobStageMetric.EVENT, event, n, 0.0, 0.0) for event, n in metrics.events.items() if n]
+    try:
+        with transaction.atomic():
+            for kind, name, n, total, slowest in entries:
+                rows = JobStageMetric.objects.filter(job_id=job_id, kind=kind, name=name)
+                updated = rows.update(
+                    count=F('count') + n,
+                    total_seconds=F('total_seconds') + total,
+                    max_seconds=Greatest(F('max_seconds'), slowest),
+                )
+                if not updated:
+                    JobStageMetric.objects.create(
+                        job_id=job_id, kind=kind, name=name, count=n, total_seconds=total, max_seconds=slowest,
+                    )
+    except Exception as e:
+        print(f"[METRICS] WARNING: Could not save metrics for Job {job_id}: {e}")
+
+
+def summarise_job_metrics(job_id):
+    """
+    Returns the job's metrics as stored on VerificationJob.stage_timings:
+    {'stages': {stage: {count, total_seconds, mean_seconds, max_seconds}},
+     'events': {event: count}}, leaving out stages and events that never occurred.
+    """
+    from .models import JobStageMetric
+    summary = {'stages': {}, 'events': {}}
+    for metric in JobStageMetric.objects.filter(job_id=job_id, count__gt=0):
+        if metric.kind == JobStageMetric.EVENT:
+            summary['events'][metric.name] = metric.count
+            continue
+        summary['stages'][metric.name] = {
+            'count': metric.count,
+            'total_seconds': round(metric.total_seconds, 3),
+            'mean_seconds': round(metric.total_seconds / metric.count, 3),
+            'max_seconds': round(metric.max_seconds, 3),
+        }
+    return summary
+
+
+def render_prometheus_metrics():
+    """
+    Renders the pipeline metrics, summed over all jobs, in the Prometheus text
+    exposition format. They are read from the database, so every worker
+    process is included.
+    """
+    from django.db.models import Count, Max, Sum
+    from .models import JobStageMetric, VerificationJob
+
+    totals = (JobStageMetric.objects
+              .values('kind', 'name')
+              .annotate(calls=Sum('count'), seconds=Sum('total_seconds'), slowest=Max('max_seconds'))
+              .order_by('kind', 'name'))
+    stages = [row for row in totals if row['kind'] == JobStageMetric.STAGE]
+    events = [row for row in totals if row['kind'] == JobStageMetric.EVENT]
+
+    lines = [
+        '# HELP rac_pipeline_stage_seconds Time spent in each pipeline stage; the count is candidates processed.',
+        '# TYPE rac_pipeline_stage_seconds summary',
+    ]
+    for row in stages:
+        lines.append(f'rac_pipeline_stage_seconds_sum{{stage="{row["name"]}"}} {row["seconds"] or 0:.6f}')
+        lines.append(f'rac_pipeline_stage_seconds_count{{stage="{row["name"]}"}} {row["calls"] or 0}')
+    lines += [
+        '# HELP rac_pipeline_stage_max_seconds Slowest single call of each pipeline stage.',
+        '# TYPE rac_pipeline_stage_max_seconds gauge',
+    ]
+    for row in stages:
+        lines.append(f'rac_pipeline_stage_max_seconds{{stage="{row["name"]}"}} {row["slowest"] or 0:.6f}')
+    lines += [
+        '# HELP rac_pipeline_events_total Retries, parse errors, fallbacks and other pipeline events.',
+        '# TYPE rac_pipeline_events_total counter',
+    ]
+    for row in events:
+        lines.append(f'rac_pipeline_events_total{{event="{row["name"]}"}} {row["calls"] or 0}')
+
+    job_totals = VerificationJob.objects.aggregate(processed=Sum('processed_count'), failed=Sum('failed_count'))
+    lines += [
+        '# HELP rac_pipeline_candidates_total Candidates handled by verification jobs.',
+        '# TYPE rac_pipeline_candidates_total counter',
+        f'rac_pipeline_candidates_total{{outcome="processed"}} {job_totals["processed"] or 0}',
+        f'rac_pipeline_candidates_total{{outcome="failed"}} {job_totals["failed"] or 0}',
+        '# HELP rac_pipeline_jobs Verification jobs by status.',
+        '# TYPE rac_pipeline_jobs gauge',
+    ]
+    jobs_by_status = dict(VerificationJob.objects.values_list('status').annotate(total=Count('id')))
+    for job_status, _ in VerificationJob.STATUS_CHOICES:
+        lines.append(f'rac_pipeline_jobs{{status="{job_status}"}} {jobs_by_status.get(job_status, 0)}')
+    return '\n'.join(lines) + '\n'
@@ -1,6 +1,7 @@
 # pipeline/models.py
 
 from django.db import models
+from django.utils import timezone
 
 class VerificationJob(models.Model):
     """Represents a single, complete run of the verification pipeline."""
@@ -11,9 +12,23 @@ class VerificationJob(models.Model):
         ('FAILED', 'Failed'),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    PRIORITY_CHOICES = [
+        ('INTERACTIVE', 'Interactive'),
+        ('BULK', 'Bulk'),
+    ]
+    priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='BULK', help_text="Interactive jobs run on their own Celery queue, ahead of bulk jobs.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     details = models.TextField(blank=True, null=True, help_text="Log messages or error details.")
+    source_folder_path = models.CharField(max_length=500, blank=True, null=True)
+    incremental = models.BooleanField(default=False, help_text="Only reprocess candidates that changed since the previous job.")
+    total_candidates = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0, help_text="Candidates handled so far, including carried-forward ones.")
+    failed_count = models.PositiveIntegerField(default=0)
+    carried_forward = models.PositiveIntegerField(default=0, help_text="Unchanged candidates whose previous result was copied forward.")
+    results_committed_through = models.PositiveBigIntegerField(default=0, help_text="Id of the job's newest committed result; every lower one is committed too.")
+    scan_complete = models.BooleanField(default=False, help_text="Set once the scan has finished and total_candidates is final.")
+    stage_timings = models.JSONField(default=dict, blank=True, help_text="Per-stage timings and event counts, summarised when the job finishes.")
     
     def __str__(self): 
         return f"Job {self.id} - {self.status}"
@@ -27,6 +42,47 @@ class VerificationResult(models.Model):
     def __str__(self):
         return f"Result for Job {self.job.id} - ID {self.data.get('id', 'N/A')}"
     
+class CandidateFingerprint(models.Model):
+    """
+    Records what a candidate's inputs looked like when a job processed them,
+    so an incremental job can tell which candidates changed since then.
+    """
+    job = models.ForeignKey(VerificationJob, related_name='fingerprints', on_delete=models.CASCADE)
+    applicant_id = models.CharField(max_length=50)
+    file_path = models.CharField(max_length=500)
+    file_size = models.BigIntegerField()
+    file_mtime = models.FloatField()
+    content_hash = models.CharField(max_length=64)
+    master_row_hash = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('job', 'applicant_id')
+
+    def __str__(self):
+        return f"Fingerprint for Job {self.job_id} - ID {self.applicant_id}"
+
+class JobStageMetric(models.Model):
+    """
+    A job's running total for one timed pipeline stage or counted event,
+    incremented by every batch (see pipeline/metrics.py).
+    """
+    STAGE = 'stage'
+    EVENT = 'event'
+    KIND_CHOICES = [(STAGE, 'Stage'), (EVENT, 'Event')]
+
+    job = models.ForeignKey(VerificationJob, related_name='stage_metrics', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+    total_seconds = models.FloatField(default=0.0)
+    max_seconds = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = ('job', 'kind', 'name')
+
+    def __str__(self):
+        return f"{self.kind} '{self.name}' for Job {self.job_id}"
+
 class ParsedResult(models.Model):
     id = models.CharField(max_length=50, primary_key=True)   # file/student id
 
@@ -65,4 +121,19 @@ class ParsedResult(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"ParsedResult({self.id})"
\ No newline at end of file
+        return f"ParsedResult({self.id})"
+
+class ExtractionCacheEntry(models.Model):
+    """
+    A cached VLM response, keyed by the SHA-256 of the compressed image bytes,
+    the prompt text and the model identifier.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    model_name = models.CharField(max_length=100)
+    response = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"ExtractionCacheEntry({self.key[:12]}..., hits={self.hit_count})"
@@ -0,0 +1,105 @@
+# pipeline/progress.py
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+
+# Redis pub/sub channel a job's progress events are published on.
+CHANNEL_PREFIX = 'pipeline:job-progress:'
+
+# After a failed publish, Redis is left alone for this long, so a missing
+# Redis never slows the pipeline down by a connect timeout per event.
+RETRY_AFTER_SECONDS = 30
+
+_client = None
+_unavailable_until = 0.0
+
+# Long-poll requests of this process that are currently waiting.
+_waiters = 0
+_waiters_lock = threading.Lock()
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+    return _client
+
+
+def publish_progress(job_id, event, **data):
+    """
+    Tells every waiting progress request that the job changed. Best effort:
+    a missing Redis only means waiting clients notice on their next check.
+    """
+    global _unavailable_until
+    if time.monotonic() < _unavailable_until:
+        return
+    try:
+        _get_client().publish(f"{CHANNEL_PREFIX}{job_id}", json.dumps({'event': event, **data}))
+    except Exception as e:
+        _unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+        print(f"[PROGRESS] WARNING: Could not publish '{event}' for Job {job_id}: {e}")
+
+
+def subscribe(job_id):
+    """Returns a pub/sub subscription to the job's progress events, or None if Redis is unavailable."""
+    try:
+        pubsub = _get_client().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(f"{CHANNEL_PREFIX}{job_id}")
+        return pubsub
+    except Exception as e:
+        print(f"[PROGRESS] WARNING: Could not subscribe to Job {job_id}, falling back to polling: {e}")
+        return None
+
+
+def wait_for_progress(pubsub, timeout):
+    """
+    Blocks until a progress event arrives or `timeout` seconds pass. Without
+    a subscription it just sleeps for PROGRESS_FALLBACK_POLL_SECONDS, so the
+    caller re-checks the database.
+
+    Returns:
+        bool: True if an event arrived.
+    """
+    if pubsub is None:
+        time.sleep(min(timeout, getattr(settings, 'PROGRESS_FALLBACK_POLL_SECONDS', 1)))
+        return False
+
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if pubsub.get_message(timeout=remaining) is not None:
+                return True
+    except Exception as e:
+        print(f"[PROGRESS] WARNING: Lost the progress subscription: {e}")
+        time.sleep(min(max(deadline - time.monotonic(), 0), getattr(settings, 'PROGRESS_FALLBACK_POLL_SECONDS', 1)))
+        return False
+
+
+@contextmanager
+def long_poll_slot(wait):
+    """
+    Claims one of this process's PROGRESS_MAX_WAITERS long-poll slots for a
+    request that wants to wait `wait` seconds. Yields the wait it may use:
+    `wait` itself, or 0 when every slot is taken, so a waiting request never
+    ties up more than the capped number of server threads.
+    """
+    global _waiters
+    claimed = False
+    if wait > 0:
+        with _waiters_lock:
+            if _waiters < getattr(settings, 'PROGRESS_MAX_WAITERS', 8):
+                _waiters += 1
+                claimed = True
+    try:
+        yield wait if claimed else 0
+    finally:
+        if claimed:
+            with _waiters_lock:
+                _waiters -= 1
@@ -1,14 +1,13 @@
 # pipeline/serializers.py
 
-import json
 from rest_framework import serializers
 from .models import VerificationJob, VerificationResult
 
 class SafeJSONField(serializers.Field):
     def to_representation(self, value):
-        if value is None:
-            return None
-        return json.loads(json.dumps(value))
+        # Values come straight from a JSONField, so they are already
+        # JSON-safe; the renderer encodes them once.
+        return value
 
 class VerificationResultSerializer(serializers.ModelSerializer):
     # Use our safe field to handle the 'data' dictionary
@@ -23,4 +22,11 @@ class VerificationJobSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = VerificationJob
-        fields = ['id', 'status', 'details', 'created_at', 'results']
\ No newline at end of file
+        fields = ['id', 'status', 'details', 'incremental', 'priority', 'total_candidates', 'scan_complete', 'processed_count', 'failed_count', 'carried_forward', 'stage_timings', 'created_at', 'results']
+
+class VerificationJobSummarySerializer(serializers.ModelSerializer):
+    """The job without its results; page through those with the results endpoint."""
+
+    class Meta:
+        model = VerificationJob
+        fields = ['id', 'status', 'details', 'incremental', 'priority', 'total_candidates', 'scan_complete', 'processed_count', 'failed_count', 'carried_forward', 'stage_timings', 'created_at']
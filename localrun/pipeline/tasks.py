@@ -1,57 +1,44 @@
 # localrun/pipeline/tasks.py
 import os
 import shutil
+import time
+import pandas as pd
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 
-from .models import VerificationJob, VerificationResult, ParsedResult 
-from .workers.load_csv_worker import load_and_prepare_csv
-from .workers.compress_worker import process_and_compress
-from .workers.local_extract_worker import extract_and_parse, extract_single_field
+from .models import VerificationJob, CandidateFingerprint
+from . import metrics
+from .progress import publish_progress
+from .workers.load_csv_worker import load_master_index
+from .workers.local_extract_worker import extract_batch, extract_single_field
 # from .workers.extract_worker import extract_and_parse, extract_single_field, initialize_client
-from .workers.verify_worker import verify_and_create_row 
+from .workers.verify_worker import verify_many
 from .workers.derive_worker import derive_paper_code
-from .workers.scanner_worker import scan_for_gate_scorecards
-from .workers.orientation_worker import correct_orientation_in_place
+from .workers.scanner_worker import iter_gate_scorecards, ScanReport
+from .workers.preprocess_engine import get_preprocess_executor, prepare_scorecard_image
+from .workers.master_index import MasterIndex
+from .workers.ocr_worker import ocr_extract
+from .workers.fingerprint_worker import fingerprint_file, hash_master_row
+from .workers.result_writer import ResultWriter, insert_job_results
 
-@shared_task
-def run_verification_pipeline(job_id, master_csv_path, source_folder_path):
-    job = VerificationJob.objects.get(id=job_id)
-    job.status = 'PROCESSING'
-    job.save()
-
-    temp_compress_dir = os.path.join(settings.MEDIA_ROOT, 'temp_compress', str(job_id))
-    os.makedirs(temp_compress_dir, exist_ok=True)
-
-    try:
-        # initialize_client()
-
-        files_to_process = scan_for_gate_scorecards(source_folder_path)
-
-        for applicant_id, file_path in files_to_process.items():
-            file_name = os.path.basename(file_path)
-
-        if not files_to_process:
-            raise Exception("Scanner did not find any valid gate_scorecard files.")
-        
-        
-        master_df = load_and_prepare_csv(master_csv_path)
-        if master_df is None: raise Exception("Failed to load master data.")
-
-        final_headers = [
-            'id',
-            'input_name', 'extracted_name', 'name_status',
-            'input_father_name', 'extracted_father_name', 'father_name_status',
-            'input_reg_id', 'extracted_reg_id', 'reg_id_status', 
-            'input_year', 'extracted_year', 'year_status',
-            'input_paper_code', 'extracted_paper_code', 'paper_code_status',
-            'input_score', 'extracted_score', 'score_status', 
-            'input_scoreof100', 'extracted_scoreof100', 'scoreof100_status', 
-            'input_rank', 'extracted_rank', 'rank_status'
-        ]
-        # The AI needs to extract 7 fields now (including father_name)
-        base_extract_headers = ['name', 'father_name', 'registration_id', 'year', 'score', 'scoreof100', 'rank']
-        prompt = """From the provided image of a GATE scorecard, extract the specified fields. The output MUST be a single line of comma-separated values without any headers or labels.
+FINAL_HEADERS = [
+    'id',
+    'input_name', 'extracted_name', 'name_status',
+    'input_father_name', 'extracted_father_name', 'father_name_status',
+    'input_reg_id', 'extracted_reg_id', 'reg_id_status', 
+    'input_year', 'extracted_year', 'year_status',
+    'input_paper_code', 'extracted_paper_code', 'paper_code_status',
+    'input_score', 'extracted_score', 'score_status', 
+    'input_scoreof100', 'extracted_scoreof100', 'scoreof100_status', 
+    'input_rank', 'extracted_rank', 'rank_status'
+]
+# The AI needs to extract 7 fields now (including father_name)
+BASE_EXTRACT_HEADERS = ['name', 'father_name', 'registration_id', 'year', 'score', 'scoreof100', 'rank']
+GATE_EXTRACTION_PROMPT = """From the provided image of a GATE scorecard, extract the specified fields. The output MUST be a single line of comma-separated values without any headers or labels.
         Fields to Extract:
             1.Candidate's Name
             2.Father's Name
@@ -68,111 +55,556 @@ def run_verification_pipeline(job_id, master_csv_path, source_folder_path):
             Output Format Example:
             John Doe,Robert Doe,CS24S21098765,2024,850,85.50,123"""
 
-        for applicant_id, file_path in files_to_process.items():
-            file_name = os.path.basename(file_path)
-
-            compressed_path, compress_msg = process_and_compress(file_path, temp_compress_dir, poppler_path=settings.POPPLER_PATH)
-            
-            print(f"[COMPRESS WORKER] Compress status for {file_name}: {compress_msg}")
-            
-            if not compressed_path:
-                result_row_list = [file_name.split('_')[0], 'COMPRESSION_FAILED', 'False'] + [''] * (len(final_headers) - 3)
-            else:
-
-                orientation_success = correct_orientation_in_place(compressed_path)
-                if not orientation_success:
-                    print(f"[PIPELINE] WARNING: Orientation correction failed for {file_name}. Proceeding with original compressed image.")
-                    
-                # Step 1: Initial broad extraction
-                extracted_data_list = extract_and_parse(compressed_path, prompt, len(base_extract_headers))
-                extracted_dict = dict(zip(base_extract_headers, extracted_data_list)) if isinstance(extracted_data_list, list) and len(extracted_data_list) == len(base_extract_headers) else {}
-                
-                # Step 2: Initial verification
-                # We will re-run this later if a retry happens.
-                _, failed_fields = verify_and_create_row(master_df, applicant_id, extracted_dict)
-
-                # Step 3: Check for registration_id failure and trigger retry
-                if 'registration_id' in failed_fields:
-                    print(f"[RETRY LOGIC] Registration ID failed for {file_name}. Triggering focused extraction.")
-                
-                    master_row = master_df.loc[applicant_id]
-                    candidate_name_hint = master_row.get('name', '')
-                    
-                    # The new_reg_id is created and used ONLY inside this block
-                    new_reg_id = extract_single_field(compressed_path, "Registration Number", candidate_name_hint)
-                    
-                    if new_reg_id:
-                        print(f"[RETRY LOGIC] Success. Old: '{extracted_dict.get('registration_id')}', New: '{new_reg_id}'")
-                        extracted_dict['registration_id'] = new_reg_id
-                
-                # Step 4: Always run derivation on the (potentially corrected) dictionary
-                final_extracted_dict = derive_paper_code(extracted_dict)
-
-                # Step 5: Run the final verification on the fully populated dictionary to get the final report row
-                result_row_list, _ = verify_and_create_row(master_df, applicant_id, final_extracted_dict)
-
-            
-            result_dict = dict(zip(final_headers, result_row_list))
-            # --- sanitize for JSON safety ---
-            result_dict = {k: ("" if v is None or str(v) == "nan" else str(v)) for k, v in result_dict.items()}
-
-            VerificationResult.objects.create(job=job, data=result_dict)
-            save_verification_result(result_dict)
-            # save_verification_result(result_dict)
-            print(f"[CELERY TASK] Saved result for {file_name} to database.")
-
-        job.status = 'COMPLETE'
-        job.details = f"Successfully processed the documents."
-        job.save()
+# Each worker process keeps the master index it has already built, so the
+# batch subtasks of one job only load it once per process.
+_MASTER_INDEX_CACHE = {}
+
+
+def _get_master_index(job_id, master_csv_path):
+    """
+    Returns the job's MasterIndex. Worker processes load the copy that
+    `run_verification_pipeline` pickled into the job's temp folder, and only
+    fall back to parsing the CSV if it is missing.
+    """
+    master_index = _MASTER_INDEX_CACHE.get(master_csv_path)
+    if master_index is not None:
+        return master_index
+
+    index_path = _get_master_index_path(job_id)
+    if os.path.exists(index_path):
+        master_index = MasterIndex.load(index_path)
+    else:
+        master_index = load_master_index(master_csv_path)
+        if master_index is None:
+            raise Exception("Failed to load master data.")
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        master_index.save(index_path)
+
+    _MASTER_INDEX_CACHE.clear()
+    _MASTER_INDEX_CACHE[master_csv_path] = master_index
+    return master_index
+
+
+def _get_master_index_path(job_id):
+    return os.path.join(_get_temp_compress_dir(job_id), 'master_index.pkl')
+
+
+def _get_temp_compress_dir(job_id):
+    return os.path.join(settings.MEDIA_ROOT, 'temp_compress', str(job_id))
+
+
+# Result rows with these markers in a name column are failures and are always
+# reprocessed by an incremental job, even if the candidate's inputs are unchanged.
+_ERROR_MARKERS = ('COMPRESSION_FAILED', 'API_OR_FILE_ERROR', 'PARSE_ERROR', 'ID NOT FOUND')
+
+
+def _is_reusable_result(data):
+    if not data:
+        return False
+    for column in ('input_name', 'extracted_name'):
+        if str(data.get(column, '')).startswith(_ERROR_MARKERS):
+            return False
+    return True
+
+
+# Celery queues, each consumed by its own workers (see docker-compose.yml).
+INTERACTIVE_QUEUE = 'interactive'  # Small jobs, start to finish, so a bulk job never holds them up
+SCAN_QUEUE = 'scan'                # Bulk jobs' scan-and-dispatch task, mostly waiting on backpressure
+BULK_QUEUE = 'bulk'                # Bulk jobs' batches: preprocessing, VLM extraction and result writes
+
+
+def get_pipeline_queue(priority):
+    """The queue `run_verification_pipeline` is sent to for a job of this priority."""
+    return INTERACTIVE_QUEUE if priority == 'INTERACTIVE' else SCAN_QUEUE
+
+
+# Fingerprints and carried-forward results are saved every this many scanned
+# candidates, so the scan never holds more than this many of them in memory.
+FINGERPRINT_FLUSH_SIZE = 1000
+# How often the scan re-checks the job's progress while it waits for room.
+BACKPRESSURE_POLL_SECONDS = 0.5
+
+
+def _fingerprint_candidates(job, files_to_process, master_index, counts):
+    """
+    Records a CandidateFingerprint for every scanned candidate. For an
+    incremental job, candidates whose scorecard and master row are unchanged
+    since the previous complete job on the same folder get that job's result
+    copied forward instead of being reprocessed.
+
+    A generator over an iterable of (applicant_id, file_path) pairs that
+    yields the candidates still to process as soon as they are scanned.
+    Fingerprints and carried-forward results are saved every
+    FINGERPRINT_FLUSH_SIZE candidates; carried-forward candidates count as
+    processed on the job from then on. `counts['scanned']` and
+    `counts['carried_forward']` (saved ones only) are kept up to date.
+    """
+    previous_fingerprints = {}
+    previous_results = {}
+    if job.incremental:
+        previous_job = (VerificationJob.objects
+                        .filter(source_folder_path=job.source_folder_path, status='COMPLETE', id__lt=job.id)
+                        .order_by('-id')
+                        .first())
+        if previous_job:
+            print(f"[INCREMENTAL] Comparing against previous Job {previous_job.id}.")
+            previous_fingerprints = {fp.applicant_id: fp for fp in previous_job.fingerprints.all()}
+            for result in previous_job.results.all().iterator(chunk_size=1000):
+                previous_results[str(result.data.get('id'))] = result.data
+        else:
+            print(f"[INCREMENTAL] No previous complete job for {job.source_folder_path}. Processing everything.")
+
+    fingerprints = []
+    carried_results = []
+
+    def flush():
+        CandidateFingerprint.objects.bulk_create(fingerprints, batch_size=FINGERPRINT_FLUSH_SIZE)
+        if carried_results:
+            insert_job_results(job.id, carried_results)
+        # The running total lets the UI show the scan's progress.
+        VerificationJob.objects.filter(id=job.id).update(
+            total_candidates=counts['scanned'],
+            processed_count=F('processed_count') + len(carried_results),
+        )
+        counts['carried_forward'] += len(carried_results)
+        publish_progress(job.id, 'counters', scanned=counts['scanned'], processed=len(carried_results))
+        fingerprints.clear()
+        carried_results.clear()
+
+    changed = 0
+    for applicant_id, file_path in files_to_process:
+        counts['scanned'] += 1
+        if len(fingerprints) >= FINGERPRINT_FLUSH_SIZE:
+            flush()
+        previous = previous_fingerprints.get(applicant_id)
+        try:
+            with metrics.timed('fingerprint'):
+                fingerprint = fingerprint_file(file_path, previous)
+        except OSError as e:
+            print(f"[INCREMENTAL] Could not fingerprint {file_path}: {e}")
+            changed += 1
+            yield applicant_id, file_path
+            continue
+        fingerprint['master_row_hash'] = hash_master_row(master_index, applicant_id)
+        fingerprints.append(CandidateFingerprint(job=job, applicant_id=applicant_id, **fingerprint))
+
+        previous_data = previous_results.get(applicant_id)
+        unchanged = (previous is not None
+                     and previous.content_hash == fingerprint['content_hash']
+                     and previous.master_row_hash == fingerprint['master_row_hash'])
+        if unchanged and _is_reusable_result(previous_data):
+            carried_results.append(previous_data)
+        else:
+            changed += 1
+            yield applicant_id, file_path
+    flush()
+
+    if job.incremental:
+        print(f"[INCREMENTAL] {changed} changed candidates, {counts['carried_forward']} carried forward.")
+
+
+def _wait_for_capacity(job_id, dispatched, counts):
+    """
+    Blocks while more than PIPELINE_MAX_BATCHES_IN_FLIGHT batches' worth of
+    dispatched candidates are still queued or running.
+
+    Never gives up: bulk batches run on their own queue's workers, never on
+    the one this scan holds. A warning is logged every
+    PIPELINE_BACKPRESSURE_STALL_SECONDS that no batch finishes.
+    """
+    limit = (max(1, getattr(settings, 'PIPELINE_MAX_BATCHES_IN_FLIGHT', 20))
+             * getattr(settings, 'PIPELINE_CANDIDATES_PER_TASK', 10))
+    stall_seconds = getattr(settings, 'PIPELINE_BACKPRESSURE_STALL_SECONDS', 60)
+    last_done, last_progress = None, time.monotonic()
+    while True:
+        processed = VerificationJob.objects.filter(id=job_id).values_list('processed_count', flat=True).first() or 0
+        done = processed - counts['carried_forward']
+        if dispatched - done < limit:
+            return
+        if done != last_done:
+            last_done, last_progress = done, time.monotonic()
+        elif time.monotonic() - last_progress > stall_seconds:
+            print(f"[CELERY TASK] WARNING: Job {job_id} made no progress for {stall_seconds}s with "
+                  f"{dispatched - done} candidates in flight. Are the '{BULK_QUEUE}' workers running?")
+            last_progress = time.monotonic()
+        time.sleep(BACKPRESSURE_POLL_SECONDS)
+
+
+def _dispatch_batch(job, batch, master_csv_path, dispatched, counts):
+    """
+    Sends a batch to its job's queue. An interactive job that turns out larger
+    than PIPELINE_INTERACTIVE_MAX_CANDIDATES sends the rest of its batches to
+    the bulk queue, so one mislabelled job cannot monopolise the interactive lane.
+
+    Only batches bound for the bulk queue wait for capacity: an interactive
+    job's scan shares its workers with its own batches.
+    """
+    queue = BULK_QUEUE
+    if job.priority == 'INTERACTIVE':
+        limit = getattr(settings, 'PIPELINE_INTERACTIVE_MAX_CANDIDATES', 50)
+        if dispatched < limit:
+            queue = INTERACTIVE_QUEUE
+        elif dispatched < limit + len(batch):
+            print(f"[CELERY TASK] WARNING: Interactive Job {job.id} has more than {limit} candidates. "
+                  f"Sending the rest to the '{BULK_QUEUE}' queue.")
+    if queue == BULK_QUEUE:
+        _wait_for_capacity(job.id, dispatched, counts)
+    process_candidate_batch.apply_async((job.id, batch, master_csv_path), queue=queue)
+
+
+@shared_task
+def run_verification_pipeline(job_id, master_csv_path, source_folder_path):
+    """
+    Streams the job through the pipeline. Candidates are fingerprinted as the
+    scanner finds them and dispatched to `process_candidate_batch` subtasks as
+    soon as a batch is full, so the first results arrive while a large tree is
+    still being scanned. Each subtask preprocesses, extracts, verifies and
+    writes its batch with its own pools.
+
+    At most PIPELINE_MAX_BATCHES_IN_FLIGHT batches are queued or running at a
+    time: the scan waits for room, so neither the broker nor this task grows
+    with the number of candidates. Whichever finishes last, the final batch or
+    this task, finalizes the job.
+    """
+    job = VerificationJob.objects.get(id=job_id)
+    job.status = 'PROCESSING'
+    job.save()
+
+    try:
+        # initialize_client()
+        metrics.init_job_metrics(job_id)
+        publish_progress(job_id, 'started', total=0)
+
+        batch_size = getattr(settings, 'PIPELINE_CANDIDATES_PER_TASK', 10)
+        counts = {'scanned': 0, 'carried_forward': 0}
+        scan_report = ScanReport()
+        dispatched, batches = 0, 0
+        with metrics.collecting() as job_metrics:
+            # Build the index once up front, so a broken master CSV fails the job
+            # immediately and the subtasks can load the pickled copy.
+            os.makedirs(_get_temp_compress_dir(job_id), exist_ok=True)
+            with metrics.timed('load_master'):
+                master_index = _get_master_index(job_id, master_csv_path)
+
+            # Only the scanner's own time counts as 'scan': batches may run
+            # inline here (eager mode) while the scan is paused.
+            candidates = _fingerprint_candidates(
+                job, metrics.timed_iter('scan', iter_gate_scorecards(source_folder_path, scan_report)),
+                master_index, counts,
+            )
+            batch = []
+            for applicant_id, file_path in candidates:
+                batch.append([applicant_id, file_path])
+                if len(batch) < batch_size:
+                    continue
+                _dispatch_batch(job, batch, master_csv_path, dispatched, counts)
+                dispatched += len(batch)
+                batches += 1
+                batch = []
+            if batch:
+                _dispatch_batch(job, batch, master_csv_path, dispatched, counts)
+                dispatched += len(batch)
+                batches += 1
+        metrics.save_job_metrics(job_id, job_metrics)
+
+        if not counts['scanned']:
+            raise Exception("Scanner did not find any valid gate_scorecard files.")
+
+        details = f"Found {counts['scanned']} files to process."
+        if scan_report.missing or scan_report.multiple:
+            details += (f" {len(scan_report.missing)} candidate folders have no gate_scorecard,"
+                        f" {len(scan_report.multiple)} have more than one.")
+        if scan_report.duplicates:
+            details += (f" {len(scan_report.duplicates)} applicant IDs had more than one folder;"
+                        f" only the first was processed.")
+        if job.incremental:
+            details += f" {counts['carried_forward']} unchanged candidates carried forward."
+        # Batches update the counters concurrently, so only these fields are written.
+        VerificationJob.objects.filter(id=job_id).update(
+            details=details, total_candidates=counts['scanned'],
+            carried_forward=counts['carried_forward'], scan_complete=True,
+        )
+        print(f"[CELERY TASK] Job {job_id}: dispatched {dispatched} candidates in {batches} subtasks.")
+        finalize_verification_job(job_id)
 
     except Exception as e:
-        job.status = 'FAILED'
-        job.details = f"An error occurred: {e}"
-        job.save()
+        VerificationJob.objects.filter(id=job_id).update(status='FAILED', details=f"An error occurred: {e}")
+        publish_progress(job_id, 'finished', status='FAILED')
+        shutil.rmtree(_get_temp_compress_dir(job_id), ignore_errors=True)
         raise e
-    finally:
-        if os.path.exists(temp_compress_dir):
-            shutil.rmtree(temp_compress_dir)
 
-def save_verification_result(json_result):
+
+@shared_task
+def process_candidate_batch(job_id, candidates, master_csv_path):
     """
-    Takes the JSON result (dict) and saves into VerificationResult table.
+    Processes a batch of applicants, adds it to the job's counters and
+    finalizes the job if this was the last batch.
+
+    Args:
+        candidates (list): [applicant_id, file_path] pairs.
+
+    Returns:
+        list: One {'id': applicant_id, 'success': bool} per candidate. Errors
+              are caught and reported here rather than raised, so every
+              candidate is always counted and the job always finishes.
     """
-    obj, created = ParsedResult.objects.update_or_create(
-        id=json_result.get("id"),
-        defaults={
+    if not VerificationJob.objects.filter(id=job_id, status='PROCESSING').exists():
+        print(f"[CELERY TASK] Job {job_id} is no longer processing. Skipping {len(candidates)} candidates.")
+        return [{'id': applicant_id, 'success': False} for applicant_id, _ in candidates]
 
-            "input_name": json_result.get("input_name"),
-            "extracted_name": json_result.get("extracted_name"),
-            "name_status": json_result.get("name_status"),
+    with metrics.collecting() as batch_metrics:
+        try:
+            batch_outcomes = _process_batch(job_id, candidates, master_csv_path)
+        except Exception as e:
+            print(f"[CELERY TASK] ERROR: Batch of Job {job_id} failed: {e}")
+            batch_outcomes = [{'id': applicant_id, 'success': False} for applicant_id, _ in candidates]
 
-            "input_father_name": json_result.get("input_father_name"),
-            "extracted_father_name": json_result.get("extracted_father_name"),
-            "father_name_status": json_result.get("father_name_status"),
+    failed = sum(1 for outcome in batch_outcomes if not outcome['success'])
+    metrics.save_job_metrics(job_id, batch_metrics)
+    VerificationJob.objects.filter(id=job_id).update(
+        processed_count=F('processed_count') + len(batch_outcomes),
+        failed_count=F('failed_count') + failed,
+    )
+    publish_progress(job_id, 'counters', processed=len(batch_outcomes), failed=failed)
+    finalize_verification_job(job_id)
+    return batch_outcomes
 
-            "input_reg_id": json_result.get("input_reg_id"),
-            "extracted_reg_id": json_result.get("extracted_reg_id"),
-            "reg_id_status": json_result.get("reg_id_status"),
 
-            "input_year": json_result.get("input_year"),
-            "extracted_year": json_result.get("extracted_year"),
-            "year_status": json_result.get("year_status"),
+def _process_batch(job_id, candidates, master_csv_path):
+    """
+    Extracts the scorecards as soon as their preprocessing finishes
+    (LOCAL_MODEL_IMAGES_PER_REQUEST at a time, with up to
+    LOCAL_MODEL_MAX_CONCURRENCY requests in flight), then verifies the
+    extracted candidates in vectorised passes as their requests complete and
+    saves the result rows through a buffered ResultWriter.
+    """
+    try:
+        master_index = _get_master_index(job_id, master_csv_path)
+    except Exception as e:
+        print(f"[CELERY TASK] ERROR: Could not load master data for Job {job_id}: {e}")
+        return [{'id': applicant_id, 'success': False} for applicant_id, _ in candidates]
+
+    temp_compress_dir = _get_temp_compress_dir(job_id)
+    os.makedirs(temp_compress_dir, exist_ok=True)
+
+    # The CPU-bound preprocessing of the whole batch is handed to the
+    # preprocess pool up front. Images are extracted in the order they become
+    # ready, so the pool keeps working while the extraction threads wait on the VLM.
+    executor = get_preprocess_executor()
+    pending = {
+        executor.submit(prepare_scorecard_image, file_path, temp_compress_dir): (applicant_id, file_path)
+        for applicant_id, file_path in candidates
+    }
+
+    outcomes = {}
+    ready = []        # (applicant_id, file_path, compressed image) waiting for extraction
+    images_per_request = max(1, getattr(settings, 'LOCAL_MODEL_IMAGES_PER_REQUEST', 1))
+    extract_workers = max(1, getattr(settings, 'LOCAL_MODEL_MAX_CONCURRENCY', 4))
+    extractions = {}  # future -> {applicant_id: (file_path, compressed image, extracted fields)}
+    with ResultWriter(job_id) as writer, \
+            ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix='extract') as extract_executor:
 
-            "input_paper_code": json_result.get("input_paper_code"),
-            "extracted_paper_code": json_result.get("extracted_paper_code"),
-            "paper_code_status": json_result.get("paper_code_status"),
+        def submit_extraction(group):
+            extracted = {}
+            # Run in a copy of this context, so the threads record into the batch's metrics.
+            future = extract_executor.submit(
+                contextvars.copy_context().run, _extract_candidates, master_index, group, extracted, outcomes,
+            )
+            extractions[future] = extracted
 
-            "input_score": json_result.get("input_score"),
-            "extracted_score": json_result.get("extracted_score"),
-            "score_status": json_result.get("score_status"),
+        for future in as_completed(pending):
+            applicant_id, file_path = pending[future]
+            try:
+                compressed_image, preprocess_metrics = future.result()
+                metrics.record(preprocess_metrics)
+                if not compressed_image:
+                    file_name = os.path.basename(file_path)
+                    result_row_list = [file_name.split('_')[0], 'COMPRESSION_FAILED', 'False'] + [''] * (len(FINAL_HEADERS) - 3)
+                    writer.add(_sanitise_result(dict(zip(FINAL_HEADERS, result_row_list))))
+                    outcomes[applicant_id] = False
+                    continue
+                ready.append((applicant_id, file_path, compressed_image))
+            except Exception as e:
+                print(f"[CELERY TASK] ERROR: Candidate {applicant_id} ({os.path.basename(file_path)}) failed: {e}")
+                outcomes[applicant_id] = False
 
-            "input_scoreof100": json_result.get("input_scoreof100"),
-            "extracted_scoreof100": json_result.get("extracted_scoreof100"),
-            "scoreof100_status": json_result.get("scoreof100_status"),
+            if len(ready) >= images_per_request:
+                submit_extraction(ready)
+                ready = []
+        if ready:
+            submit_extraction(ready)
 
-            "input_rank": json_result.get("input_rank"),
-            "extracted_rank": json_result.get("extracted_rank"),
-            "rank_status": json_result.get("rank_status"),
+        # Everything extracted since the last pass is verified together. The
+        # wait times out so the writer's time limit is honoured between passes.
+        remaining = set(extractions)
+        while remaining:
+            done, remaining = wait(remaining, timeout=max(writer.flush_seconds, 0.1), return_when=FIRST_COMPLETED)
+            extracted = {}
+            for extraction in done:
+                extraction.result()
+                extracted.update(extractions[extraction])
+            if extracted:
+                try:
+                    for result_dict in _verify_candidates(master_index, extracted):
+                        writer.add(result_dict)
+                    outcomes.update((applicant_id, True) for applicant_id in extracted)
+                except Exception as e:
+                    print(f"[CELERY TASK] ERROR: Verification failed for Job {job_id}: {e}")
+                    outcomes.update((applicant_id, False) for applicant_id in extracted)
+            writer.flush_if_due()
+
+    return [
+        {'id': applicant_id, 'success': outcomes.get(applicant_id, False) and applicant_id not in writer.failed_ids}
+        for applicant_id, _ in candidates
+    ]
+
+
+def _extract_candidates(master_index, ready, extracted, outcomes):
+    """
+    Runs the broad extraction for applicants whose scorecards have already
+    been compressed and oriented by `prepare_scorecard_image`, with all of
+    their images in one request when LOCAL_MODEL_IMAGES_PER_REQUEST > 1.
+    With OCR_FAST_PATH_ENABLED, scorecards that Tesseract reads and fully
+    verifies never reach the VLM.
+
+    The compressed images are the JPEG bytes in in-memory mode, file paths
+    otherwise (the extraction workers accept either). A response that cannot
+    be parsed gives an empty dict of extracted fields.
+    """
+    if ready and getattr(settings, 'OCR_FAST_PATH_ENABLED', False):
+        ready = _ocr_fast_path(master_index, ready, extracted)
+    if not ready:
+        return
+    try:
+        with metrics.timed('extract', count=len(ready)):
+            extracted_lists = extract_batch([image for _, _, image in ready], GATE_EXTRACTION_PROMPT, len(BASE_EXTRACT_HEADERS))
+    except Exception as e:
+        for applicant_id, file_path, _ in ready:
+            print(f"[CELERY TASK] ERROR: Candidate {applicant_id} ({os.path.basename(file_path)}) failed: {e}")
+            outcomes[applicant_id] = False
+        return
+
+    for (applicant_id, file_path, compressed_image), extracted_data_list in zip(ready, extracted_lists):
+        if isinstance(extracted_data_list, list) and len(extracted_data_list) == len(BASE_EXTRACT_HEADERS):
+            extracted_dict = dict(zip(BASE_EXTRACT_HEADERS, extracted_data_list))
+        else:
+            extracted_dict = {}
+        extracted[applicant_id] = (file_path, compressed_image, extracted_dict)
+
+
+def _ocr_fast_path(master_index, ready, extracted):
+    """
+    OCRs the scorecards in the preprocess pool and accepts every candidate
+    whose OCR fields all match the master data.
+
+    Returns:
+        list: The entries of `ready` that still need the VLM.
+    """
+    try:
+        with metrics.timed('ocr', count=len(ready)):
+            ocr_fields = list(get_preprocess_executor().map(ocr_extract, [image for _, _, image in ready]))
+        ocr_extracted = {
+            applicant_id: (file_path, compressed_image, derive_paper_code(fields))
+            for (applicant_id, file_path, compressed_image), fields in zip(ready, ocr_fields)
         }
+        report = verify_many(master_index, _extracted_frame(ocr_extracted))
+        status_columns = [column for column in report.columns if column.endswith('_status')]
+        verified = set(report.loc[(report[status_columns] == 'True').all(axis=1), 'id'])
+    except Exception as e:
+        print(f"[OCR FAST PATH] ERROR: {e}. Sending the scorecards to the VLM.")
+        return ready
+
+    metrics.count('ocr_verified', len(verified))
+    for applicant_id in verified:
+        print(f"[OCR FAST PATH] Candidate {applicant_id} fully verified from OCR. Skipping the VLM.")
+        extracted[applicant_id] = ocr_extracted[applicant_id]
+    return [entry for entry in ready if entry[0] not in verified]
+
+
+def _verify_candidates(master_index, extracted):
+    """
+    Verifies a batch of extracted candidates against the master data.
+
+    Candidates whose registration ID does not match get a focused re-extraction
+    of that field, then the paper code is derived for everyone and the batch
+    is verified again to produce the final report rows.
+
+    Returns:
+        list: Sanitised result dicts, one per candidate.
+    """
+    # Initial verification, only used to find registration ID failures.
+    with metrics.timed('verify', count=len(extracted)):
+        report = verify_many(master_index, _extracted_frame(extracted))
+    for applicant_id in report.loc[report['reg_id_status'] == 'False', 'id']:
+        file_path, compressed_image, extracted_dict = extracted[applicant_id]
+        print(f"[RETRY LOGIC] Registration ID failed for {os.path.basename(file_path)}. Triggering focused extraction.")
+
+        candidate_name_hint = master_index.get(applicant_id).get('name', '')
+        with metrics.timed('retry_extract'):
+            new_reg_id = extract_single_field(compressed_image, "Registration Number", candidate_name_hint)
+
+        if new_reg_id:
+            print(f"[RETRY LOGIC] Success. Old: '{extracted_dict.get('registration_id')}', New: '{new_reg_id}'")
+            extracted_dict['registration_id'] = new_reg_id
+
+    # Always run derivation on the (potentially corrected) dictionaries
+    with metrics.timed('derive', count=len(extracted)):
+        for _, _, extracted_dict in extracted.values():
+            derive_paper_code(extracted_dict)
+
+    with metrics.timed('verify', count=len(extracted)):
+        report = verify_many(master_index, _extracted_frame(extracted))
+    return [_sanitise_result(result_dict) for result_dict in report.to_dict('records')]
+
+
+def _extracted_frame(extracted):
+    return pd.DataFrame.from_records(
+        [{'id': applicant_id, **extracted_dict} for applicant_id, (_, _, extracted_dict) in extracted.items()],
+        columns=['id'] + BASE_EXTRACT_HEADERS + ['paper_code'],
     )
-    return obj
\ No newline at end of file
+
+
+def _sanitise_result(result_dict):
+    # --- sanitize for JSON safety ---
+    return {k: ("" if v is None or str(v) == "nan" else str(v)) for k, v in result_dict.items()}
+
+
+@shared_task
+def finalize_verification_job(job_id):
+    """
+    Marks the job COMPLETE if at least one candidate was processed
+    successfully or carried forward (FAILED otherwise) and cleans up the
+    job's temporary compression folder, once the scan is complete and every
+    candidate has been counted. Called after every batch and at the end of
+    the scan; the row lock makes sure exactly one of them finishes the job.
+    """
+    with transaction.atomic():
+        job = VerificationJob.objects.select_for_update().get(id=job_id)
+        if job.status != 'PROCESSING' or not job.scan_complete or job.processed_count < job.total_candidates:
+            return None
+        total = job.total_candidates
+        succeeded = job.processed_count - job.failed_count
+        job.stage_timings = metrics.summarise_job_metrics(job_id)
+        if succeeded:
+            job.status = 'COMPLETE'
+            job.details = f"Successfully processed {succeeded} of {total} documents."
+            if job.carried_forward:
+                job.details += f" {job.carried_forward} unchanged candidates were carried forward from the previous job."
+            hits = job.stage_timings['events'].get('cache_hits', 0)
+            misses = job.stage_timings['events'].get('cache_misses', 0)
+            if hits + misses:
+                job.details += (f" Extraction cache: {hits} hits, {misses} misses"
+                                f" ({hits / (hits + misses):.0%} hit rate).")
+        else:
+            job.status = 'FAILED'
+            job.details = f"None of the {total} documents could be processed."
+        job.save(update_fields=['status', 'details', 'stage_timings', 'updated_at'])
+    publish_progress(job_id, 'finished', status=job.status)
+
+    shutil.rmtree(_get_temp_compress_dir(job_id), ignore_errors=True)
+    print(f"[CELERY TASK] Job {job_id} finished: {succeeded}/{total} candidates succeeded.")
+    slowest = sorted(job.stage_timings['stages'].items(), key=lambda item: item[1]['total_seconds'], reverse=True)[:3]
+    if slowest:
+        print(f"[METRICS] Job {job_id} spent the most time in: "
+              + ", ".join(f"{stage} {timing['total_seconds']:.1f}s" for stage, timing in slowest))
+    return {'total': total, 'succeeded': succeeded}
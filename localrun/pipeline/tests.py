@@ -1,3 +1,647 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from PIL import Image, ImageDraw, ImageFont
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import VerificationJob, VerificationResult
+from . import api, metrics, tasks
+from .progress import long_poll_slot
+from .tasks import _fingerprint_candidates
+from .workers import compress_worker, local_extract_worker, orientation_worker, preprocess_engine
+from .workers.load_csv_worker import load_and_prepare_csv, load_master_index
+from .workers.master_index import MasterIndex
+from .workers.ocr_worker import ocr_extract, parse_ocr_text
+from .workers import result_writer
+from .workers.result_writer import ResultWriter, insert_job_results
+from .workers.roi_worker import crop_to_fields
+from .workers.scanner_worker import ScanReport, iter_gate_scorecards
+from .workers.verify_worker import REPORT_COLUMNS, verify_and_create_row, verify_many
+
+
+class CorrectOrientationTests(SimpleTestCase):
+    """The rotation applied for each Tesseract OSD answer."""
+
+    def setUp(self):
+        # Non-square and asymmetric, so every rotation gives a different array.
+        self.upright = np.arange(6 * 4 * 3, dtype=np.uint8).reshape(6, 4, 3)
+        patcher = mock.patch.object(orientation_worker, 'looks_upright', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertCorrected(self, page, rotate):
+        osd = f"Page number: 0\nOrientation in degrees: {rotate}\nRotate: {rotate}\nOrientation confidence: 9.5\n"
+        with mock.patch.object(orientation_worker.pytesseract, 'image_to_osd', return_value=osd):
+            corrected, success = orientation_worker.correct_orientation(page, 'test page')
+        self.assertTrue(success)
+        np.testing.assert_array_equal(corrected, self.upright)
+
+    def test_upright_page_is_left_alone(self):
+        self.assertCorrected(self.upright, 0)
+
+    def test_page_turned_counterclockwise_is_rotated_clockwise(self):
+        self.assertCorrected(cv2.rotate(self.upright, cv2.ROTATE_90_COUNTERCLOCKWISE), 90)
+
+    def test_upside_down_page_is_rotated_180(self):
+        self.assertCorrected(cv2.rotate(self.upright, cv2.ROTATE_180), 180)
+
+    def test_page_turned_clockwise_is_rotated_counterclockwise(self):
+        self.assertCorrected(cv2.rotate(self.upright, cv2.ROTATE_90_CLOCKWISE), 270)
+
+
+class LooksUprightTests(SimpleTestCase):
+    """The pre-check only skips OSD for pages of upright mixed-case text."""
+
+    LINES = [
+        "Name of Candidate: Ananya Rao",
+        "Parent's Name: Suresh Rao",
+        "Registration Number: CS23S12085106",
+        "Test Paper: Computer Science and Information Technology",
+        "GATE Score: 612 out of 1000",
+        "All India Rank in this paper: 1874",
+        "This scorecard is valid for three years from the date of results.",
+        "Qualifying marks for general category: 25.0",
+    ]
+
+    def render(self, upper=False):
+        try:
+            font = ImageFont.truetype('DejaVuSans.ttf', 30)
+        except OSError:
+            font = ImageFont.load_default(size=30)
+        page = Image.new('RGB', (1240, 1754), 'white')
+        draw = ImageDraw.Draw(page)
+        for i, text in enumerate(self.LINES * 2):
+            draw.text((100, 100 + i * 80), text.upper() if upper else text, font=font, fill='black')
+        return np.asarray(page)
+
+    def test_upright_page(self):
+        self.assertTrue(orientation_worker.looks_upright(self.render()))
+
+    def test_rotated_pages(self):
+        page = self.render()
+        for rotation in (cv2.ROTATE_180, cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_90_COUNTERCLOCKWISE):
+            with self.subTest(rotation=rotation):
+                self.assertFalse(orientation_worker.looks_upright(cv2.rotate(page, rotation)))
+
+    def test_all_caps_pages_go_to_osd(self):
+        page = self.render(upper=True)
+        self.assertFalse(orientation_worker.looks_upright(page))
+        self.assertFalse(orientation_worker.looks_upright(cv2.rotate(page, cv2.ROTATE_180)))
+
+    def test_upside_down_page_is_corrected_by_osd(self):
+        page = self.render()
+        osd = "Orientation in degrees: 180\nRotate: 180\nOrientation confidence: 9.5\n"
+        with mock.patch.object(orientation_worker.pytesseract, 'image_to_osd', return_value=osd) as image_to_osd:
+            corrected, success = orientation_worker.correct_orientation(cv2.rotate(page, cv2.ROTATE_180))
+        self.assertTrue(success)
+        image_to_osd.assert_called_once()
+        np.testing.assert_array_equal(corrected, page)
+
+
+class JobProgressCursorTests(TestCase):
+    """Progress responses never move the cursor past a result that is not yet committed."""
+
+    def setUp(self):
+        self.job = VerificationJob.objects.create(status='PROCESSING')
+
+    def get_progress(self, since):
+        return self.client.get(f'/api/pipeline/progress/{self.job.id}/', {'since': since}).json()
+
+    def test_insert_moves_the_mark_to_the_newest_result(self):
+        insert_job_results(self.job.id, [{'id': '1'}, {'id': '2'}])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.results_committed_through, self.job.results.latest('id').id)
+
+    def test_results_above_the_mark_are_held_back(self):
+        insert_job_results(self.job.id, [{'id': '1'}])
+        # Written without moving the mark, like a row still committing.
+        pending = VerificationResult.objects.create(job=self.job, data={'id': '2'})
+
+        progress = self.get_progress(0)
+        self.assertEqual([result['data']['id'] for result in progress['results']], ['1'])
+        self.assertLess(progress['cursor'], pending.id)
+
+        insert_job_results(self.job.id, [{'id': '3'}])
+        progress = self.get_progress(progress['cursor'])
+        self.assertEqual([result['data']['id'] for result in progress['results']], ['2', '3'])
+
+    @override_settings(PROGRESS_MAX_WAITERS=0, PROGRESS_FALLBACK_POLL_SECONDS=2)
+    def test_long_poll_without_a_free_slot_answers_at_once(self):
+        with mock.patch.object(api, 'wait_for_progress') as wait:
+            progress = self.client.get(f'/api/pipeline/progress/{self.job.id}/', {'since': 0, 'wait': 5}).json()
+        wait.assert_not_called()
+        self.assertEqual((progress['results'], progress['retry_after']), ([], 2))
+
+    def test_long_poll_slot_is_given_back(self):
+        with override_settings(PROGRESS_MAX_WAITERS=1):
+            with long_poll_slot(5) as first:
+                with long_poll_slot(5) as second:
+                    self.assertEqual((first, second), (5, 0))
+            with long_poll_slot(5) as again:
+                self.assertEqual(again, 5)
+        self.assertEqual(self.get_progress(0)['retry_after'], 0)
+
+
+class ResultWriterTests(TestCase):
+    """Buffered rows are written after flush_seconds even when no more rows arrive."""
+
+    def test_flush_if_due(self):
+        job = VerificationJob.objects.create(status='PROCESSING')
+        clock = [0.0]
+        with mock.patch.object(result_writer.time, 'monotonic', side_effect=lambda: clock[0]):
+            writer = ResultWriter(job.id, batch_size=25, flush_seconds=5)
+            writer.add({'id': '1'})
+            writer.flush_if_due()
+            self.assertFalse(job.results.exists())
+
+            clock[0] = 5
+            writer.flush_if_due()
+        self.assertEqual([result.data['id'] for result in job.results.all()], ['1'])
+        self.assertEqual(writer.rows_written, 1)
+
+
+class ScanDuplicateApplicantTests(TestCase):
+    """Folders that map to the same applicant ID yield that ID only once."""
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = os.path.join(temp_dir.name, 'documents')
+        for folder in ('can_1', 'CAN_1_reupload', 'can_2'):
+            os.makedirs(os.path.join(self.root, folder))
+            with open(os.path.join(self.root, folder, 'gate_scorecard.jpg'), 'wb') as f:
+                f.write(folder.encode())
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(temp_dir.name, 'media'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_duplicate_folder_is_skipped_and_reported(self):
+        report = ScanReport()
+        found = dict(iter_gate_scorecards(self.root, report))
+
+        self.assertEqual(sorted(found), ['1', '2'])
+        kept = os.path.basename(os.path.dirname(found['1']))
+        skipped = ({'can_1', 'CAN_1_reupload'} - {kept}).pop()
+        self.assertEqual(report.duplicates, {'1': [skipped]})
+
+    def test_duplicate_folder_gets_one_fingerprint(self):
+        job = VerificationJob.objects.create(source_folder_path=self.root)
+        counts = {'scanned': 0, 'carried_forward': 0}
+        master_index = mock.Mock(get=mock.Mock(return_value=None))
+        to_process = list(_fingerprint_candidates(job, iter_gate_scorecards(self.root), master_index, counts))
+
+        self.assertEqual(sorted(applicant_id for applicant_id, _ in to_process), ['1', '2'])
+        self.assertEqual(sorted(job.fingerprints.values_list('applicant_id', flat=True)), ['1', '2'])
+
+
+@override_settings(PIPELINE_MAX_BATCHES_IN_FLIGHT=1, PIPELINE_CANDIDATES_PER_TASK=10,
+                   PIPELINE_BACKPRESSURE_STALL_SECONDS=60)
+class BackpressureTests(TestCase):
+    """The scan keeps waiting for room however long the batches stall."""
+
+    def test_stall_is_logged_and_waited_out(self):
+        job = VerificationJob.objects.create(status='PROCESSING')
+        clock = [0.0]
+
+        def sleep(seconds):
+            # Polls every 30s; a batch finishes only after 200s, past two stall warnings.
+            clock[0] += 30
+            if clock[0] >= 200:
+                VerificationJob.objects.filter(id=job.id).update(processed_count=10)
+
+        with mock.patch.object(tasks.time, 'monotonic', side_effect=lambda: clock[0]), \
+                mock.patch.object(tasks.time, 'sleep', side_effect=sleep), \
+                mock.patch('builtins.print') as log:
+            tasks._wait_for_capacity(job.id, 10, {'carried_forward': 0})
+
+        self.assertGreaterEqual(clock[0], 200)
+        stalls = [call for call in log.call_args_list if 'made no progress' in call.args[0]]
+        self.assertEqual(len(stalls), 2)
+
+
+@override_settings(EXTRACTION_CACHE_ENABLED=True)
+class ExtractionCacheMetricsTests(TestCase):
+    """Cache hits and misses are counted per job and exported to Prometheus."""
+
+    def extract(self):
+        with metrics.collecting() as collected:
+            values = local_extract_worker.extract_and_parse(b'scorecard', 'prompt', 3)
+        self.assertEqual(values, ['Ananya Rao', 'Suresh Rao', '612'])
+        return collected.events
+
+    def test_miss_then_hit(self):
+        reply = 'Ananya Rao,Suresh Rao,612'
+        with mock.patch.object(local_extract_worker, '_extract_data_from_local_model', return_value=reply) as model:
+            self.assertEqual(self.extract(), {'cache_misses': 1})
+            self.assertEqual(self.extract(), {'cache_hits': 1})
+        model.assert_called_once()
+
+        job = VerificationJob.objects.create()
+        metrics.init_job_metrics(job.id)
+        collected = metrics.StageMetrics()
+        collected.count('cache_hits', 3)
+        collected.count('cache_misses')
+        metrics.save_job_metrics(job.id, collected)
+        exported = metrics.render_prometheus_metrics()
+        self.assertIn('rac_pipeline_events_total{event="cache_hits"} 3', exported)
+        self.assertIn('rac_pipeline_events_total{event="cache_misses"} 1', exported)
+
+
+class ChunkedMasterIndexTests(SimpleTestCase):
+    """An index built chunk by chunk matches one built from the whole file."""
+
+    ROWS = [
+        '101,Ananya Rao,Suresh Rao,Lata Rao,2000-01-01,GEN,2023,CS23S12085106,CS,612,55.2,1874',
+        '102,Vikram Singh,,Asha Singh,1999-05-05,OBC,2022,EC22S51012345,EC,480,41.0,5120',
+        '103,Meera Iyer,Ravi Iyer,Uma Iyer,2001-02-02,GEN,2023,ME23S11111111,ME,701,66.6,402',
+        '101,Duplicate Row,Someone,Else,2000-01-01,GEN,2021,CS21S00000000,CS,100,10.0,99999',
+    ]
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'master.csv')
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(self.ROWS) + '\n')
+
+    def test_chunked_index_matches_whole_file(self):
+        whole = load_master_index(self.path)
+        with override_settings(MASTER_CSV_CHUNKED_ABOVE_MB=0, MASTER_CSV_CHUNK_ROWS=2):
+            chunked = load_master_index(self.path)
+
+        self.assertEqual(list(chunked.ids), ['101', '102', '103'])
+        self.assertEqual(list(chunked.ids), list(whole.ids))
+        for column in whole.columns:
+            np.testing.assert_array_equal(chunked.raw[column].astype(str), whole.raw[column].astype(str))
+            np.testing.assert_array_equal(chunked.display[column], whole.display[column])
+            np.testing.assert_array_equal(chunked.normalised[column], whole.normalised[column])
+        self.assertEqual(chunked.get('101').get('name'), 'Ananya Rao')
+        self.assertTrue(pd.isna(chunked.get('102').get('father_name')))
+
+
+class VerifyManyParityTests(SimpleTestCase):
+    """verify_many gives the same report rows as verify_and_create_row, one candidate at a time."""
+
+    MASTER_ROWS = [
+        '101,Ananya Rao,Suresh Rao,,,,2023,CS23S12085106,CS,612,55.2,1874',
+        '102,Vikram Singh,,,,,2022,EC22S51012345,EC,480,41.0,5120',
+        '103,Meera Iyer,Ravi Iyer,,,,2023,ME23S11111111,ME,701,66.6,402',
+        '104,Rahul Das,Amit Das,,,,2021,CE21S22222222,CE,550,50,3001',
+    ]
+    EXTRACTED = {
+        # Case, whitespace and trailing punctuation are ignored.
+        '101': {'name': 'ANANYA RAO.', 'father_name': ' suresh rao', 'registration_id': 'cs23s12085106',
+                'year': '2023', 'paper_code': 'CS', 'score': '612', 'scoreof100': '55.2,', 'rank': '1874'},
+        # Missing master value, and numbers that only match as text.
+        '102': {'name': 'Vikram Singh', 'father_name': 'Raj Singh', 'registration_id': 'EC22S51012345',
+                'year': '2022', 'paper_code': 'EC', 'score': 480, 'scoreof100': '41', 'rank': '5,120'},
+        # Nothing could be parsed.
+        '103': {},
+        # Fields the model left out are reported as N/A.
+        '104': {'name': 'Rahul Das', 'registration_id': 'CE21S22222222', 'score': '550'},
+        # Not in the master data.
+        '999': {'name': 'Nobody', 'rank': '1'},
+    }
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, 'master.csv')
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.MASTER_ROWS) + '\n')
+        self.master_df = load_and_prepare_csv(path)
+
+    def test_mixed_batch(self):
+        frame = pd.DataFrame.from_records(
+            [{'id': applicant_id, **fields} for applicant_id, fields in self.EXTRACTED.items()],
+            columns=['id', 'name', 'father_name', 'registration_id', 'year', 'score', 'scoreof100', 'rank', 'paper_code'],
+        )
+        report = verify_many(MasterIndex(self.master_df), frame)
+
+        self.assertEqual(list(report['id']), list(self.EXTRACTED))
+        for (applicant_id, fields), batch_row in zip(self.EXTRACTED.items(), report.to_dict('records')):
+            row, _ = verify_and_create_row(self.master_df, applicant_id, fields)
+            with self.subTest(applicant_id=applicant_id):
+                self.assertEqual({column: str(value) for column, value in batch_row.items()},
+                                 {column: str(value) for column, value in zip(REPORT_COLUMNS, row)})
+        statuses = report.set_index('id')
+        self.assertEqual(statuses.loc['101', 'name_status'], 'True')
+        self.assertEqual(statuses.loc['102', 'input_father_name'], 'n/a')
+        self.assertEqual(statuses.loc['102', 'scoreof100_status'], 'False')
+        self.assertEqual(statuses.loc['103', 'input_name'], 'PARSE_ERROR: Extracted data is not a valid dictionary.')
+        self.assertEqual(statuses.loc['104', 'extracted_rank'], 'N/A')
+        self.assertEqual(statuses.loc['999', 'input_name'], 'ID NOT FOUND IN MASTER CSV')
+
+
+class CompressImageTests(SimpleTestCase):
+    """Size targeting fits the budget in a few encodes and never shrinks below MIN_SCALE."""
+
+    def scanned_page(self, width, height):
+        page = Image.new('L', (width, height), 235)
+        draw = ImageDraw.Draw(page)
+        font = ImageFont.load_default(size=40)
+        for i in range((height - 200) // 55):
+            draw.text((150, 150 + i * 55), "Name of Candidate: Ananya Rao  Registration CS23S12085106  Score 612",
+                      font=font, fill=20)
+        # Scanner noise, so the page compresses like a real scan.
+        noisy = np.asarray(page, dtype=np.int16) + np.random.default_rng(0).normal(0, 12, (height, width)).astype(np.int16)
+        return Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)).convert('RGB')
+
+    def noise(self, side):
+        return Image.fromarray(np.random.default_rng(1).integers(0, 255, (side, side, 3), dtype=np.uint8))
+
+    def test_scanned_page_fits_the_budget(self):
+        for target_kb in (100, 200):
+            with self.subTest(target_kb=target_kb):
+                compressed, message = compress_worker.compress_image(self.scanned_page(2480, 3508), target_kb)
+                self.assertTrue(message.startswith('Success'), message)
+                self.assertLessEqual(len(compressed.data), target_kb * 1024)
+                self.assertLessEqual(compressed.encodes, 4)
+                self.assertEqual(compressed.data, compress_worker.encode_jpeg(compressed.image, compressed.quality))
+
+    def test_small_page_is_kept_at_full_size(self):
+        page = self.scanned_page(300, 400)
+        compressed, _ = compress_worker.compress_image(page, 100)
+        self.assertEqual(compressed.image.size, page.size)
+        self.assertEqual(compressed.quality, compress_worker.QUALITY_RANGE[1])
+        self.assertEqual(compressed.encodes, 1)
+
+    def test_large_image_stops_at_min_scale(self):
+        with metrics.collecting() as collected:
+            compressed, message = compress_worker.compress_image(self.noise(3000), 5)
+        self.assertTrue(message.startswith('FAILED target'), message)
+        self.assertEqual(compressed.image.size, (600, 600))
+        self.assertLessEqual(compressed.encodes, 3)
+        self.assertEqual(collected.events, {'compression_fallbacks': 1})
+
+    def test_small_image_stops_at_min_scale(self):
+        compressed, message = compress_worker.compress_image(self.noise(40), 0.3)
+        self.assertTrue(message.startswith('FAILED target'), message)
+        self.assertEqual(compressed.image.size, (8, 8))
+
+
+class OcrFastPathTests(SimpleTestCase):
+    """Parsing Tesseract output of scorecards, and when the fast path hands a candidate to the VLM."""
+
+    # Table layout, label and value on one line.
+    SCORECARD_2023 = '''GATE 2023 Scorecard
+Graduate Aptitude Test in Engineering (GATE) 2023
+Name of Candidate | UJWALA SATYANARAYAN NUTI
+Parent's/Guardian's Name | SATYANARAYAN RAJAYYA NUTI
+Registration Number | CS23S12085106
+Date of Birth | 12-Mar-2000
+Examination Paper | Computer Science and Information Technology (CS)
+Marks out of 100* | 25.00
+Qualifying Marks** | 32.5 29.2 21.6
+GATE Score | 266
+All India Rank in this paper | 21596
+Number of Candidates Appeared in this paper | 77257
+'''
+    # Values below their labels, and a registration number split by OCR.
+    SCORECARD_2022 = '''GATE 2022 SCORE CARD
+Name of the Candidate
+ARIHANT MAHENDRAKUMAR ABBAD
+Father's Name
+MAHENDRAKUMAR HIRALAL ABBAD
+Registration Number: CS22 S1 2090025
+Marks out of 100
+33.67
+GATE Score : 464
+All India Rank (AIR): 4071
+'''
+    # A poor scan: the score is misread and the rank is missing.
+    GARBLED = '''Scorecard
+Name: R. K. Sharma
+Registration No CE21S22222222
+GATE Score 5S0
+'''
+    MASTER_ROWS = [
+        '10140,UJWALA SATYANARAYAN NUTI,SATYANARAYAN RAJAYYA NUTI,,,,2023,CS23S12085106,CS,266,25,21596',
+        '10150,ARIHANT MAHENDRAKUMAR ABBAD,MAHENDRAKUMAR HIRALAL ABBAD,,,,2022,CS22S12090025,CS,464,33.67,4071',
+        '10160,R. K. Sharma,Mohan Sharma,,,,2021,CE21S22222222,CE,550,50,3001',
+    ]
+
+    def test_table_layout(self):
+        self.assertEqual(parse_ocr_text(self.SCORECARD_2023), {
+            'name': 'UJWALA SATYANARAYAN NUTI', 'father_name': 'SATYANARAYAN RAJAYYA NUTI',
+            'registration_id': 'CS23S12085106', 'year': '2023', 'score': '266', 'scoreof100': '25.00', 'rank': '21596',
+        })
+
+    def test_values_on_the_next_line(self):
+        self.assertEqual(parse_ocr_text(self.SCORECARD_2022), {
+            'name': 'ARIHANT MAHENDRAKUMAR ABBAD', 'father_name': 'MAHENDRAKUMAR HIRALAL ABBAD',
+            'registration_id': 'CS22S12090025', 'year': '2022', 'score': '464', 'scoreof100': '33.67', 'rank': '4071',
+        })
+
+    def test_unreadable_fields_are_left_out(self):
+        # The year falls back to the registration number's.
+        self.assertEqual(parse_ocr_text(self.GARBLED), {
+            'name': 'R. K. Sharma', 'registration_id': 'CE21S22222222', 'year': '2021',
+        })
+
+    def test_ocr_failure_gives_no_fields(self):
+        _, image = cv2.imencode('.jpg', np.full((40, 40, 3), 255, dtype=np.uint8))
+        with mock.patch('pipeline.workers.ocr_worker.pytesseract.image_to_string',
+                        side_effect=orientation_worker.pytesseract.TesseractNotFoundError()) as image_to_string:
+            self.assertEqual(ocr_extract(image.tobytes()), {})
+        image_to_string.assert_called_once()
+
+    def test_only_fully_matching_candidates_skip_the_vlm(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, 'master.csv')
+        with open(path, 'w') as f:
+            f.write('\n'.join(self.MASTER_ROWS) + '\n')
+        master_index = load_master_index(path)
+
+        # The "images" are the OCR text each scorecard gives.
+        ready = [
+            ('10140', 'can_10140/gate_scorecard.jpg', self.SCORECARD_2023.encode()),  # 25.00 is not 25
+            ('10150', 'can_10150/gate_scorecard.jpg', self.SCORECARD_2022.encode()),  # Every field matches
+            ('10160', 'can_10160/gate_scorecard.jpg', self.GARBLED.encode()),         # Score and rank missing
+            ('10170', 'can_10170/gate_scorecard.jpg', b''),                           # OCR failed
+        ]
+        extracted = {}
+        with mock.patch.object(tasks, 'get_preprocess_executor', return_value=mock.Mock(map=map)), \
+                mock.patch.object(tasks, 'ocr_extract', side_effect=lambda image: parse_ocr_text(image.decode())), \
+                metrics.collecting() as collected:
+            to_vlm = tasks._ocr_fast_path(master_index, ready, extracted)
+
+        self.assertEqual([applicant_id for applicant_id, _, _ in to_vlm], ['10140', '10160', '10170'])
+        self.assertEqual(list(extracted), ['10150'])
+        self.assertEqual(extracted['10150'][2]['paper_code'], 'CS')
+        self.assertEqual(collected.events, {'ocr_verified': 1})
+
+
+class RegionOfInterestTests(SimpleTestCase):
+    """Cropping a scorecard to its content box and to a template region of it."""
+
+    def setUp(self):
+        page = Image.new('RGB', (1240, 1754), 'white')
+        draw = ImageDraw.Draw(page)
+        font = ImageFont.load_default(size=30)
+        for i in range(24):
+            draw.text((150, 300 + i * 50), f"Line {i:02d}: Registration Number CS23S12085106 Score 612",
+                      font=font, fill='black')
+        # A scanner edge down the left margin, which is not content.
+        draw.rectangle((5, 0, 12, 1753), fill='black')
+        self.page = np.asarray(page)
+
+    def assertCleanEdges(self, region):
+        ink = (region < 128).any(axis=2)
+        # No text line is cut by an edge of the crop.
+        self.assertFalse(ink[0].any() or ink[-1].any() or ink[:, 0].any() or ink[:, -1].any())
+
+    def test_content_box(self):
+        region = crop_to_fields(self.page)
+        self.assertCleanEdges(region)
+        # The text block (about 1000x1190 px) plus padding, without the margins or the scanner edge.
+        self.assertLess(region.shape[1], 900)
+        self.assertLess(region.shape[0], 1300)
+        self.assertEqual((region < 128).any(axis=2).sum(), (self.page[:, 100:] < 128).any(axis=2).sum())
+
+    def test_template_selects_part_of_the_content_box(self):
+        content = crop_to_fields(self.page)
+        top = crop_to_fields(self.page, '0,0,1,0.5')
+        bottom = crop_to_fields(self.page, '0,0.5,1,1')
+        for region in (top, bottom):
+            self.assertCleanEdges(region)
+            self.assertEqual(region.shape[1], content.shape[1])
+            self.assertAlmostEqual(region.shape[0], content.shape[0] / 2, delta=0.05 * self.page.shape[0])
+        # Between them the halves hold every line once.
+        ink = lambda region: (region < 128).any(axis=2).sum()
+        self.assertEqual(ink(top) + ink(bottom), ink(content))
+
+    def test_pages_without_a_reliable_region_are_kept_whole(self):
+        blank = np.full_like(self.page, 255)
+        self.assertIs(crop_to_fields(blank), blank)
+        self.assertIs(crop_to_fields(self.page, '0.1,0.1,0.2,0.2'), self.page)  # Too small
+        self.assertIs(crop_to_fields(self.page, '0,0,2,1'), self.page)          # Invalid
+
+    @override_settings(SCORECARD_ROI_TEMPLATE='')
+    def test_empty_template_orients_crops_and_compresses_the_content_box(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, 'gate_scorecard.png')
+        Image.fromarray(self.page).save(path)
+
+        calls = mock.Mock()
+        for name in ('correct_orientation', 'crop_to_fields', 'compress_image'):
+            patcher = mock.patch.object(preprocess_engine, name, wraps=getattr(preprocess_engine, name))
+            calls.attach_mock(patcher.start(), name)
+            self.addCleanup(patcher.stop)
+
+        data = preprocess_engine._prepare_region_of_interest(path, 'gate_scorecard.png')
+
+        self.assertEqual([call[0] for call in calls.mock_calls], ['correct_orientation', 'crop_to_fields', 'compress_image'])
+        region = calls.compress_image.call_args.args[0]
+        self.assertEqual(region.size[::-1], crop_to_fields(self.page).shape[:2])
+        compressed = Image.open(io.BytesIO(data))
+        self.assertAlmostEqual(compressed.width / compressed.height, region.width / region.height, places=2)
+
+
+def report_row(applicant_id, mismatched=()):
+    """A full report row whose statuses are 'True' except for the `mismatched` fields."""
+    row = {column: f'{column} of {applicant_id}' for column in REPORT_COLUMNS}
+    row['id'] = applicant_id
+    for column in REPORT_COLUMNS:
+        if column.endswith('_status'):
+            row[column] = 'False' if column[:-len('_status')] in mismatched else 'True'
+    return row
+
+
+class JobResultsAPITests(TestCase):
+    """Keyset pagination, status filter and field projection of /results/."""
+
+    def setUp(self):
+        self.job = VerificationJob.objects.create(status='PROCESSING')
+        # Odd IDs have a mismatch.
+        insert_job_results(self.job.id, [report_row(str(i), ('rank',) if i % 2 else ()) for i in range(1, 8)])
+
+    def get(self, **params):
+        return self.client.get(f'/api/pipeline/results/{self.job.id}/', params)
+
+    def read_all(self, **params):
+        ids, after = [], 0
+        while True:
+            page = self.get(after=after, limit=3, **params).json()
+            self.assertLessEqual(len(page['results']), 3)
+            ids += [result['data']['id'] for result in page['results']]
+            if page['results']:
+                self.assertEqual(page['next_after'], page['results'][-1]['result_id'])
+                self.assertGreater(page['results'][0]['result_id'], after)
+            after = page['next_after']
+            if not page['has_more']:
+                return ids, after
+
+    def test_pages_cover_every_result_once(self):
+        ids, after = self.read_all()
+        self.assertEqual(ids, [str(i) for i in range(1, 8)])
+
+        # Results written later come after the last cursor, without repeating earlier ones.
+        insert_job_results(self.job.id, [report_row('8')])
+        page = self.get(after=after).json()
+        self.assertEqual([result['data']['id'] for result in page['results']], ['8'])
+        self.assertFalse(page['has_more'])
+
+    def test_status_filter(self):
+        self.assertEqual(self.read_all(status='mismatch')[0], ['1', '3', '5', '7'])
+        self.assertEqual(self.read_all(status='verified')[0], ['2', '4', '6'])
+
+    def test_field_projection(self):
+        page = self.get(fields='id,rank_status', limit=2).json()
+        self.assertEqual([result['data'] for result in page['results']],
+                         [{'id': '1', 'rank_status': 'False'}, {'id': '2', 'rank_status': 'True'}])
+
+    def test_bad_parameters(self):
+        for params in ({'after': 'abc'}, {'limit': '1.5'}, {'status': 'failed'}, {'fields': 'id,password'}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.client.get(f'/api/pipeline/results/{self.job.id + 1}/').status_code, 404)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class JobExportAPITests(TestCase):
+    """CSV and XLSX downloads of a job's report, read in several chunks."""
+
+    def setUp(self):
+        self.job = VerificationJob.objects.create(status='COMPLETE')
+        insert_job_results(self.job.id, [report_row(str(i), ('score',) if i % 2 else ()) for i in range(1, 6)])
+
+    def export(self, **params):
+        return self.client.get(f'/api/pipeline/export/{self.job.id}/', params)
+
+    def test_csv(self):
+        response = self.export(file_type='csv', status='mismatch')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="job_{self.job.id}_mismatch_report.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], REPORT_COLUMNS)
+        self.assertEqual([row[0] for row in rows[1:]], ['1', '3', '5'])
+        self.assertEqual(rows[1], [report_row('1', ('score',))[column] for column in REPORT_COLUMNS])
+
+    def test_xlsx(self):
+        response = self.export(file_type='xlsx')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertIn(f'filename="job_{self.job.id}_all_report.xlsx"', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Report']
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(rows[0], REPORT_COLUMNS)
+        self.assertEqual([row[0] for row in rows[1:]], ['1', '2', '3', '4', '5'])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.export(file_type='pdf').status_code, 400)
+        self.assertEqual(self.export(status='failed').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/pipeline/export/{self.job.id + 1}/').status_code, 404)
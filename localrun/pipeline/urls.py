@@ -1,8 +1,11 @@
 # pipeline/urls.py
 from django.urls import path
-from .api import StartVerificationAPIView, JobStatusAPIView
+from .api import StartVerificationAPIView, JobStatusAPIView, JobProgressAPIView, JobResultsAPIView, JobExportAPIView
 
 urlpatterns = [
     path('start/', StartVerificationAPIView.as_view(), name='start-verification'),
     path('status/<int:job_id>/', JobStatusAPIView.as_view(), name='job-status'),
+    path('progress/<int:job_id>/', JobProgressAPIView.as_view(), name='job-progress'),
+    path('results/<int:job_id>/', JobResultsAPIView.as_view(), name='job-results'),
+    path('export/<int:job_id>/', JobExportAPIView.as_view(), name='job-export'),
 ]
\ No newline at end of file
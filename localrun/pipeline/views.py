@@ -1,3 +1,8 @@
-from django.shortcuts import render
+from django.http import HttpResponse
 
-# Create your views here.
+from .metrics import render_prometheus_metrics
+
+
+def prometheus_metrics(request):
+    """Pipeline stage timings and event counters for Prometheus to scrape."""
+    return HttpResponse(render_prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
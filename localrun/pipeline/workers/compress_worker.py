@@ -1,15 +1,68 @@
 
 import os
 import io
+import math
+from collections import namedtuple
 from PIL import Image
 from pdf2image import convert_from_path
 
+from .. import metrics
+
+# Result of an in-memory compression: the encoded JPEG bytes, the exact image
+# that was encoded (after any resize), the JPEG quality that was used and how
+# many full JPEG encodes it took to find them.
+CompressedImage = namedtuple('CompressedImage', ['data', 'image', 'quality', 'encodes'])
+
+# --- Size-targeting parameters ---
+QUALITY_RANGE = (75, 85)  # Same bounds the old fixed waterfall used.
+MIN_SCALE = 0.2           # Smallest resize the old waterfall went down to.
+SCALE_TOLERANCE = 0.05    # Stop once the best fitting scale is known to within 5%.
+SCALE_SAFETY_MARGIN = 0.97  # Aim a little under the predicted scale, so the probe usually fits.
+WORKING_COPY_HEADROOM = 1.15
+# Rough JPEG size of a scanned document page at Q75. Only used for the first guess.
+ESTIMATED_BYTES_PER_PIXEL = 0.15
+
+
 def process_and_compress(source_path, destination_folder, target_size_kb=100, poppler_path=None):
     """
     Processes a single source file (PDF or image), aggressively compresses it
     to be under the target file size, and saves it as a JPEG.
     """
     base_name = os.path.splitext(os.path.basename(source_path))[0]
+
+    compressed, message = compress_in_memory(source_path, target_size_kb, poppler_path)
+    if compressed is None:
+        return None, message
+
+    final_path = os.path.join(destination_folder, f"{base_name}.jpg")
+    with open(final_path, 'wb') as f:
+        f.write(compressed.data)
+    return final_path, message
+
+
+def compress_in_memory(source_path, target_size_kb=100, poppler_path=None):
+    """
+    Same as `process_and_compress`, but keeps the result in memory instead of
+    writing it to disk, so later stages can use it without re-reading and
+    re-decoding the file.
+
+    Returns:
+        tuple: (CompressedImage or None, status message)
+    """
+    image_obj, message = load_source_image(source_path, poppler_path)
+    if image_obj is None:
+        return None, message
+    return compress_image(image_obj, target_size_kb)
+
+
+def load_source_image(source_path, poppler_path=None):
+    """
+    Decodes a source file (the first page of a PDF, or an image) into a PIL image.
+
+    Returns:
+        tuple: (PIL.Image or None, status message)
+    """
+    base_name = os.path.splitext(os.path.basename(source_path))[0]
     
     try:
         if source_path.lower().endswith('.pdf'):
@@ -19,77 +72,171 @@ def process_and_compress(source_path, destination_folder, target_size_kb=100, po
             
             # Convert the first page of the PDF to a PIL Image object
             page_image = convert_from_path(pdf_path=source_path, poppler_path=poppler_path, first_page=1, last_page=1)[0]
-            return _compress_image_object(page_image, base_name, destination_folder, target_size_kb)
+            return page_image, "Loaded"
 
         elif source_path.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
-            with Image.open(source_path) as img_obj:
-                return _compress_image_object(img_obj, base_name, destination_folder, target_size_kb)
+            # load() decodes the pixels and closes the file, so the image stays
+            # usable by later stages after this function returns.
+            img_obj = Image.open(source_path)
+            img_obj.load()
+            return img_obj, "Loaded"
         else:
             return None, "Unsupported file type."
             
     except Exception as e:
         return None, f"General error processing {base_name}: {e}"
 
-def _compress_image_object(image_obj, base_name, destination_folder, target_size_kb):
+
+def compress_image(image_obj, target_size_kb=100):
+    """
+    Compresses an already decoded PIL image to be under the target file size.
+
+    Returns:
+        tuple: (CompressedImage or None, status message)
+    """
+    try:
+        return _compress_image_object(image_obj, target_size_kb)
+    except Exception as e:
+        return None, f"General error compressing image: {e}"
+
+
+def encode_jpeg(image_obj, quality):
+    """Encodes a PIL image to JPEG bytes with the pipeline's standard settings."""
+    buffer = io.BytesIO()
+    image_obj.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _compress_image_object(image_obj, target_size_kb):
     """
-    Helper function that performs an aggressive, multi-stage compression to JPEG.
+    Helper function that finds the largest scale and highest quality whose
+    JPEG fits under the target size, using as few full encodes as possible.
+
+    1. Predict the scale from the pixel count. Big scans go straight to a
+       downscaled probe instead of encoding full-size attempts that could
+       never fit.
+    2. If the full-size image can fit, try the maximum quality, then the
+       minimum, then binary-search the highest quality in between that fits.
+    3. Otherwise search the scale at the minimum quality. Every measured
+       size refines a size-vs-scale model that picks the next probe, with
+       bisection as the fallback, and the probes are resized from one
+       downscaled working copy instead of the full original.
+
+    Returns:
+        tuple: (CompressedImage or None, status message)
     """
     target_bytes = target_size_kb * 1024
-    # The final output will now be a JPEG for maximum compression
-    final_path = os.path.join(destination_folder, f"{base_name}.jpg")
-    
-    best_effort_buffer = None
-    best_effort_size_kb = float('inf')
+    encodes = 0
+    best_effort = None  # Smallest encode seen, used if nothing fits.
+    measurements = []   # (scale, size) of every minimum-quality encode
 
     #JPEG does not support transparency (RGBA). Convert to RGB. ---
     if image_obj.mode == 'RGBA':
         image_obj = image_obj.convert('RGB')
 
-    # --- The Waterfall Compression Strategy ---
-    
-    # Attempt 1: High-Quality Full-Size JPEG
-    buffer = io.BytesIO()
-    image_obj.save(buffer, format='JPEG', quality=85, optimize=True)
-    current_size_kb = buffer.tell() / 1024
-    if current_size_kb < best_effort_size_kb:
-        best_effort_size_kb = current_size_kb
-        best_effort_buffer = io.BytesIO(buffer.getvalue())
-    if buffer.tell() <= target_bytes:
-        with open(final_path, 'wb') as f: f.write(buffer.getvalue())
-        return final_path, f"Success with JPEG (Q=85) at {current_size_kb:.1f} KB"
-
-    # Attempt 2: Medium-Quality Full-Size JPEG
-    buffer.seek(0); buffer.truncate(0) # Reset buffer
-    image_obj.save(buffer, format='JPEG', quality=75, optimize=True)
-    current_size_kb = buffer.tell() / 1024
-    if current_size_kb < best_effort_size_kb:
-        best_effort_size_kb = current_size_kb
-        best_effort_buffer = io.BytesIO(buffer.getvalue())
-    if buffer.tell() <= target_bytes:
-        with open(final_path, 'wb') as f: f.write(buffer.getvalue())
-        return final_path, f"Success with JPEG (Q=75) at {current_size_kb:.1f} KB"
-        
-    # Attempt 3: Iterative Resizing + Medium-Quality JPEG
-    for scale_percent in [90, 75, 60, 50, 40, 30, 20]:
-        new_width = int(image_obj.width * scale_percent / 100)
-        new_height = int(image_obj.height * scale_percent / 100)
-        resized_img = image_obj.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        buffer.seek(0); buffer.truncate(0)
-        resized_img.save(buffer, format='JPEG', quality=75, optimize=True)
-        
-        current_size_kb = buffer.tell() / 1024
-        if current_size_kb < best_effort_size_kb:
-            best_effort_size_kb = current_size_kb
-            best_effort_buffer = io.BytesIO(buffer.getvalue())
-        if buffer.tell() <= target_bytes:
-            with open(final_path, 'wb') as f: f.write(buffer.getvalue())
-            return final_path, f"Success with {scale_percent}% Resize (Q=75) at {current_size_kb:.1f} KB"
-
-    # If all attempts failed, save the smallest version we found.
-    if best_effort_buffer:
-        with open(final_path, 'wb') as f:
-            f.write(best_effort_buffer.getvalue())
-        return final_path, f"FAILED target, but saved best effort at {best_effort_size_kb:.1f} KB"
+    def encode(img, quality, scale=None):
+        nonlocal encodes, best_effort
+        encodes += 1
+        data = encode_jpeg(img, quality)
+        if best_effort is None or len(data) < len(best_effort.data):
+            best_effort = CompressedImage(data, img, quality, None)
+        if scale is not None:
+            measurements.append((scale, len(data)))
+        return data
+
+    def predict_scale():
+        # Model the size as scale ** exponent. The exponent is 2 (size follows
+        # the pixel count) until two measurements allow estimating it.
+        scale, size = measurements[-1]
+        exponent = 2.0
+        if len(measurements) >= 2:
+            prev_scale, prev_size = measurements[-2]
+            if prev_scale != scale and prev_size != size:
+                exponent = math.log(size / prev_size) / math.log(scale / prev_scale)
+                exponent = min(max(exponent, 1.0), 2.5)
+        return scale * (target_bytes / size) ** (1 / exponent) * SCALE_SAFETY_MARGIN
+
+    min_quality, max_quality = QUALITY_RANGE
+    fitting = None  # (data, image, scale) of the largest scale that fits so far
+    low, high = MIN_SCALE, 1.0  # The best fitting scale lies in [low, high)
+
+    predicted_bytes = image_obj.width * image_obj.height * ESTIMATED_BYTES_PER_PIXEL
+    scale_guess = math.sqrt(target_bytes / predicted_bytes) if predicted_bytes else 1.0
+
+    # --- Step 1: one probe at the predicted scale for images that look too big ---
+    if scale_guess < 1.0:
+        scale = max(MIN_SCALE, scale_guess * SCALE_SAFETY_MARGIN)
+        probe = _resize(image_obj, scale)
+        data = encode(probe, min_quality, scale)
+        if len(data) <= target_bytes:
+            fitting, low = (data, probe, scale), scale
+        else:
+            high = scale
+        scale_guess = predict_scale() / SCALE_SAFETY_MARGIN
+
+    # --- Step 2: quality search at full size ---
+    if scale_guess >= 1.0 and high == 1.0:
+        data = encode(image_obj, max_quality)
+        if len(data) <= target_bytes:
+            return (CompressedImage(data, image_obj, max_quality, encodes),
+                    f"Success with JPEG (Q={max_quality}) at {len(data) / 1024:.1f} KB after {encodes} encodes")
+
+        data = encode(image_obj, min_quality, 1.0)
+        if len(data) <= target_bytes:
+            best, low_q, high_q = (data, min_quality), min_quality + 1, max_quality - 1
+            while low_q <= high_q:
+                quality = (low_q + high_q) // 2
+                data = encode(image_obj, quality)
+                if len(data) <= target_bytes:
+                    best, low_q = (data, quality), quality + 1
+                else:
+                    high_q = quality - 1
+            data, quality = best
+            return (CompressedImage(data, image_obj, quality, encodes),
+                    f"Success with JPEG (Q={quality}) at {len(data) / 1024:.1f} KB after {encodes} encodes")
+
+    # --- Step 3: scale search at minimum quality ---
+    # One working copy, slightly larger than the best guess, that the probes
+    # are resized from. Only a probe above it has to go back to the original.
+    working_scale = min(high, max(scale_guess * WORKING_COPY_HEADROOM, low))
+    working = _resize(image_obj, working_scale) if working_scale < 1.0 else image_obj
+
+    margin = SCALE_TOLERANCE / 2
+    while high - low > SCALE_TOLERANCE or (fitting is None and high > MIN_SCALE):
+        if fitting is None and high - low <= SCALE_TOLERANCE:
+            scale = MIN_SCALE  # Nothing fitted yet: the smallest size is the last thing to try.
+        else:
+            scale = predict_scale() if measurements else scale_guess * SCALE_SAFETY_MARGIN
+            if fitting is not None and scale <= low + margin:
+                break  # The model puts the best scale within tolerance of the one we have.
+            if not (low + margin <= scale <= high - margin):
+                scale = (low + high) / 2
+
+        if scale <= working_scale:
+            probe = _resize(working, scale / working_scale) if scale < working_scale else working
+        else:
+            probe = _resize(image_obj, scale)
+        data = encode(probe, min_quality, scale)
+        if len(data) <= target_bytes:
+            fitting, low = (data, probe, scale), scale
+        else:
+            high = scale
+
+    if fitting:
+        data, probe, scale = fitting
+        return (CompressedImage(data, probe, min_quality, encodes),
+                f"Success with {scale * 100:.0f}% Resize (Q={min_quality}) at {len(data) / 1024:.1f} KB after {encodes} encodes")
+
+    # If all attempts failed, keep the smallest version we found.
+    if best_effort:
+        metrics.count('compression_fallbacks')
+        best_effort = best_effort._replace(encodes=encodes)
+        return best_effort, f"FAILED target, but saved best effort at {len(best_effort.data) / 1024:.1f} KB after {encodes} encodes"
     
-    return None, "All compression attempts failed."
\ No newline at end of file
+    return None, "All compression attempts failed."
+
+
+def _resize(image_obj, scale):
+    new_width = max(1, int(image_obj.width * scale))
+    new_height = max(1, int(image_obj.height * scale))
+    return image_obj.resize((new_width, new_height), Image.Resampling.LANCZOS)
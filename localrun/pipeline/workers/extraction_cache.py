@@ -0,0 +1,96 @@
+# localrun/pipeline/workers/extraction_cache.py
+import hashlib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import ExtractionCacheEntry
+
+# Hits and misses are counted as pipeline metrics by the callers.
+_stores = 0
+_stores_lock = threading.Lock()
+
+# Eviction is a table scan, so it only runs every this many stores per process.
+EVICT_EVERY_N_STORES = 500
+
+
+def is_cache_enabled():
+    return getattr(settings, 'EXTRACTION_CACHE_ENABLED', True)
+
+
+def make_cache_key(image_bytes, prompt):
+    """
+    SHA-256 over the compressed image bytes, the prompt and the model name.
+    Any change to one of them produces a different key.
+    """
+    model_name = getattr(settings, 'LOCAL_MODEL_NAME', 'local-vlm')
+    digest = hashlib.sha256()
+    digest.update(image_bytes)
+    digest.update(b'\0')
+    digest.update(prompt.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(model_name.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_cached_response(cache_key):
+    """
+    Returns the cached raw model response for the key, or None on a miss.
+    Entries older than the TTL count as misses.
+    """
+    ttl_days = getattr(settings, 'EXTRACTION_CACHE_TTL_DAYS', 30)
+    now = timezone.now()
+    try:
+        entry = ExtractionCacheEntry.objects.only('response', 'last_used_at').get(key=cache_key)
+    except ExtractionCacheEntry.DoesNotExist:
+        return None
+
+    if entry.last_used_at < now - timedelta(days=ttl_days):
+        return None
+
+    ExtractionCacheEntry.objects.filter(key=cache_key).update(last_used_at=now, hit_count=F('hit_count') + 1)
+    return entry.response
+
+
+def store_response(cache_key, response):
+    """Saves a known-good raw model response under the key."""
+    ExtractionCacheEntry.objects.update_or_create(
+        key=cache_key,
+        defaults={
+            'model_name': getattr(settings, 'LOCAL_MODEL_NAME', 'local-vlm'),
+            'response': response,
+            'last_used_at': timezone.now(),
+        }
+    )
+    global _stores
+    with _stores_lock:
+        _stores += 1
+        evict = _stores % EVICT_EVERY_N_STORES == 0
+    if evict:
+        evict_stale_entries()
+
+
+def evict_stale_entries():
+    """
+    Drops entries that have not been used within the TTL, then trims the
+    least recently used entries until the table is within its size limit.
+    """
+    ttl_days = getattr(settings, 'EXTRACTION_CACHE_TTL_DAYS', 30)
+    max_entries = getattr(settings, 'EXTRACTION_CACHE_MAX_ENTRIES', 100000)
+
+    cutoff = timezone.now() - timedelta(days=ttl_days)
+    expired, _ = ExtractionCacheEntry.objects.filter(last_used_at__lt=cutoff).delete()
+
+    overflow = ExtractionCacheEntry.objects.count() - max_entries
+    trimmed = 0
+    if overflow > 0:
+        lru_keys = list(
+            ExtractionCacheEntry.objects.order_by('last_used_at').values_list('key', flat=True)[:overflow]
+        )
+        trimmed, _ = ExtractionCacheEntry.objects.filter(key__in=lru_keys).delete()
+
+    print(f"[EXTRACTION CACHE] Evicted {expired} expired and {trimmed} least recently used entries.")
+    return expired + trimmed
@@ -0,0 +1,44 @@
+# localrun/pipeline/workers/fingerprint_worker.py
+import os
+import hashlib
+
+
+def fingerprint_file(file_path, previous=None):
+    """
+    Builds the fingerprint of a candidate's scorecard file.
+
+    If `previous` (a CandidateFingerprint from an earlier job) has the same
+    path, size and mtime, its content hash is reused instead of re-reading
+    the file. Otherwise the file is hashed with SHA-256.
+
+    Returns:
+        dict: file_path, file_size, file_mtime and content_hash.
+    """
+    stat = os.stat(file_path)
+    fingerprint = {
+        'file_path': file_path,
+        'file_size': stat.st_size,
+        'file_mtime': stat.st_mtime,
+    }
+
+    if (previous is not None and previous.file_path == file_path
+            and previous.file_size == stat.st_size and previous.file_mtime == stat.st_mtime):
+        fingerprint['content_hash'] = previous.content_hash
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    fingerprint['content_hash'] = digest.hexdigest()
+    return fingerprint
+
+
+def hash_master_row(master_index, applicant_id):
+    """
+    Returns a SHA-256 over all master CSV values for the applicant, so any
+    edit to their row (e.g. a fixed typo) changes the hash.
+    """
+    record = master_index.get(applicant_id)
+    row_text = '' if record is None else '\x1f'.join(str(value) for value in record.raw)
+    return hashlib.sha256(row_text.encode('utf-8')).hexdigest()
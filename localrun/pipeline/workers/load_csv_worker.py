@@ -1,53 +1,127 @@
 # pipeline/workers/load_csv_worker.py
+import os
 import pandas as pd
+from django.conf import settings
+
+from .master_index import MasterIndex
+
+# Position of every column in the master CSV. Only the ones in
+# VERIFICATION_COLUMNS are read; the rest are never used by the pipeline.
+MASTER_COLUMN_POSITIONS = {
+    'basic_id': 0, 'name': 1, 'father_name': 2, 'mother_name': 3, 'dob': 4, 'category': 5,
+    'gate_year': 6, 'registration_number': 7, 'gate_paper_code': 8, 'gate_valid_score': 9,
+    'gate_mark': 10, 'gate_rank': 11, 'degree_name': 12, 'subject_name': 13, 'university_name': 14,
+    'percentage': 15, 'cgpa_calculation': 16, 'passing_year': 17, 'degree_division': 18,
+}
+
+# The columns verify_and_create_row compares against (plus the ID).
+VERIFICATION_COLUMNS = [
+    'basic_id', 'name', 'father_name', 'gate_year', 'registration_number',
+    'gate_paper_code', 'gate_valid_score', 'gate_mark', 'gate_rank',
+]
+
+# Few distinct values across a whole drive, so they are stored as categoricals.
+CATEGORICAL_COLUMNS = ['gate_year', 'gate_paper_code']
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'  # Compact, contiguous storage for the text columns.
+except ImportError:
+    STRING_DTYPE = str
+
 
 def load_and_prepare_csv(file_path: str) -> pd.DataFrame:
     """
     Loads the master user CSV, prepares it for matching, and sets the ID as the index.
-    This version is robust and can handle CSVs with more columns than expected.
+    Only the columns needed for verification are read, with the C parser.
     """
     try:
         print(f"Attempting to load master data from: {file_path}")
-        df = pd.read_csv(file_path, header=None, dtype=str, engine='python')
-
-        # --- START OF THE ROBUST FIX ---
-        
-        # Define the base names for the columns we know about.
-        base_column_names = [
-            'basic_id', 'name', 'father_name', 'mother_name', 'dob', 'category', 'gate_year', 'registration_number', 'gate_paper_code', 'gate_valid_score', 'gate_mark', 'gate_rank', 'degree_name', 'subject_name', 'university_name', 'percentage', 'cgpa_calculation', 'passing_year', 'degree_division'
-        ]
-        
-        # Get the actual number of columns found in the CSV file.
-        num_actual_columns = len(df.columns)
-        
-        final_column_names = base_column_names[:num_actual_columns]
-
-        # If the CSV has MORE columns than our base list, generate generic names for them.
-        if num_actual_columns > len(base_column_names):
-            for i in range(len(base_column_names), num_actual_columns):
-                final_column_names.append(f'extra_col_{i + 1 - len(base_column_names)}')
-        
-        # Assign the perfectly sized list of names to the DataFrame.
-        df.columns = final_column_names
-
-        print(f"-> CSV has {num_actual_columns} columns. Assigned names: {final_column_names}")
-        
-        # --- END OF THE ROBUST FIX ---
-        
-        # Now we only strip whitespace and do NOT convert to lowercase.
-        df_prepared = df.apply(lambda x: x.str.strip())
-        
-        if 'basic_id' in df_prepared.columns:
-            df_prepared = df_prepared.set_index('basic_id')
-            print("-> Master data loaded and prepared successfully (original case preserved).")
-            return df_prepared
-        else:
-            print("Error: 'basic_id' column not found in the master CSV.")
+        df_prepared = _prepare_chunk(_read_master_csv(file_path))
+
+        for column in CATEGORICAL_COLUMNS:
+            if column in df_prepared.columns:
+                df_prepared[column] = df_prepared[column].astype('category')
+
+        print(f"-> Master data loaded and prepared successfully ({len(df_prepared)} rows, original case preserved).")
+        return df_prepared
+
+    except Exception as e:
+        _report_load_error(file_path, e)
+        return None
+
+
+def load_master_index(file_path: str):
+    """
+    Loads the master user CSV straight into a MasterIndex, or returns None if
+    it can't be loaded.
+
+    Files larger than MASTER_CSV_CHUNKED_ABOVE_MB are parsed in chunks of
+    MASTER_CSV_CHUNK_ROWS rows that are added to the index one at a time, so
+    loading never holds more than one raw chunk on top of the index.
+    """
+    if os.path.exists(file_path) and os.path.getsize(file_path) > getattr(settings, 'MASTER_CSV_CHUNKED_ABOVE_MB', 64) * 1024 * 1024:
+        try:
+            print(f"Attempting to load master data in chunks from: {file_path}")
+            master_index = MasterIndex.from_chunks(
+                iter_master_csv_chunks(file_path, getattr(settings, 'MASTER_CSV_CHUNK_ROWS', 200000))
+            )
+            print(f"-> Master data loaded and indexed successfully ({len(master_index)} applicants).")
+            return master_index
+        except Exception as e:
+            _report_load_error(file_path, e)
             return None
 
-    except FileNotFoundError:
+    master_df = load_and_prepare_csv(file_path)
+    return MasterIndex(master_df) if master_df is not None else None
+
+
+def _report_load_error(file_path, error):
+    if isinstance(error, FileNotFoundError):
         print(f"Error: The master CSV file was not found at '{file_path}'.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while loading the master CSV: {e}")
-        return None
\ No newline at end of file
+    elif isinstance(error, pd.errors.EmptyDataError):
+        print(f"Error: The master CSV file at '{file_path}' is empty.")
+    else:
+        print(f"An unexpected error occurred while loading the master CSV: {error}")
+
+
+def iter_master_csv_chunks(file_path: str, chunksize: int):
+    """
+    Yields the master CSV as prepared, basic_id-indexed DataFrames of at most
+    `chunksize` rows each, for consumers that don't need the whole file at once.
+    """
+    for chunk in _read_master_csv(file_path, chunksize=chunksize):
+        yield _prepare_chunk(chunk)
+
+
+def _read_master_csv(file_path, chunksize=None):
+    # Files with fewer columns than expected are still accepted; the missing
+    # columns are added back as empty in _prepare_chunk.
+    num_columns = len(pd.read_csv(file_path, header=None, nrows=1, dtype=str, engine='c').columns)
+    positions = [MASTER_COLUMN_POSITIONS[column] for column in VERIFICATION_COLUMNS
+                 if MASTER_COLUMN_POSITIONS[column] < num_columns]
+    print(f"-> CSV has {num_columns} columns. Reading {len(positions)} of them for verification.")
+    # usecols also makes the C parser tolerate rows with extra trailing fields.
+    return pd.read_csv(
+        file_path,
+        header=None,
+        usecols=positions,
+        dtype=STRING_DTYPE,
+        engine='c',
+        chunksize=chunksize,
+    )
+
+
+def _prepare_chunk(df):
+    # read_csv returns usecols in file order; map the positions back to names.
+    names_by_position = {position: column for column, position in MASTER_COLUMN_POSITIONS.items()}
+    df.columns = [names_by_position[position] for position in df.columns]
+    for column in VERIFICATION_COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.Series(pd.NA, index=df.index, dtype=STRING_DTYPE)
+
+    # Now we only strip whitespace and do NOT convert to lowercase.
+    for column in df.columns:
+        df[column] = df[column].str.strip()
+
+    return df.set_index('basic_id')
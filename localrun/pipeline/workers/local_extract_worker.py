@@ -1,45 +1,101 @@
-# localrun/pipeline/workers/extract_worker.py
+# localrun/pipeline/workers/local_extract_worker.py
 
 import os
+import re
 import base64
 import mimetypes
 import requests
 import json
 import time
+import threading
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def extract_and_parse(image_path, prompt, expected_columns):
+from .. import metrics
+from . import extraction_cache
+from .model_slots import model_slot
+
+# --- Shared HTTP client ---
+# One keep-alive session per process, so consecutive requests to llama-server
+# reuse pooled connections instead of opening a new socket for every image.
+# LOCAL_MODEL_MAX_CONCURRENCY, which should match the number of parallel slots
+# llama-server was started with, caps the requests in flight across every
+# worker process (`model_slot`); the semaphore applies it per process too, so
+# the cap still holds within a process when Redis is unavailable.
+_session = None
+_session_lock = threading.Lock()
+_inflight = threading.BoundedSemaphore(getattr(settings, 'LOCAL_MODEL_MAX_CONCURRENCY', 4))
+
+
+def _get_session():
+    """Lazily builds the pooled session used for every call to the local model."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=getattr(settings, 'LOCAL_MODEL_MAX_RETRIES', 2),
+                    read=0,  # A read timeout means the slot is still busy; don't queue the same image again.
+                    backoff_factor=getattr(settings, 'LOCAL_MODEL_BACKOFF_SECONDS', 1.0),
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=None,  # Retry POSTs as well; the request is idempotent.
+                )
+                pool_size = getattr(settings, 'LOCAL_MODEL_MAX_CONCURRENCY', 4)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({"Content-Type": "application/json"})
+                _session = session
+    return _session
+
+def extract_and_parse(image, prompt, expected_columns):
     """
     Extracts data from an image by calling the local llama-server.
     If a PARSE_ERROR occurs, it will automatically retry up to 2 more times (3 total attempts).
+
+    `image` is either a path to the compressed image or its encoded bytes.
     """
+    # A cached response for the same image bytes + prompt + model skips the model entirely.
+    cache_key, cached_response = _lookup_cache(image, prompt)
+    if cached_response is not None:
+        cached_values = _parse_csv_response(cached_response)
+        if len(cached_values) == expected_columns:
+            print(f"[EXTRACT WORKER] Cache hit for: {_image_label(image)}")
+            metrics.count('cache_hits')
+            return cached_values
+    if cache_key is not None:
+        metrics.count('cache_misses')
+
     # --- START OF NEW RETRY LOGIC ---
     max_attempts = 3
     for attempt in range(max_attempts):
-        print(f"[EXTRACT WORKER] Attempt {attempt + 1}/{max_attempts} for: {os.path.basename(image_path)}")
+        print(f"[EXTRACT WORKER] Attempt {attempt + 1}/{max_attempts} for: {_image_label(image)}")
         
         # Call the underlying extraction function
-        raw_response = _extract_data_from_local_model(image_path, prompt)
+        raw_response = _extract_data_from_local_model(image, prompt)
 
         # Check for network or catastrophic API errors first. These should not be retried.
         if raw_response.startswith("ERROR:"):
+            metrics.count('api_errors')
             return [f"API_OR_FILE_ERROR: {raw_response}"] + [''] * (expected_columns - 1)
 
-        # Clean up potential markdown, backticks, and other common LLM artifacts
-        cleaned_response = raw_response.replace('*', '').replace('`', '').strip()
-        
-        # Parse the cleaned response
-        parsed_values = [value.strip() for value in cleaned_response.split(',')]
+        parsed_values = _parse_csv_response(raw_response)
 
         # Check if parsing was successful
         if len(parsed_values) == expected_columns:
             print(f"[EXTRACT WORKER] Success on attempt {attempt + 1}.")
+            _save_to_cache(cache_key, raw_response)
             return parsed_values # If successful, exit the loop and return the data
         
         # If parsing failed, log it and prepare for the next attempt
         print(f"[EXTRACT WORKER] WARNING: Parse error on attempt {attempt + 1}. Expected {expected_columns}, got {len(parsed_values)}. Raw: '{raw_response}'")
+        metrics.count('parse_errors')
         
         # If this wasn't the last attempt, wait a moment before retrying
         if attempt < max_attempts - 1:
+            metrics.count('extract_retries')
             print("[EXTRACT WORKER] Waiting 1 second before retrying...")
             time.sleep(1)
 
@@ -52,51 +108,109 @@ def extract_and_parse(image_path, prompt, expected_columns):
     return [final_error_msg] + [''] * (expected_columns - 1)
 
 
-def _encode_image_to_base64_uri(file_path):
-    """Helper function to read an image and encode it as a Data URI."""
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if not mime_type or not mime_type.startswith('image'):
-        raise ValueError(f"File is not a recognized image type: {file_path}")
-    with open(file_path, "rb") as image_file:
-        base64_data = base64.b64encode(image_file.read()).decode('utf-8')
+def _parse_csv_response(raw_response):
+    """Strips markdown/backtick artifacts from a model reply and splits it on commas."""
+    cleaned_response = raw_response.replace('*', '').replace('`', '').strip()
+    return [value.strip() for value in cleaned_response.split(',')]
+
+
+def _lookup_cache(image, prompt):
+    """
+    Returns (cache_key, cached_response). Both are None when the cache is
+    disabled or unavailable; a cache problem must never fail an extraction.
+    """
+    if not extraction_cache.is_cache_enabled():
+        return None, None
+    try:
+        cache_key = extraction_cache.make_cache_key(_read_image_bytes(image), prompt)
+        return cache_key, extraction_cache.get_cached_response(cache_key)
+    except Exception as e:
+        print(f"[EXTRACT WORKER] WARNING: Extraction cache lookup failed: {e}")
+        return None, None
+
+
+def _save_to_cache(cache_key, raw_response):
+    if cache_key is None:
+        return
+    try:
+        extraction_cache.store_response(cache_key, raw_response)
+    except Exception as e:
+        print(f"[EXTRACT WORKER] WARNING: Could not store response in extraction cache: {e}")
+
+
+def _image_label(image):
+    """Short description of an image argument for log messages."""
+    if isinstance(image, (bytes, bytearray)):
+        return f"<in-memory image, {len(image) / 1024:.1f} KB>"
+    return os.path.basename(image)
+
+
+def _read_image_bytes(image):
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    with open(image, "rb") as image_file:
+        return image_file.read()
+
+
+def _encode_image_to_base64_uri(image):
+    """
+    Helper function to encode an image as a Data URI. In-memory images are
+    always the pipeline's JPEG output; paths are typed by their extension.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        mime_type = "image/jpeg"
+    else:
+        mime_type, _ = mimetypes.guess_type(image)
+        if not mime_type or not mime_type.startswith('image'):
+            raise ValueError(f"File is not a recognized image type: {image}")
+    base64_data = base64.b64encode(_read_image_bytes(image)).decode('utf-8')
     # The llama.cpp server's OpenAI-compatible endpoint expects this full Data URI format
     return f"data:{mime_type};base64,{base64_data}"
 
 
-def _extract_data_from_local_model(image_path, prompt):
+def _extract_data_from_local_model(image, prompt):
     """
     This is the new core function. It sends a request to your local
     llama-server with the correct OpenAI-compatible payload for vision models.
     """
+    return _request_completion([image], prompt)
+
+
+def _request_completion(images, prompt):
+    """
+    Sends one chat-completion request with the prompt and one or more images
+    and returns the reply text, or an "ERROR: ..." string on failure.
+    """
+    label = _image_label(images[0]) if len(images) == 1 else f"{len(images)} images"
     try:
         # The URL for the local llama-server's CHAT completions endpoint
-        url = "http://host.docker.internal:8080/v1/chat/completions"
-        # url = "http://127.0.0.1:8080/v1/chat/completions" # <-- Using the standard chat endpoint
-        
-        image_data_uri = _encode_image_to_base64_uri(image_path)
-        
-        # --- START OF THE CRITICAL FIX ---
+        url = getattr(settings, 'LOCAL_MODEL_URL', "http://host.docker.internal:8080/v1/chat/completions")
+
         # This is the correct, modern, OpenAI-compatible format for multi-modal input.
         # It's a list of message objects, where the user's message content is a list of parts.
+        # The prompt goes before the images, so every request starts with the
+        # same tokens and llama-server's prompt cache can reuse that prefix.
+        content = [{"type": "text", "text": prompt}]
+        for number, image in enumerate(images, start=1):
+            if len(images) > 1:
+                content.append({"type": "text", "text": f"Image {number}:"})
+            content.append({"type": "image_url", "image_url": {"url": _encode_image_to_base64_uri(image)}})
+
         payload = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "image_url", "image_url": {"url": image_data_uri}},
-                        {"type": "text", "text": prompt}
-                    ]
-                }
-            ],
-            "max_tokens": 256,
-            "temperature": 0.1
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": 256 * len(images),
+            "temperature": 0.1,
+            "cache_prompt": True,
         }
-        # --- END OF THE CRITICAL FIX ---
 
-        headers = {"Content-Type": "application/json"}
+        timeout = (
+            getattr(settings, 'LOCAL_MODEL_CONNECT_TIMEOUT', 5),
+            getattr(settings, 'LOCAL_MODEL_READ_TIMEOUT', 300),
+        )
 
-        print(f"[EXTRACT WORKER] Sending request to local model for: {os.path.basename(image_path)}")
-        response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=300)
+        with _inflight, model_slot():
+            print(f"[EXTRACT WORKER] Sending request to local model for: {label}")
+            response = _get_session().post(url, data=json.dumps(payload), timeout=timeout)
         response.raise_for_status()
         
         response_data = response.json()
@@ -109,14 +223,100 @@ def _extract_data_from_local_model(image_path, prompt):
         return f"ERROR: Network error connecting to local model - {e}"
     except Exception as e:
         return f"ERROR: An unexpected error occurred in local extraction - {e}"
-    
+
+
+def extract_batch(images, prompt, expected_columns):
+    """
+    Extracts several images with a single request to the local model.
+
+    The reply is expected to hold one numbered CSV line per image. Images that
+    are already cached skip the model, and any image whose line is missing or
+    does not parse falls back to a normal `extract_and_parse` call.
+
+    Returns:
+        list: One parsed value list per image, in the same order (same format
+              as `extract_and_parse`, including the error rows).
+    """
+    images = list(images)
+    if len(images) <= 1:
+        return [extract_and_parse(image, prompt, expected_columns) for image in images]
+
+    results = [None] * len(images)
+    cache_keys = [None] * len(images)
+    for i, image in enumerate(images):
+        cache_keys[i], cached_response = _lookup_cache(image, prompt)
+        if cached_response is not None:
+            cached_values = _parse_csv_response(cached_response)
+            if len(cached_values) == expected_columns:
+                print(f"[EXTRACT WORKER] Cache hit for: {_image_label(image)}")
+                metrics.count('cache_hits')
+                results[i] = cached_values
+
+    to_send = [i for i, values in enumerate(results) if values is None]
+    if len(to_send) > 1:
+        raw_response = _request_completion([images[i] for i in to_send], _build_batch_prompt(prompt, len(to_send)))
+        if raw_response.startswith("ERROR:"):
+            metrics.count('api_errors')
+            print(f"[EXTRACT WORKER] WARNING: Batch request failed, extracting one by one: {raw_response}")
+        else:
+            lines = _parse_batch_response(raw_response, len(to_send), expected_columns)
+            for number, i in enumerate(to_send, start=1):
+                if number in lines:
+                    # Images left over fall back to extract_and_parse, which counts their miss.
+                    metrics.count('cache_misses')
+                    results[i] = lines[number]
+                    _save_to_cache(cache_keys[i], ','.join(lines[number]))
+            print(f"[EXTRACT WORKER] Batch of {len(to_send)} images: {len(lines)} lines parsed.")
+            metrics.count('parse_errors', len(to_send) - len(lines))
+
+    for i, values in enumerate(results):
+        if values is None:
+            results[i] = extract_and_parse(images[i], prompt, expected_columns)
+    return results
+
+
+def _build_batch_prompt(prompt, count):
+    return (
+        f"You are given {count} separate images, labelled Image 1 to Image {count}. "
+        f"Apply the instructions below to each image on its own.\n"
+        f"{prompt}\n"
+        f"Return exactly {count} lines, one per image in the same order. "
+        f"Start each line with the image number and a comma, followed by that image's values."
+    )
+
+
+# "3, John Doe, ...", "3. John Doe, ..." or "Image 3: John Doe, ..." -> ("3", "John Doe, ...")
+_NUMBERED_LINE = re.compile(r'^\s*(?:image\s*)?(\d+)\s*[.:),]\s*,?\s*(.*)$', re.IGNORECASE)
+
+
+def _parse_batch_response(raw_response, count, expected_columns):
+    """
+    Maps the reply of a batched request to {image number: parsed values}.
+    Lines without a valid number are matched by position, but only when the
+    reply has exactly one line per image.
+    """
+    lines = [line for line in raw_response.replace('`', '').replace('*', '').splitlines() if line.strip()]
+    parsed = {}
+    for position, line in enumerate(lines, start=1):
+        numbered = _NUMBERED_LINE.match(line)
+        if numbered and 1 <= int(numbered.group(1)) <= count:
+            values = _parse_csv_response(numbered.group(2))
+            if len(values) == expected_columns:
+                parsed.setdefault(int(numbered.group(1)), values)
+                continue
+        values = _parse_csv_response(line)
+        if len(values) == expected_columns and len(lines) == count:
+            parsed.setdefault(position, values)
+    return parsed
+
+
 # --- ADD THIS NEW FUNCTION ---
-def extract_single_field(image_path, field_name, context_hint=""):
+def extract_single_field(image, field_name, context_hint=""):
     """
     Uses a highly focused prompt to extract only one specific field from an image.
 
     Args:
-        image_path (str): Path to the compressed image.
+        image (str or bytes): Path to the compressed image, or its JPEG bytes.
         field_name (str): The name of the field to extract (e.g., "Registration Number").
         context_hint (str): Optional hint to help the model, like the candidate's name.
 
@@ -133,12 +333,21 @@ def extract_single_field(image_path, field_name, context_hint=""):
         f"Just return the value of the {field_name}."
     )
 
-    # We can reuse the main extraction logic, which now returns an error string on failure
-    raw_response = _extract_data_from_local_model(image_path, prompt)
+    cache_key, raw_response = _lookup_cache(image, prompt)
+    if raw_response is not None:
+        metrics.count('cache_hits')
+    else:
+        if cache_key is not None:
+            metrics.count('cache_misses')
+        # We can reuse the main extraction logic, which now returns an error string on failure
+        raw_response = _extract_data_from_local_model(image, prompt)
+
+        if raw_response.startswith("ERROR:"):
+            metrics.count('api_errors')
+            print(f"[EXTRACT WORKER - RETRY] Failed: {raw_response}")
+            return None
 
-    if raw_response.startswith("ERROR:"):
-        print(f"[EXTRACT WORKER - RETRY] Failed: {raw_response}")
-        return None
+        _save_to_cache(cache_key, raw_response)
     
     # Clean the response, removing potential markdown or labels
     cleaned_response = raw_response.replace(f"{field_name}:", "").strip().replace('*', '').replace('`', '')
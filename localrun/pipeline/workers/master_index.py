@@ -0,0 +1,112 @@
+# localrun/pipeline/workers/master_index.py
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from .verify_worker import normalise_values
+
+
+class MasterRecord:
+    """One applicant's master values, raw and pre-normalised for comparison."""
+    __slots__ = ('basic_id', 'raw', 'normalised', '_columns')
+
+    def __init__(self, basic_id, columns, raw, normalised):
+        self.basic_id = basic_id
+        self._columns = columns
+        self.raw = raw
+        self.normalised = normalised
+
+    def get(self, column, default=None):
+        """Returns the raw master value of `column`, like `master_row.get(column)`."""
+        if column not in self._columns:
+            return default
+        return self.raw[self._columns.index(column)]
+
+
+class MasterIndex:
+    """
+    Column arrays of the master data, keyed by basic_id and built once per job.
+
+    For every column it holds the raw values, the values as shown in the
+    report ('n/a' when missing) and the lowercased, stripped keys that
+    verification compares against, so no master value is normalised twice.
+    Every array has one extra trailing entry that an unknown ID (position -1)
+    resolves to.
+    """
+
+    def __init__(self, master_df):
+        self._build([master_df])
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        Builds the index from basic_id-indexed DataFrame chunks (e.g. from
+        `iter_master_csv_chunks`), converting each as it arrives, so the whole
+        master data is never held as one DataFrame.
+        """
+        index = cls.__new__(cls)
+        index._build(chunks)
+        return index
+
+    def _build(self, frames):
+        ids, parts, self.columns = [], {}, None
+        for frame in frames:
+            if self.columns is None:
+                self.columns = list(frame.columns)
+                parts = {column: ([], [], []) for column in self.columns}
+            ids.append(frame.index.astype(str).to_numpy(dtype=object))
+            for column in self.columns:
+                values = frame[column].astype(object)
+                missing = values.isna()
+                raw, display, normalised = parts[column]
+                raw.append(values.to_numpy())
+                display.append(values.where(~missing, 'n/a').to_numpy())
+                normalised.append(normalise_values(values.where(~missing, '')).to_numpy())
+        self.columns = self.columns or []
+
+        # An ID repeated across (or within) chunks keeps its first row.
+        all_ids = np.concatenate(ids) if ids else np.array([], dtype=object)
+        keep = ~pd.Index(all_ids).duplicated(keep='first')
+        self.ids = pd.Index(all_ids[keep])
+        self.raw, self.display, self.normalised = {}, {}, {}
+        for column, (raw, display, normalised) in parts.items():
+            self.raw[column] = np.append(np.concatenate(raw)[keep], None)
+            self.display[column] = np.append(np.concatenate(display)[keep], '')
+            self.normalised[column] = np.append(np.concatenate(normalised)[keep], '')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, applicant_id):
+        return str(applicant_id) in self.ids
+
+    def positions(self, applicant_ids):
+        """Row positions of the given IDs as an int array, -1 for unknown IDs."""
+        return self.ids.get_indexer(pd.Index(applicant_ids).astype(str))
+
+    def get(self, applicant_id):
+        """Returns the MasterRecord for the applicant, or None if the ID is unknown."""
+        try:
+            position = self.ids.get_loc(str(applicant_id))
+        except KeyError:
+            return None
+        return MasterRecord(
+            self.ids[position],
+            self.columns,
+            tuple(self.raw[column][position] for column in self.columns),
+            tuple(self.normalised[column][position] for column in self.columns),
+        )
+
+    def save(self, path):
+        """Pickles the index, so other worker processes can load it instead of re-parsing the CSV."""
+        # Written under a temporary name first, so a reader never sees a partial file.
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
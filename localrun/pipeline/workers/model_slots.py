@@ -0,0 +1,79 @@
+# localrun/pipeline/workers/model_slots.py
+import time
+import uuid
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+
+# Redis sorted set of the requests in flight against llama-server, shared by
+# every worker process: member = slot token, score = when it was taken.
+SLOTS_KEY = 'pipeline:model-slots'
+# How often a request waiting for a free slot asks Redis again.
+POLL_SECONDS = 0.05
+# After Redis fails, requests only use the per-process limit for this long.
+RETRY_AFTER_SECONDS = 30
+
+# Drops the slots of requests that outlived their lease (e.g. a worker that
+# was killed mid-request), then takes a slot if fewer than the limit are held.
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    return 1
+end
+return 0
+"""
+
+_client = None
+_acquire = None
+_unavailable_until = 0.0
+
+
+def _get_client():
+    global _client, _acquire
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+        _acquire = _client.register_script(_ACQUIRE_SCRIPT)
+    return _client
+
+
+def _lease_seconds():
+    """Longest a request can legitimately hold its slot, urllib3 retries included."""
+    attempt = getattr(settings, 'LOCAL_MODEL_CONNECT_TIMEOUT', 5) + getattr(settings, 'LOCAL_MODEL_READ_TIMEOUT', 300)
+    retries = getattr(settings, 'LOCAL_MODEL_MAX_RETRIES', 2)
+    return attempt * (retries + 1) + getattr(settings, 'LOCAL_MODEL_BACKOFF_SECONDS', 1.0) * 2 ** retries + 30
+
+
+@contextmanager
+def model_slot():
+    """
+    Holds one of the LOCAL_MODEL_MAX_CONCURRENCY slots shared by every worker
+    process for the duration of a request to llama-server, waiting for one to
+    free up. Best effort: without Redis, only the per-process limit applies.
+    """
+    global _unavailable_until
+    token = None
+    if time.monotonic() >= _unavailable_until:
+        limit = getattr(settings, 'LOCAL_MODEL_MAX_CONCURRENCY', 4)
+        candidate = uuid.uuid4().hex
+        try:
+            client = _get_client()
+            while True:
+                now = time.time()
+                if _acquire(keys=[SLOTS_KEY], args=[now, now - _lease_seconds(), limit, candidate], client=client):
+                    token = candidate
+                    break
+                time.sleep(POLL_SECONDS)
+        except redis.RedisError as e:
+            _unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+            print(f"[MODEL SLOTS] WARNING: Redis unavailable, limiting model requests per process only: {e}")
+    try:
+        yield
+    finally:
+        if token is not None:
+            try:
+                _get_client().zrem(SLOTS_KEY, token)
+            except redis.RedisError as e:
+                # The slot is given back when its lease runs out.
+                print(f"[MODEL SLOTS] WARNING: Could not release model slot: {e}")
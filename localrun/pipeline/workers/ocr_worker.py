@@ -0,0 +1,72 @@
+import io
+import re
+import pytesseract
+from PIL import Image
+
+# Tesseract page segmentation: one uniform block of text, which keeps a
+# table row's label and value on the same output line.
+TESSERACT_CONFIG = '--oem 1 --psm 6'
+
+# XXYYSA####### - paper code, exam year, session, 7-digit applicant number.
+REGISTRATION_PATTERN = re.compile(r'\b([A-Z]{2})\s?(\d{2})\s?(S\d)\s?(\d{7})\b')
+
+# A name value: letters, spaces, dots and apostrophes, on the label's line or the next one.
+_NAME_VALUE = r"[ \t:|\-]*\n?[ \t|]*([A-Za-z][A-Za-z .']*[A-Za-z])"
+NAME_PATTERN = re.compile(r"(?:Name\s+of\s+(?:the\s+)?Candidate|^\s*Name\b(?!\s+of))" + _NAME_VALUE, re.IGNORECASE | re.MULTILINE)
+FATHER_NAME_PATTERN = re.compile(
+    r"(?:Parent'?s?\s*/\s*Guardian'?s?(?:\s+Name)?|Father'?s?\s+Name)" + _NAME_VALUE, re.IGNORECASE
+)
+YEAR_PATTERN = re.compile(r'\bGATE\s*(20\d{2})\b', re.IGNORECASE)
+SCORE_PATTERN = re.compile(r'\bGATE\s+Score\b[^\d\n]{0,20}\n?[^\d\n]{0,20}(\d{1,4})\b', re.IGNORECASE)
+# The "100" may be wrapped onto the next line, after the value.
+MARKS_PATTERN = re.compile(r'\bMarks\s+out\s+of\s*(?:100\S*)?[^\d\n]{0,20}\n?[^\d\n]{0,20}(\d{1,3}(?:\.\d{1,2})?)\b', re.IGNORECASE)
+RANK_PATTERN = re.compile(r'\b(?:All\s+India\s+Rank|AIR)\b[^\d\n]{0,40}\n?[^\d\n]{0,40}(\d{1,6})\b', re.IGNORECASE)
+
+
+def ocr_extract(image):
+    """
+    OCRs a compressed scorecard with Tesseract and parses the fields the VLM
+    prompt asks for.
+
+    `image` is either a path to the compressed image or its encoded bytes.
+    Runs in the preprocess pool, so it only takes and returns picklable values.
+
+    Returns:
+        dict: The fields that could be read (keys as in BASE_EXTRACT_HEADERS),
+              or an empty dict if OCR is unavailable or failed.
+    """
+    try:
+        source = io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image
+        with Image.open(source) as img:
+            text = pytesseract.image_to_string(img, config=TESSERACT_CONFIG)
+    except Exception as e:
+        print(f"[OCR WORKER] OCR failed, leaving this scorecard to the VLM: {e}")
+        return {}
+    return parse_ocr_text(text)
+
+
+def parse_ocr_text(text):
+    """Parses Tesseract output of a scorecard into extracted fields."""
+    fields = {}
+
+    registration = REGISTRATION_PATTERN.search(text.upper())
+    if registration:
+        fields['registration_id'] = ''.join(registration.groups())
+
+    for field, pattern in (('name', NAME_PATTERN), ('father_name', FATHER_NAME_PATTERN)):
+        match = pattern.search(text)
+        if match:
+            fields[field] = ' '.join(match.group(1).split())
+
+    year = YEAR_PATTERN.search(text)
+    if year:
+        fields['year'] = year.group(1)
+    elif registration:
+        fields['year'] = f"20{registration.group(2)}"
+
+    for field, pattern in (('score', SCORE_PATTERN), ('scoreof100', MARKS_PATTERN), ('rank', RANK_PATTERN)):
+        match = pattern.search(text)
+        if match:
+            fields[field] = match.group(1)
+
+    return fields
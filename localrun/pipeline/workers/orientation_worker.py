@@ -1,12 +1,29 @@
 import os
 import cv2
+import numpy as np
 import pytesseract
 import re
 
+# --- Fast-path parameters ---
+# The upright pre-check works on a copy no larger than this (longest side, px).
+PRECHECK_MAX_SIDE = 1000
+# Tesseract OSD runs once, on a copy no larger than this.
+OSD_MAX_SIDE = 1600
+# The pre-check only trusts pages with at least this many detected text lines.
+MIN_TEXT_LINES = 5
+# Summed over all lines, the bottom quarters must outweigh the top quarters by this factor...
+LINE_BALANCE_MARGIN = 1.1
+# ...and the ink above the lines' x-height bands (rows above CORE_BAND_LEVEL of
+# each line's peak) must outweigh the ink below by this factor, and make up at
+# least ASCENDER_MIN_SHARE of all line ink.
+CORE_BAND_LEVEL = 0.5
+ASCENDER_MARGIN = 1.5
+ASCENDER_MIN_SHARE = 0.05
+
 def correct_orientation_in_place(image_path):
     """
-    Analyzes an image, iteratively corrects its text orientation until it is upright,
-    and then overwrites the original file. This is more robust for tricky rotations.
+    Analyzes an image, corrects its text orientation so it is upright,
+    and then overwrites the original file.
 
     Args:
         image_path (str): The path to the image file to be corrected.
@@ -16,66 +33,153 @@ def correct_orientation_in_place(image_path):
               False if a critical error occurred.
     """
     filename = os.path.basename(image_path)
-    print(f"[ORIENTATION WORKER] Starting iterative orientation check for: {filename}")
 
-    # A safeguard to prevent potential infinite loops with very ambiguous images.
-    # 4 rotations (4 * 90 = 360 degrees) is the max needed.
-    MAX_ATTEMPTS = 4
+    # Load the image using OpenCV. We do this once at the start.
+    img = cv2.imread(image_path)
+    if img is None:
+        print(f"[ORIENTATION WORKER] ERROR: Could not read image at path: {image_path}")
+        return False
+
+    img, success = correct_orientation(img, filename)
+    if not success:
+        return False
+
+    # Overwrite the original file with the final state of the 'img' object.
+    success = cv2.imwrite(image_path, img)
+
+    if success:
+        print(f"[ORIENTATION WORKER] Successfully overwrote {filename} with final corrected version.")
+        return True
+    else:
+        print(f"[ORIENTATION WORKER] ERROR: Failed to save final corrected image to {image_path}")
+        return False
+
+
+def correct_orientation(img, label="image"):
+    """
+    In-memory version of `correct_orientation_in_place`. Works on a numpy image
+    array (as returned by cv2.imread or np.asarray(pil_image)) and never touches
+    the filesystem.
+
+    A cheap projection-profile check (`looks_upright`) settles the common
+    upright case without Tesseract. Only when it is inconclusive does
+    Tesseract OSD run, once, on a reduced-resolution copy, and the detected
+    rotation is applied directly.
 
+    Args:
+        img (numpy.ndarray): The image to correct.
+        label (str): Name used in log messages.
+
+    Returns:
+        tuple: (image array, success). The array is the input itself when no
+               rotation was applied, so callers can check `result is img` to
+               know whether the pixels changed. On failure the input array is
+               returned with success=False.
+    """
     try:
-        # Load the image using OpenCV. We do this once at the start.
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"[ORIENTATION WORKER] ERROR: Could not read image at path: {image_path}")
-            return False
-
-        for attempt in range(MAX_ATTEMPTS):
-            # Run OSD on the current state of the image in memory
-            try:
-                osd = pytesseract.image_to_osd(img)
-            except pytesseract.TesseractError as e:
-                print(f"[ORIENTATION WORKER] Tesseract failed on attempt {attempt + 1}: {e}. Assuming upright.")
-                osd = "Rotate: 0" # Assume it's okay if Tesseract fails mid-process
-
-            angle_match = re.search(r'Rotate: (\d+)', osd)
-            
-            if not angle_match:
-                print(f"[ORIENTATION WORKER] WARN: Could not determine angle on attempt {attempt + 1}. Aborting correction.")
-                # We break here and save the image in its current state, as we can't improve it.
-                break
-
-            angle = int(angle_match.group(1))
-
-            print(f"--- Attempt {attempt + 1}/{MAX_ATTEMPTS}: Detected rotation of {angle} degrees.")
-
-            # If the angle is 0, the image is upright. We're done.
-            if angle == 0:
-                print(f"[ORIENTATION WORKER] Image is now upright. Correction complete.")
-                break
-            
-            # If not upright, apply the necessary rotation to the image in memory
-            print(f"--- Correcting by {angle} degrees...")
-            if angle == 90:
-                img = cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
-            elif angle == 180:
-                img = cv2.rotate(img, cv2.ROTATE_180)
-            elif angle == 270:
-                img = cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
-
-        # After the loop (either by breaking or finishing), overwrite the original file
-        # with the final state of the 'img' object.
-        success = cv2.imwrite(image_path, img)
-
-        if success:
-            print(f"[ORIENTATION WORKER] Successfully overwrote {filename} with final corrected version.")
-            return True
-        else:
-            print(f"[ORIENTATION WORKER] ERROR: Failed to save final corrected image to {image_path}")
-            return False
+        if looks_upright(img):
+            print(f"[ORIENTATION WORKER] {label} is upright (fast path, no OSD needed).")
+            return img, True
+
+        print(f"[ORIENTATION WORKER] Pre-check inconclusive for {label}. Running OSD.")
+        try:
+            osd = pytesseract.image_to_osd(_downscale(img, OSD_MAX_SIDE))
+        except pytesseract.TesseractError as e:
+            print(f"[ORIENTATION WORKER] Tesseract failed: {e}. Assuming upright.")
+            return img, True
+
+        angle_match = re.search(r'Rotate: (\d+)', osd)
+        if not angle_match:
+            print(f"[ORIENTATION WORKER] WARN: Could not determine angle for {label}. Leaving it as is.")
+            return img, True
+
+        angle = int(angle_match.group(1))
+        print(f"[ORIENTATION WORKER] Detected rotation of {angle} degrees for {label}.")
+
+        # OSD's Rotate is the clockwise rotation that makes the page upright.
+        if angle == 90:
+            img = cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+        elif angle == 180:
+            img = cv2.rotate(img, cv2.ROTATE_180)
+        elif angle == 270:
+            img = cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+        return img, True
 
     except pytesseract.TesseractNotFoundError:
         print("[ORIENTATION WORKER] ERROR: Tesseract is not installed or not in your PATH. Skipping correction.")
-        return False # This is a system-level error
+        return img, False # This is a system-level error
     except Exception as e:
         print(f"[ORIENTATION WORKER] An unexpected error occurred: {e}")
-        return False
\ No newline at end of file
+        return img, False
+
+
+def looks_upright(img):
+    """
+    Cheap check for pages whose text is clearly upright.
+
+    On a downscaled, binarised copy, horizontal text lines make the row ink
+    profile much spikier than the column profile. Two signals, summed over
+    every text line, must then both say upright:
+
+    - Ink balance: the bottom quarter of a line (lower half of the letters)
+      carries more ink than the top quarter. All-caps text can be top-heavy,
+      so on its own this would pass an upside-down all-caps page.
+    - Ascenders: ascenders (b, d, h, k, l, t and capitals) are far more common
+      than descenders (g, j, p, q, y), so mixed-case text has clearly more ink
+      above its dense x-height band than below it. All-caps text has no such
+      band, so pages set entirely in capitals always go to OSD.
+
+    Returns:
+        bool: True only when the page is confidently upright. False means
+              "don't know", not "rotated".
+    """
+    gray = _downscale(img, PRECHECK_MAX_SIDE)
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    rows = ink.sum(axis=1).astype(np.float64)
+    cols = ink.sum(axis=0).astype(np.float64)
+    if not rows.any():
+        return False
+
+    # Text lines run horizontally only if the row profile varies more than the column profile.
+    row_spread = rows.std() / rows.mean()
+    col_spread = cols.std() / cols.mean()
+    if row_spread <= col_spread:
+        return False
+
+    # Split the row profile into text lines and sum each signal over them.
+    is_text_row = np.concatenate(([False], rows > rows.max() * 0.05, [False]))
+    edges = np.flatnonzero(np.diff(is_text_row.astype(np.int8)))
+    lines = 0
+    top = bottom = above = below = total = 0.0
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < 4:
+            continue
+        lines += 1
+        line = rows[start:end]
+        quarter = max(1, len(line) // 4)
+        top += line[:quarter].sum()
+        bottom += line[-quarter:].sum()
+        core = np.flatnonzero(line > line.max() * CORE_BAND_LEVEL)
+        above += line[:core[0]].sum()
+        below += line[core[-1] + 1:].sum()
+        total += line.sum()
+
+    return bool(
+        lines >= MIN_TEXT_LINES
+        and bottom > top * LINE_BALANCE_MARGIN
+        and above > below * ASCENDER_MARGIN
+        and above > total * ASCENDER_MIN_SHARE
+    )
+
+
+def _downscale(img, max_side):
+    """Returns a copy whose longest side is at most max_side (or img itself if already small)."""
+    height, width = img.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,174 @@
+# localrun/pipeline/workers/preprocess_engine.py
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+from .. import metrics
+from .compress_worker import process_and_compress, compress_image, encode_jpeg, load_source_image
+from .orientation_worker import correct_orientation_in_place, correct_orientation
+from .roi_worker import crop_to_fields
+
+# One pool per worker process, created on first use and reused by every task.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_preprocess_executor():
+    """
+    Returns the pool that runs the CPU-heavy stages (PDF rasterisation,
+    JPEG compression, orientation), sized by PIPELINE_PREPROCESS_WORKERS
+    (default: one per CPU core).
+
+    Celery's default prefork pool runs tasks in daemonic processes, which
+    may not start children of their own. There a thread pool is used
+    instead; poppler and tesseract run as subprocesses and PIL/OpenCV release
+    the GIL while encoding and resizing, so the stages still overlap with
+    the VLM calls.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = getattr(settings, 'PIPELINE_PREPROCESS_WORKERS', 0) or os.cpu_count() or 1
+                if _in_daemon_process():
+                    print(f"[PREPROCESS] Running in a daemonic worker; using {max_workers} threads instead of processes.")
+                    _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preprocess')
+                else:
+                    print(f"[PREPROCESS] Starting a pool of {max_workers} preprocessing processes.")
+                    _executor = ProcessPoolExecutor(max_workers=max_workers)
+    return _executor
+
+
+def shutdown_preprocess_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _in_daemon_process():
+    if multiprocessing.current_process().daemon:
+        return True
+    try:
+        from billiard.process import current_process as billiard_current_process
+    except ImportError:
+        return False
+    return bool(billiard_current_process().daemon)
+
+
+def prepare_scorecard_image(file_path, temp_compress_dir):
+    """
+    Compresses and orients a scorecard. Runs inside the preprocess pool, so
+    it only takes and returns picklable values.
+
+    In in-memory mode (PIPELINE_IN_MEMORY_IMAGES) the source is decoded once
+    and every stage works on the pixels in memory. With SCORECARD_ROI_ENABLED
+    the page is oriented at full resolution and cropped to the field region
+    before it is compressed, so the size budget goes to the fields. The JPEG
+    bytes are returned and only written to disk when
+    PIPELINE_SPILL_IMAGES_TO_DISK is set, for debugging. Otherwise the
+    original file-based stages are used and the path of the compressed file
+    is returned.
+
+    The stage timings and events of the preparation are collected here and
+    returned with the image, since the pool process can't record them for
+    the task.
+
+    Returns:
+        tuple: (compressed image as bytes or str, or None if compression
+                failed; the collected metrics as `StageMetrics.as_dict()`)
+    """
+    with metrics.collecting() as collected:
+        image = _prepare_scorecard_image(file_path, temp_compress_dir)
+        if image is None:
+            metrics.count('compression_failures')
+    return image, collected.as_dict()
+
+
+def _prepare_scorecard_image(file_path, temp_compress_dir):
+    file_name = os.path.basename(file_path)
+
+    if not getattr(settings, 'PIPELINE_IN_MEMORY_IMAGES', True):
+        with metrics.timed('compress'):
+            compressed_path, compress_msg = process_and_compress(file_path, temp_compress_dir, poppler_path=settings.POPPLER_PATH)
+        print(f"[COMPRESS WORKER] Compress status for {file_name}: {compress_msg}")
+        if compressed_path:
+            with metrics.timed('orient'):
+                orientation_success = correct_orientation_in_place(compressed_path)
+            if not orientation_success:
+                metrics.count('orientation_failures')
+                print(f"[PIPELINE] WARNING: Orientation correction failed for {file_name}. Proceeding with original compressed image.")
+        return compressed_path
+
+    if getattr(settings, 'SCORECARD_ROI_ENABLED', True):
+        image_data = _prepare_region_of_interest(file_path, file_name)
+    else:
+        image_data = _prepare_whole_page(file_path, file_name)
+    if image_data is None:
+        return None
+
+    if getattr(settings, 'PIPELINE_SPILL_IMAGES_TO_DISK', False):
+        spill_path = os.path.join(temp_compress_dir, f"{os.path.splitext(file_name)[0]}.jpg")
+        with open(spill_path, 'wb') as f:
+            f.write(image_data)
+
+    return image_data
+
+
+def _prepare_region_of_interest(file_path, file_name):
+    """Orients the full-resolution page, crops it to SCORECARD_ROI_TEMPLATE and compresses the crop."""
+    with metrics.timed('load'):
+        image_obj, load_msg = load_source_image(file_path, poppler_path=settings.POPPLER_PATH)
+    if image_obj is None:
+        print(f"[COMPRESS WORKER] Compress status for {file_name}: {load_msg}")
+        return None
+
+    with metrics.timed('orient'):
+        pixels = np.asarray(image_obj.convert('RGB'))
+        oriented, orientation_success = correct_orientation(pixels, file_name)
+    if not orientation_success:
+        metrics.count('orientation_failures')
+        print(f"[PIPELINE] WARNING: Orientation correction failed for {file_name}. Proceeding with original image.")
+    with metrics.timed('crop'):
+        region = crop_to_fields(oriented, getattr(settings, 'SCORECARD_ROI_TEMPLATE', ''), file_name)
+
+    with metrics.timed('compress'):
+        compressed, compress_msg = compress_image(Image.fromarray(region))
+    print(f"[COMPRESS WORKER] Compress status for {file_name}: {compress_msg}")
+    return compressed.data if compressed else None
+
+
+def _prepare_whole_page(file_path, file_name):
+    """
+    Compresses the whole page, then orients the compressed pixels still in
+    memory, re-encoding only if the image actually had to be rotated.
+    """
+    # Same as compress_in_memory, split so loading and compressing are timed apart.
+    with metrics.timed('load'):
+        image_obj, compress_msg = load_source_image(file_path, poppler_path=settings.POPPLER_PATH)
+    compressed = None
+    if image_obj is not None:
+        with metrics.timed('compress'):
+            compressed, compress_msg = compress_image(image_obj)
+    print(f"[COMPRESS WORKER] Compress status for {file_name}: {compress_msg}")
+    if compressed is None:
+        return None
+
+    image_data = compressed.data
+    with metrics.timed('orient'):
+        pixels = np.asarray(compressed.image.convert('RGB'))
+        oriented, orientation_success = correct_orientation(pixels, file_name)
+        if orientation_success and oriented is not pixels:
+            # Re-encode from the in-memory pixels, not from the decoded JPEG, so the
+            # rotation adds no extra generation loss.
+            image_data = encode_jpeg(Image.fromarray(oriented), compressed.quality)
+    if not orientation_success:
+        metrics.count('orientation_failures')
+        print(f"[PIPELINE] WARNING: Orientation correction failed for {file_name}. Proceeding with original compressed image.")
+    return image_data
@@ -0,0 +1,125 @@
+# localrun/pipeline/workers/result_writer.py
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .. import metrics
+from ..models import VerificationJob, VerificationResult, ParsedResult
+from ..progress import publish_progress
+
+# Every ParsedResult column except the primary key and the insert timestamp is
+# overwritten when a row for the same applicant already exists.
+PARSED_RESULT_UPDATE_FIELDS = [
+    field.name for field in ParsedResult._meta.concrete_fields
+    if field.name not in ('id', 'created_at')
+]
+
+
+class ResultWriter:
+    """
+    Buffers result rows for a job and writes them in batches.
+
+    A flush writes all buffered VerificationResult rows with one bulk INSERT
+    and upserts the matching ParsedResult rows with one multi-row
+    INSERT ... ON DUPLICATE KEY UPDATE, inside a single transaction. The
+    buffer is flushed every `batch_size` rows, when `flush_seconds` have
+    passed since the last flush, and when the writer is closed - including
+    when the `with` block exits with an error, so partial progress is kept.
+
+    The time limit is checked by `add()` and `flush_if_due()`; callers that
+    wait between rows call `flush_if_due()` at least every `flush_seconds`.
+    """
+
+    def __init__(self, job_id, batch_size=None, flush_seconds=None):
+        self.job_id = job_id
+        self.batch_size = batch_size or getattr(settings, 'RESULT_WRITER_BATCH_SIZE', 25)
+        self.flush_seconds = flush_seconds if flush_seconds is not None else getattr(settings, 'RESULT_WRITER_FLUSH_SECONDS', 5)
+        self.rows_written = 0
+        self.failed_ids = set()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+    def add(self, result_dict):
+        """Queues one sanitised result row and flushes if a threshold was reached."""
+        self._buffer.append(result_dict)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flushes the buffered rows if `flush_seconds` have passed since the last flush."""
+        if self._buffer and time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered rows. A failed write is logged and its applicant
+        ids are recorded in `failed_ids` instead of raising, so a database
+        hiccup never loses track of which candidates were saved.
+        """
+        rows, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+
+        try:
+            with metrics.timed('db_write', count=len(rows)):
+                # Upserted first, outside the job-row lock that insert_job_results takes.
+                with transaction.atomic():
+                    _upsert_parsed_results(rows)
+                insert_job_results(self.job_id, rows)
+        except Exception as e:
+            self.failed_ids.update(row.get('id') for row in rows)
+            metrics.count('db_write_failures', len(rows))
+            print(f"[RESULT WRITER] ERROR: Failed to save {len(rows)} results for Job {self.job_id}: {e}")
+            return 0
+
+        self.rows_written += len(rows)
+        print(f"[RESULT WRITER] Saved {len(rows)} results for Job {self.job_id} to database.")
+        publish_progress(self.job_id, 'results', count=len(rows))
+        return len(rows)
+
+
+def insert_job_results(job_id, rows):
+    """
+    Inserts VerificationResult rows for a job and moves the job's
+    `results_committed_through` mark up to them, in a short transaction of
+    its own. Don't call it inside a longer transaction, which would hold the
+    job-row lock until it commits.
+
+    The job row is locked for just the INSERT and the mark update, so the
+    inserts of a job's concurrent batches commit one at a time, in id order. A
+    progress client reading up to the mark therefore never moves its cursor
+    past a row that is still to commit.
+    """
+    with transaction.atomic():
+        list(VerificationJob.objects.select_for_update().filter(id=job_id).values_list('id', flat=True))
+        VerificationResult.objects.bulk_create([VerificationResult(job_id=job_id, data=row) for row in rows], batch_size=1000)
+        # MySQL does not return the ids of a bulk insert.
+        last_id = VerificationResult.objects.filter(job_id=job_id).aggregate(last_id=Max('id'))['last_id'] or 0
+        VerificationJob.objects.filter(id=job_id).update(results_committed_through=last_id)
+
+
+def _upsert_parsed_results(rows):
+    # The same applicant can only appear once per statement, the last row wins.
+    parsed_results = {
+        row.get('id'): ParsedResult(id=row.get('id'), **{field: row.get(field) for field in PARSED_RESULT_UPDATE_FIELDS})
+        for row in rows
+    }
+    # MySQL's ON DUPLICATE KEY UPDATE has no conflict target; other backends need one.
+    unique_fields = ['id'] if connection.features.supports_update_conflicts_with_target else None
+    ParsedResult.objects.bulk_create(
+        list(parsed_results.values()),
+        update_conflicts=True,
+        update_fields=PARSED_RESULT_UPDATE_FIELDS,
+        unique_fields=unique_fields,
+    )
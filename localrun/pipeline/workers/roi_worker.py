@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+# --- Region-of-interest parameters ---
+# Text-block detection runs on a copy no larger than this (longest side, px).
+DETECT_MAX_SIDE = 1000
+# Blocks smaller than this (px, on the detection copy) are specks and noise.
+MIN_BLOCK_AREA = 40
+# Blocks this long and this thin are scanner edges or shadows, not content.
+EDGE_LINE_SPAN = 0.9
+EDGE_LINE_THICKNESS = 0.03
+# Padding kept around the detected content, as a fraction of the page side.
+CONTENT_PADDING = 0.01
+# A template edge that lands on text moves outwards by at most this much
+# (fraction of the page side) to the nearest text-free row or column.
+MAX_SNAP = 0.05
+# A crop smaller than this fraction of the page means detection went wrong.
+MIN_ROI_AREA = 0.15
+
+
+def parse_roi_template(template):
+    """
+    Parses a "left,top,right,bottom" template of fractions of the content box.
+    An empty template means the whole content box.
+    """
+    if not template:
+        return (0.0, 0.0, 1.0, 1.0)
+    left, top, right, bottom = (float(value) for value in str(template).split(','))
+    if not (0.0 <= left < right <= 1.0 and 0.0 <= top < bottom <= 1.0):
+        raise ValueError(f"Invalid ROI template: {template}")
+    return (left, top, right, bottom)
+
+
+def crop_to_fields(img, template=None, label="image"):
+    """
+    Crops an upright scorecard (numpy image array) to the region holding the
+    extracted fields, so the compression budget is spent on them instead of
+    margins, logos and boilerplate.
+
+    Text blocks are found with OpenCV and their union is the content box. The
+    template (fractions of that box, see `parse_roi_template`) then selects
+    the region, and each template edge that cuts through text is moved out to
+    the nearest gap so no line is split.
+
+    Returns:
+        numpy.ndarray: The cropped image, or `img` unchanged if no reliable
+                       region could be found.
+    """
+    try:
+        height, width = img.shape[:2]
+        text_mask, scale = _detect_text_mask(img)
+        content = _content_box(text_mask)
+        if content is None:
+            print(f"[ROI WORKER] No text blocks found in {label}. Keeping the whole page.")
+            return img
+
+        left, top, right, bottom = parse_roi_template(template)
+        x0, y0, x1, y1 = content
+        box = [
+            x0 + (x1 - x0) * left, y0 + (y1 - y0) * top,
+            x0 + (x1 - x0) * right, y0 + (y1 - y0) * bottom,
+        ]
+        box = _snap_to_gaps(text_mask, box)
+
+        crop_x0, crop_y0 = max(0, int(box[0] / scale)), max(0, int(box[1] / scale))
+        crop_x1, crop_y1 = min(width, int(np.ceil(box[2] / scale))), min(height, int(np.ceil(box[3] / scale)))
+        area = (crop_x1 - crop_x0) * (crop_y1 - crop_y0) / float(width * height)
+        if area < MIN_ROI_AREA:
+            print(f"[ROI WORKER] Region for {label} covers only {area:.0%} of the page. Keeping the whole page.")
+            return img
+
+        print(f"[ROI WORKER] Cropped {label} to {crop_x1 - crop_x0}x{crop_y1 - crop_y0} ({area:.0%} of the page).")
+        return img[crop_y0:crop_y1, crop_x0:crop_x1]
+
+    except Exception as e:
+        print(f"[ROI WORKER] ERROR: Could not crop {label}: {e}. Keeping the whole page.")
+        return img
+
+
+def _detect_text_mask(img):
+    """Returns the binarised ink mask of a reduced copy and the copy's scale factor."""
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY) if img.ndim == 3 else img
+    height, width = gray.shape
+    scale = min(1.0, DETECT_MAX_SIDE / float(max(height, width)))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask, scale
+
+
+def _content_box(text_mask):
+    # Dilating joins characters into words and words into blocks.
+    blocks = cv2.dilate(text_mask, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5)))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(blocks)
+    height, width = text_mask.shape
+    boxes = []
+    for x, y, w, h, area in stats[1:count]:
+        if area < MIN_BLOCK_AREA:
+            continue
+        if (w > EDGE_LINE_SPAN * width and h < EDGE_LINE_THICKNESS * height) or \
+                (h > EDGE_LINE_SPAN * height and w < EDGE_LINE_THICKNESS * width):
+            continue
+        boxes.append((x, y, x + w, y + h))
+    if not boxes:
+        return None
+
+    pad_x, pad_y = CONTENT_PADDING * width, CONTENT_PADDING * height
+    return (
+        max(0, min(b[0] for b in boxes) - pad_x), max(0, min(b[1] for b in boxes) - pad_y),
+        min(width, max(b[2] for b in boxes) + pad_x), min(height, max(b[3] for b in boxes) + pad_y),
+    )
+
+
+def _snap_to_gaps(text_mask, box):
+    height, width = text_mask.shape
+    x0, y0, x1, y1 = (int(round(v)) for v in box)
+    rows = text_mask[:, x0:x1].any(axis=1)
+    y0 = _nearest_gap(rows, y0, -1, int(MAX_SNAP * height))
+    y1 = _nearest_gap(rows, y1, +1, int(MAX_SNAP * height))
+    columns = text_mask[y0:y1, :].any(axis=0)
+    x0 = _nearest_gap(columns, x0, -1, int(MAX_SNAP * width))
+    x1 = _nearest_gap(columns, x1, +1, int(MAX_SNAP * width))
+    return [x0, y0, x1, y1]
+
+
+def _nearest_gap(has_ink, position, direction, max_distance):
+    """Moves `position` in `direction` until it reaches a line without ink, within `max_distance`."""
+    limit = len(has_ink)
+    for step in range(max_distance + 1):
+        candidate = position + direction * step
+        if candidate <= 0 or candidate >= limit:
+            return max(0, min(limit, candidate))
+        if not has_ink[candidate]:
+            return candidate
+    return position
@@ -1,5 +1,33 @@
 # localrun/pipeline/workers/scanner_worker.py
 import os
+import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+
+# NFS can store mtimes with one-second granularity or worse. A folder changed
+# this close to the scan could change again without its mtime moving, so
+# its entry is saved without an mtime and it is listed again next time.
+MTIME_GRANULARITY_NS = 2 * 10 ** 9
+
+
+class ScanReport:
+    """Candidate folders that need attention, and how much of the scan the manifest saved."""
+
+    def __init__(self):
+        self.missing = []    # Candidate folders without a gate_scorecard file
+        self.multiple = {}   # applicant_id -> every gate_scorecard file name found
+        self.malformed = []  # can_* entries whose applicant ID could not be read
+        self.duplicates = {}  # applicant_id -> folders skipped because another one had the same ID
+        self.listed = 0      # Folders that had to be listed
+        self.cached = 0      # Folders answered from the manifest
+
+    def summary(self):
+        return (f"{self.listed} folders listed, {self.cached} unchanged; "
+                f"{len(self.missing)} without a gate_scorecard, {len(self.multiple)} with several, "
+                f"{sum(len(folders) for folders in self.duplicates.values())} duplicate applicant IDs skipped.")
+
 
 def scan_for_gate_scorecards(root_path):
     """
@@ -9,27 +37,146 @@ def scan_for_gate_scorecards(root_path):
     Returns:
         dict: A dictionary mapping applicant_id to the full file path.
     """
-    found_files = {}
+    return dict(iter_gate_scorecards(root_path))
+
+
+def iter_gate_scorecards(root_path, report=None):
+    """
+    Generator version of `scan_for_gate_scorecards`: yields (applicant_id,
+    file_path) pairs as soon as each candidate folder has been looked at, so
+    callers can start working before a large tree is fully listed.
+
+    Candidate folders are listed with os.scandir on SCANNER_THREADS threads.
+    With SCANNER_MANIFEST_ENABLED, a folder whose mtime matches the manifest
+    saved by the previous scan of the same root is not listed again. Folders
+    without a scorecard or with several are recorded in `report` (a ScanReport);
+    for several, the first file name in sorted order is used. Each applicant ID
+    is yielded once: when several folders map to it (e.g. can_1 and
+    CAN_1_reupload), the first one found with a scorecard is used and the
+    others are recorded as duplicates.
+    """
+    report = report if report is not None else ScanReport()
     print(f"[SCANNER] Starting scan in: {root_path}")
     if not os.path.isdir(root_path):
         print(f"[SCANNER] ERROR: Provided path is not a valid directory.")
-        return found_files
-
-    for dir_name in os.listdir(root_path):
-        if dir_name.lower().startswith('can_'):
-            try:
-                applicant_id = dir_name.split('_')[1]
-                candidate_folder = os.path.join(root_path, dir_name)
-                
-                if os.path.isdir(candidate_folder):
-                    for file_name in os.listdir(candidate_folder):
-                        if 'gate_scorecard' in file_name.lower():
-                            found_files[applicant_id] = os.path.join(candidate_folder, file_name)
-                            print(f"[SCANNER] Found gate_scorecard for ID {applicant_id}")
-                            break # Move to the next candidate folder
-            except IndexError:
-                print(f"[SCANNER] Skipping malformed directory: {dir_name}")
+        return
+
+    manifest_path = _get_manifest_path(root_path)
+    manifest = _load_manifest(manifest_path)
+    new_manifest = {}
+    max_workers = max(1, getattr(settings, 'SCANNER_THREADS', 16))
+    trusted_before_ns = time.time_ns() - MTIME_GRANULARITY_NS
+    found = 0
+    seen = set()
+
+    def collect(futures):
+        nonlocal found
+        for future in futures:
+            dir_name, applicant_id, mtime_ns, file_names, from_manifest = future.result()
+            if mtime_ns is None:
+                continue  # The folder vanished or could not be read.
+            new_manifest[dir_name] = [mtime_ns if mtime_ns < trusted_before_ns else None, file_names]
+            if from_manifest:
+                report.cached += 1
+            else:
+                report.listed += 1
+            if not file_names:
+                report.missing.append(applicant_id)
+                print(f"[SCANNER] WARNING: No gate_scorecard in {dir_name}")
+                continue
+            if applicant_id in seen:
+                report.duplicates.setdefault(applicant_id, []).append(dir_name)
+                print(f"[SCANNER] WARNING: Skipping {dir_name}, applicant ID {applicant_id} was already found")
                 continue
-    
-    print(f"[SCANNER] Scan complete. Found {len(found_files)} gate scorecards.")
-    return found_files
\ No newline at end of file
+            if len(file_names) > 1:
+                report.multiple[applicant_id] = file_names
+                print(f"[SCANNER] WARNING: {len(file_names)} gate_scorecard files in {dir_name}, using {file_names[0]}")
+            seen.add(applicant_id)
+            found += 1
+            print(f"[SCANNER] Found gate_scorecard for ID {applicant_id}")
+            yield applicant_id, os.path.join(root_path, dir_name, file_names[0])
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scanner') as executor:
+        pending = set()
+        with os.scandir(root_path) as entries:
+            for entry in entries:
+                if not entry.name.lower().startswith('can_'):
+                    continue
+                try:
+                    applicant_id = entry.name.split('_')[1]
+                except IndexError:
+                    report.malformed.append(entry.name)
+                    print(f"[SCANNER] Skipping malformed directory: {entry.name}")
+                    continue
+                if not entry.is_dir():
+                    continue
+                pending.add(executor.submit(_scan_candidate_folder, entry.path, entry.name, applicant_id, manifest.get(entry.name)))
+                # Hand out results while the root is still being read, without
+                # queueing a future for every folder of a huge tree up front.
+                if len(pending) >= max_workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+    _save_manifest(manifest_path, new_manifest)
+    print(f"[SCANNER] Scan complete. Found {found} gate scorecards. {report.summary()}")
+
+
+def _scan_candidate_folder(folder_path, dir_name, applicant_id, cached):
+    """
+    Returns (dir_name, applicant_id, mtime_ns, sorted scorecard file names,
+    whether they came from the manifest). A folder's mtime changes whenever
+    a file in it is added, removed or renamed, so an unchanged mtime means
+    the cached names are still right.
+    """
+    try:
+        mtime_ns = os.stat(folder_path).st_mtime_ns
+        if cached and cached[0] == mtime_ns:
+            return dir_name, applicant_id, mtime_ns, cached[1], True
+        with os.scandir(folder_path) as entries:
+            file_names = sorted(entry.name for entry in entries if 'gate_scorecard' in entry.name.lower())
+        return dir_name, applicant_id, mtime_ns, file_names, False
+    except OSError as e:
+        print(f"[SCANNER] ERROR: Could not read {folder_path}: {e}")
+        return dir_name, applicant_id, None, [], False
+
+
+def forget_scan_manifest(root_path):
+    """Deletes the manifest saved for `root_path`, e.g. once the folder itself is gone."""
+    manifest_path = _get_manifest_path(root_path)
+    if manifest_path and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def _get_manifest_path(root_path):
+    if not getattr(settings, 'SCANNER_MANIFEST_ENABLED', True):
+        return None
+    root_hash = hashlib.sha256(os.path.abspath(root_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(settings.MEDIA_ROOT, 'scan_manifests', f"{root_hash}.json")
+
+
+def _load_manifest(manifest_path):
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[SCANNER] WARNING: Ignoring unreadable scan manifest {manifest_path}: {e}")
+        return {}
+
+
+def _save_manifest(manifest_path, manifest):
+    if not manifest_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        # Written under a temporary name first, so a reader never sees a partial file.
+        temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+    except OSError as e:
+        print(f"[SCANNER] WARNING: Could not save scan manifest {manifest_path}: {e}")
@@ -1,7 +1,12 @@
 import os
 import string
+import numpy as np
 import pandas as pd
 
+# Stripped from both sides of every value before comparing.
+CHARS_TO_STRIP = string.whitespace + '.,'
+
+
 def verify_and_create_row(master_df, applicant_id, extracted_data_dict):
     """
     Verifies a single file's data and creates a flat list for the final report.
@@ -22,7 +27,6 @@ def verify_and_create_row(master_df, applicant_id, extracted_data_dict):
         return error_row, [] 
     
     final_row = [file_id]
-    chars_to_strip = string.whitespace + '.,'
     failed_fields = []
 
     fields_to_compare = {
@@ -40,8 +44,8 @@ def verify_and_create_row(master_df, applicant_id, extracted_data_dict):
         input_val = master_row.get(master_data_field)
         extracted_val = extracted_data_dict.get(report_field, 'N/A')
         
-        compare_input = str(input_val if pd.notna(input_val) else '').lower().strip(chars_to_strip)
-        compare_extracted = str(extracted_val).lower().strip(chars_to_strip)
+        compare_input = str(input_val if pd.notna(input_val) else '').lower().strip(CHARS_TO_STRIP)
+        compare_extracted = str(extracted_val).lower().strip(CHARS_TO_STRIP)
         
         status = "True" if (compare_input == compare_extracted and compare_input != '') else "False"
 
@@ -50,4 +54,70 @@ def verify_and_create_row(master_df, applicant_id, extracted_data_dict):
         
         final_row.extend([input_val if pd.notna(input_val) else 'n/a', extracted_val, status])
                 
-    return final_row, failed_fields
\ No newline at end of file
+    return final_row, failed_fields
+
+
+# (report column prefix, extracted field, master column) in report order.
+REPORT_FIELDS = [
+    ('name', 'name', 'name'),
+    ('father_name', 'father_name', 'father_name'),
+    ('reg_id', 'registration_id', 'registration_number'),
+    ('year', 'year', 'gate_year'),
+    ('paper_code', 'paper_code', 'gate_paper_code'),
+    ('score', 'score', 'gate_valid_score'),
+    ('scoreof100', 'scoreof100', 'gate_mark'),
+    ('rank', 'rank', 'gate_rank'),
+]
+REPORT_COLUMNS = ['id'] + [
+    f'{kind}_{prefix}' if kind != 'status' else f'{prefix}_status'
+    for prefix, _, _ in REPORT_FIELDS
+    for kind in ('input', 'extracted', 'status')
+]
+
+
+def verify_many(master_index, extracted_df):
+    """
+    Vectorised version of `verify_and_create_row` for a whole batch.
+
+    `master_index` is the job's MasterIndex. `extracted_df` has an 'id'
+    column plus one column per extracted field (missing fields count as
+    'N/A'; a row with no fields at all is a parse error). Each ID is looked up
+    in the index once and every status column is computed with column-wide
+    operations against the index's pre-normalised master values.
+
+    Returns:
+        pd.DataFrame: One report row per input row, with REPORT_COLUMNS.
+    """
+    ids = extracted_df['id'].astype(str).reset_index(drop=True)
+    extracted = extracted_df.reindex(columns=[field for _, field, _ in REPORT_FIELDS]).reset_index(drop=True)
+
+    rows = master_index.positions(ids)
+    found = pd.Series(rows >= 0, index=ids.index)
+    parsed = extracted.notna().any(axis=1)
+
+    report = {'id': ids}
+    for prefix, field, column in REPORT_FIELDS:
+        compare_input = master_index.normalised[column][rows]
+        extracted_vals = extracted[field].astype(object).where(extracted[field].notna(), 'N/A')
+        compare_extracted = normalise_values(extracted_vals).to_numpy()
+
+        report[f'input_{prefix}'] = pd.Series(master_index.display[column][rows], index=ids.index)
+        report[f'extracted_{prefix}'] = extracted_vals
+        report[f'{prefix}_status'] = pd.Series(
+            np.where((compare_input == compare_extracted) & (compare_input != ''), 'True', 'False'),
+            index=ids.index,
+        )
+    report = pd.DataFrame(report, columns=REPORT_COLUMNS)
+
+    # Same error rows as verify_and_create_row: the message in the second
+    # column and everything after it blank.
+    error_columns = REPORT_COLUMNS[2:]
+    report.loc[~parsed, 'input_name'] = "PARSE_ERROR: Extracted data is not a valid dictionary."
+    report.loc[~found, 'input_name'] = 'ID NOT FOUND IN MASTER CSV'
+    report.loc[~found | ~parsed, error_columns] = ''
+    return report
+
+
+def normalise_values(values):
+    """Lowercases and strips a Series of values the way verification compares them."""
+    return values.astype(str).str.lower().str.strip(CHARS_TO_STRIP)